@@ -5,6 +5,7 @@ Improved version with proper environment variable loading.
 
 import os
 import sys
+import time
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -69,19 +70,17 @@ def initialize_session_state():
     """Initialize session state variables."""
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "vectorstore_loaded" not in st.session_state:
-        st.session_state.vectorstore_loaded = False
 
 
 def load_vectorstore():
-    """Load or create the vectorstore."""
-    if not st.session_state.vectorstore_loaded:
+    """Load the process-wide index once; every session shares it."""
+    from sharding import sharded_index
+
+    if not sharded_index.loaded:
         try:
-            from ingestion import get_or_create_vectorstore
             with st.spinner("Loading vectorstore..."):
-                get_or_create_vectorstore()
-                st.session_state.vectorstore_loaded = True
-                st.sidebar.success("✅ Vectorstore loaded")
+                versions = "/".join(f"v{s.version}" for s in sharded_index.snapshots)
+                st.sidebar.success(f"✅ Vectorstore loaded ({versions})")
         except Exception as e:
             st.error(f"❌ Failed to load vectorstore: {e}")
             st.exception(e)
@@ -118,12 +117,8 @@ def query_page():
                     if isinstance(response, dict):
                         answer = response.get("generation") or ""
                         used_web = bool(response.get("used_web_search", False))
-                        docs = response.get("documents", [])
-                        doc_count = len(docs)
-                        try:
-                            sources = [getattr(d, "metadata", {}) for d in docs]
-                        except Exception:
-                            sources = []
+                        sources = response.get("sources") or []
+                        doc_count = response.get("doc_count", len(sources))
                     else:
                         answer = str(response)
 
@@ -189,40 +184,69 @@ def ingestion_page():
             st.write(f"- {file.name} ({file.size / 1024:.1f} KB)")
 
         if st.button("🚀 Process Documents", type="primary"):
-            with st.spinner('Processing documents...'):
-                try:
-                    temp_dir = Path("temp_uploads")
-                    temp_dir.mkdir(exist_ok=True)
+            try:
+                from jobs import job_queue
 
-                    temp_paths = []
-                    for file in uploaded_files:
-                        temp_path = temp_dir / file.name
-                        with open(temp_path, "wb") as f:
-                            f.write(file.getbuffer())
-                        temp_paths.append(str(temp_path))
+                job_id = job_queue.new_job_id()
+                upload_dir = job_queue.upload_dir(job_id)
 
-                    from ingestion import process_documents
-                    process_documents(temp_paths)
+                temp_paths = []
+                for file in uploaded_files:
+                    temp_path = upload_dir / file.name
+                    with open(temp_path, "wb") as f:
+                        f.write(file.getbuffer())
+                    temp_paths.append(str(temp_path))
 
-                    for path in temp_paths:
-                        try:
-                            Path(path).unlink()
-                        except Exception:
-                            pass
-                    try:
-                        temp_dir.rmdir()
-                    except:
-                        pass
+                job_queue.submit(temp_paths, job_id=job_id)
+                st.success(f"✅ Queued ingestion job `{job_id}`")
 
-                    st.success("✅ Documents processed successfully!")
-                    st.balloons()
+            except Exception as e:
+                st.error(f"❌ Error queueing documents: {str(e)}")
+                with st.expander("🔍 Full Error Details"):
+                    st.exception(e)
 
-                    st.session_state.vectorstore_loaded = False
+    ingestion_jobs_panel()
 
-                except Exception as e:
-                    st.error(f"❌ Error processing documents: {str(e)}")
-                    with st.expander("🔍 Full Error Details"):
-                        st.exception(e)
+
+def ingestion_jobs_panel():
+    """Poll and display background ingestion jobs."""
+    from jobs import ACTIVE_STATES, job_queue
+
+    st.subheader("📋 Ingestion Jobs")
+    jobs = job_queue.list()
+    if not jobs:
+        st.caption("No ingestion jobs yet.")
+        return
+
+    status_icons = {
+        "queued": "⏳",
+        "running": "⚙️",
+        "succeeded": "✅",
+        "failed": "❌",
+        "cancelled": "🚫",
+    }
+    for job in jobs:
+        icon = status_icons.get(job["status"], "•")
+        with st.expander(f"{icon} {job['id']} — {job['status']} ({len(job['files'])} file(s))",
+                         expanded=job["status"] in ACTIVE_STATES):
+            total = job["chunks_total"]
+            done = job["chunks_embedded"]
+            st.progress(done / total if total else 0.0, text=f"{done}/{total} chunks embedded")
+            for f in job["files"]:
+                st.write(f"- {f['name']}: {f['status']} — {f['embedded']}/{f['chunks']} chunks")
+            if job["error"]:
+                st.error(job["error"])
+            if job["status"] in ACTIVE_STATES:
+                if st.button("🛑 Cancel", key=f"cancel-{job['id']}"):
+                    job_queue.cancel(job["id"])
+                    st.rerun()
+
+    if job_queue.has_active():
+        if st.checkbox("Auto-refresh", value=True):
+            time.sleep(1.0)
+            st.rerun()
+        elif st.button("🔄 Refresh"):
+            st.rerun()
 
 
 def system_info_page():
@@ -285,10 +309,29 @@ def system_info_page():
 
     with col2:
         st.write("**System Status**")
-        st.write(f"Vectorstore: {'✅ Loaded' if st.session_state.vectorstore_loaded else '⏳ Not loaded'}")
+        from sharding import sharded_index
+        if sharded_index.loaded:
+            snapshots = sharded_index.snapshots
+            versions = "/".join(f"v{s.version}" for s in snapshots)
+            shards = f", {len(snapshots)} shards" if len(snapshots) > 1 else ""
+            st.write(f"Vectorstore: ✅ {versions} ({sum(s.chunk_count for s in snapshots)} chunks{shards})")
+        else:
+            st.write("Vectorstore: ⏳ Not loaded")
         st.write(f"Messages: {len(st.session_state.messages)}")
         st.write(f"Python: {sys.version.split()[0]}")
 
+    with st.expander("⚡ Speculative Routing"):
+        from graph.speculation import speculation_stats
+        st.json(speculation_stats.snapshot())
+
+    with st.expander("♻️ Memoized Work"):
+        from graph.memo import memo_cache
+        st.json(memo_cache.stats())
+
+    with st.expander("🧾 Grounding Pre-check"):
+        from graph.grounding import grounding_stats
+        st.json(grounding_stats.snapshot())
+
     with st.expander("🔍 Environment Variables"):
         env_vars = {
             "OPENAI_API_KEY": "✅ Set" if OPENAI_KEY else "❌ Missing",
@@ -321,10 +364,11 @@ def main():
         if st.button("🔄 Reload Vectorstore", use_container_width=True):
             with st.spinner("Reloading..."):
                 try:
-                    from ingestion import get_or_create_vectorstore
-                    get_or_create_vectorstore(force_reload=True)
-                    st.session_state.vectorstore_loaded = True
-                    st.success("✅ Reloaded!")
+                    # Reopen the persisted shards; re-ingesting here would
+                    # add another copy of the default URLs.
+                    from sharding import sharded_index
+                    versions = "/".join(f"v{s.version}" for s in sharded_index.reload())
+                    st.success(f"✅ Reloaded ({versions})")
                 except Exception as e:
                     st.error(f"❌ Error: {e}")
 
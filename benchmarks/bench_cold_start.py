@@ -0,0 +1,109 @@
+"""
+Benchmark time-to-first-query: snapshot file versus opening Chroma.
+
+Builds a Chroma collection of synthetic chunks and exports it with
+``IndexManager.export_snapshot``, then starts fresh processes that construct
+an ``IndexManager`` and time opening the index plus answering one query.
+"chroma" opens the persistent store (``RAG_SNAPSHOT_VERIFY=off``); the
+snapshot modes map the file and check all checksums ("full") or only the
+header and id/offset sections ("header"). Embeddings are faked, so neither
+side pays the embedding round trip the old ``_healthcheck`` query made.
+Pass ``--drop-caches`` (root only) to start every run with a cold page cache.
+
+Usage:
+    python -m benchmarks.bench_cold_start [--chunks 20000] [--dim 1536] [--runs 3]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")  # never used: embeddings are faked
+
+import numpy as np
+
+from benchmarks.bench_shards import TableEmbeddings, synthetic_corpus
+
+MODES = {"chroma": "off", "snapshot (full)": "full", "snapshot (header)": "header"}
+
+
+def first_query(directory: str, verify: str, dim: int, k: int) -> dict:
+    """Runs in a fresh process: open the index and answer one query."""
+    from index_manager import IndexManager
+
+    manager = IndexManager(collection_name="bench", persist_directory=directory, snapshot_verify=verify)
+    manager._embeddings = TableEmbeddings({}, dim, 0.0)
+    query = manager.embeddings.embed_query("first query")
+    start = time.perf_counter()
+    snapshot = manager.current
+    opened = time.perf_counter()
+    hits = manager.similarity_search_by_vector(query, k=k)
+    done = time.perf_counter()
+    return {
+        "open_s": opened - start,
+        "first_query_s": done - start,
+        "from_file": snapshot.file is not None,
+        "hits": len(hits),
+    }
+
+
+def drop_caches() -> None:
+    os.sync()
+    with open("/proc/sys/vm/drop_caches", "w") as f:
+        f.write("3\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per mode; the median is reported")
+    parser.add_argument("--drop-caches", action="store_true")
+    parser.add_argument("--child", nargs=2, metavar=("DIR", "VERIFY"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(os.devnull, "w") as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            result = first_query(args.child[0], args.child[1], args.dim, args.k)
+            sys.stdout = stdout
+        print(json.dumps(result))
+        return
+
+    from index_manager import IndexManager
+
+    rng = np.random.default_rng(0)
+    documents, _, table = synthetic_corpus(rng, args.chunks, 0, args.dim, 500, 200)
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = IndexManager(collection_name="bench", persist_directory=tmp, snapshot_verify="off")
+        manager._embeddings = TableEmbeddings(table, args.dim, 0.0)
+        manager.current
+        manager.ingest(documents)
+        start = time.perf_counter()
+        path = manager.export_snapshot()
+        print(f"{args.chunks} chunks x {args.dim} dims; snapshot {os.path.getsize(path) / 1e6:.0f} MB, "
+              f"exported in {time.perf_counter() - start:.1f}s; page cache {'dropped' if args.drop_caches else 'warm'}")
+        print(f"{'mode':<18} {'open ms':>9} {'first query ms':>15}")
+        for name, verify in MODES.items():
+            runs = []
+            for _ in range(args.runs):
+                if args.drop_caches:
+                    drop_caches()
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_cold_start", "--dim", str(args.dim),
+                     "--k", str(args.k), "--child", tmp, verify],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            assert all(r["from_file"] == (verify != "off") and r["hits"] == args.k for r in runs), runs
+            print(f"{name:<18} {np.median([r['open_s'] for r in runs]) * 1e3:>9.0f} "
+                  f"{np.median([r['first_query_s'] for r in runs]) * 1e3:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Evaluate the grounding pre-check offline against labels and the LLM grader.
+
+Runs ``graph.grounding.check_grounding`` over a labelled set of
+(chunks, generation, grounded?) examples and reports how many generations it
+accepts without the grader, how many of those are wrongly accepted, and how
+much of the grader's document text the excerpts of the rest remove.
+
+Results are reported per split. The "tune" examples were used to choose the
+default thresholds and key-term rules, so their numbers are in-sample; only
+the "heldout" split estimates how the pre-check does on new generations.
+
+With ``--llm`` the hallucination grader is asked too, once on the full chunks
+(today's behaviour) and once on the pre-check's excerpts, and the pipeline's
+verdicts are compared with the full-context grader's and with the labels.
+Grader verdicts are cached in ``--verdicts`` so threshold sweeps can be rerun
+without calling the API again.
+
+Usage:
+    python -m benchmarks.bench_grounding [--accept 0.85] [--sweep] [--llm] [--verdicts grounding_verdicts.json]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.documents import Document
+
+from graph.grounding import (
+    DEFAULT_ACCEPT,
+    DEFAULT_BIGRAM_ACCEPT,
+    DEFAULT_SPANS_PER_SENTENCE,
+    check_grounding,
+)
+from graph.memo import stable_hash
+
+DATA = Path(__file__).parent / "data" / "grounding_labelled.json"
+SPLITS = {"tune": "in-sample: defaults were chosen on it", "heldout": "never tuned on"}
+
+
+def load_examples(path: Path) -> List[dict]:
+    data = json.loads(path.read_text())
+    for example in data["examples"]:
+        example.setdefault("split", "tune")
+        example["documents"] = [
+            Document(page_content=text, metadata={"source": example["context"]})
+            for text in data["contexts"][example["context"]]
+        ]
+    return data["examples"]
+
+
+def run_checks(examples: List[dict], accept: float, bigram_accept: float, spans: int) -> Dict[str, float]:
+    accepted = wrongly_accepted = grounded = 0
+    full_chars = sent_chars = 0
+    latencies = []
+    for example in examples:
+        start = time.perf_counter()
+        check = check_grounding(example["generation"], example["documents"], accept, bigram_accept, spans)
+        latencies.append(time.perf_counter() - start)
+        example["check"] = check
+        grounded += example["label"]
+        full_chars += check.full_chars
+        if check.grounded:
+            accepted += 1
+            wrongly_accepted += not example["label"]
+        else:
+            sent_chars += check.excerpt_chars
+    graded_chars = full_chars - sum(e["check"].full_chars for e in examples if e["check"].grounded)
+    return {
+        "accepted": accepted,
+        "wrongly_accepted": wrongly_accepted,
+        "recall": accepted / max(grounded, 1),  # share of grounded generations that skip the grader
+        "excerpt_ratio": sent_chars / max(graded_chars, 1),
+        "chars_saved": 1.0 - sent_chars / max(full_chars, 1),
+        "p50_ms": float(np.percentile(latencies, 50) * 1e3),
+    }
+
+
+def grade(cache: Dict[str, bool], key: str, documents: List[Document], generation: str) -> bool:
+    if key not in cache:
+        from graph.chains.hallucination_grader import hallucination_grader
+
+        cache[key] = bool(hallucination_grader.invoke({"documents": documents, "generation": generation}).binary_score)
+    return cache[key]
+
+
+def compare_with_grader(examples: List[dict], verdicts_path: Path) -> None:
+    cache = json.loads(verdicts_path.read_text()) if verdicts_path.exists() else {}
+    rows = []
+    try:
+        for example in examples:
+            check, generation = example["check"], example["generation"]
+            full = grade(cache, f"{example['id']}:full", example["documents"], generation)
+            if check.grounded:
+                pipeline = True
+            else:
+                # Keyed by the excerpt text: a different threshold can select different spans.
+                excerpt_key = f"{example['id']}:excerpts:{stable_hash(check.excerpts)[:16]}"
+                pipeline = grade(cache, excerpt_key, check.excerpts, generation)
+            rows.append((example["label"], full, pipeline, example["kind"]))
+    finally:
+        verdicts_path.write_text(json.dumps(cache, indent=1, sort_keys=True))
+
+    print(f"\nLLM grader (verdicts cached in {verdicts_path})")
+    for split, label in SPLITS.items():
+        subset = [row for row, example in zip(rows, examples) if example["split"] == split]
+        if not subset:
+            continue
+        labels, full, pipeline, kinds = map(np.asarray, zip(*subset))
+        accepted = np.asarray([e["check"].grounded for e in examples if e["split"] == split])
+        print(f"  {split} ({label}), {len(subset)} examples")
+        print(f"    full chunks      vs labels: {np.mean(full == labels):.3f}")
+        print(f"    pre-check + LLM  vs labels: {np.mean(pipeline == labels):.3f}")
+        print(f"    pre-check + LLM  vs full-chunk grader: {np.mean(pipeline == full):.3f}")
+        print(f"    accepted locally: {accepted.sum()}, of which the full-chunk grader rejects "
+              f"{int(np.sum(accepted & ~full))} and the labels reject {int(np.sum(accepted & ~labels))}")
+        disagreements = Counter(k for k, f, p in zip(kinds, full, pipeline) if f != p)
+        if disagreements:
+            print("    disagreements by kind: " + ", ".join(f"{k}: {n}" for k, n in sorted(disagreements.items())))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--data", type=Path, default=DATA)
+    parser.add_argument("--accept", type=float, default=DEFAULT_ACCEPT)
+    parser.add_argument("--bigram-accept", type=float, default=DEFAULT_BIGRAM_ACCEPT)
+    parser.add_argument("--spans", type=int, default=DEFAULT_SPANS_PER_SENTENCE, help="supporting spans kept per sentence")
+    parser.add_argument("--sweep", action="store_true", help="report a range of --accept thresholds")
+    parser.add_argument("--llm", action="store_true", help="also run the LLM hallucination grader")
+    parser.add_argument("--verdicts", type=Path, default=Path("grounding_verdicts.json"))
+    parser.add_argument("--verbose", action="store_true", help="print every example's sentence scores")
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    thresholds = [0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0] if args.sweep else []
+    for split, label in SPLITS.items():
+        subset = [e for e in examples if e["split"] == split]
+        if not subset:
+            continue
+        kinds = Counter(e["kind"] for e in subset)
+        print(f"\n{split} ({label}): {len(subset)} examples, {sum(e['label'] for e in subset)} grounded: "
+              + ", ".join(f"{k} {n}" for k, n in sorted(kinds.items())))
+        print(f"{'accept':>6} {'accepted':>9} {'wrong':>6} {'recall':>7} {'excerpt/full':>13} {'chars saved':>12} {'p50 ms':>7}")
+        for accept in sorted(set(thresholds + [args.accept])):
+            r = run_checks(subset, accept, args.bigram_accept, args.spans)
+            marker = " *" if accept == args.accept else ""
+            print(f"{accept:>6.2f} {r['accepted']:>9} {r['wrongly_accepted']:>6} {r['recall']:>7.2f} "
+                  f"{r['excerpt_ratio']:>13.2f} {r['chars_saved']:>12.2f} {r['p50_ms']:>7.2f}{marker}")
+
+    # Leave the checks of the selected threshold on the examples.
+    run_checks(examples, args.accept, args.bigram_accept, args.spans)
+    if args.verbose:
+        for example in examples:
+            check = example["check"]
+            print(f"\n[{example['id']}] {example['split']} {example['kind']} label={example['label']} accepted={check.grounded}")
+            for s in check.sentences:
+                order = "" if s.terms_in_order else "out-of-order "
+                print(f"  {s.coverage:.2f} {s.bigram_coverage:.2f} {order}{s.missing_terms or ''} {s.text[:90]}")
+    if args.llm:
+        if not os.getenv("OPENAI_API_KEY"):
+            parser.error("--llm needs OPENAI_API_KEY")
+        compare_with_grader(examples, args.verdicts)
+
+
+if __name__ == "__main__":
+    main()
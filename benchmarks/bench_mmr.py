@@ -0,0 +1,107 @@
+"""
+Benchmark MMR reranking cost, grader calls saved and recall.
+
+Builds a synthetic corpus where every topic has several near-duplicate
+chunks (the same passage ingested twice, overlapping splits, ...), then
+compares plain top-k similarity against the adaptive-k MMR mode from
+``retrieval.py``. Each returned chunk costs one retrieval-grader LLM call.
+
+A query is relevant to between one and ``--max-relevant`` topics, and every
+chunk of those topics is relevant. Grader calls saved only count if the
+relevant material survives, so each mode also reports topic recall (share of
+the query's topics with at least one returned chunk) and chunk recall@k
+(relevant chunks returned over ``min(k, relevant chunks)``), overall and by
+number of relevant topics.
+
+Usage:
+    python -m benchmarks.bench_mmr [--queries 500] [--dim 1536] [--min-gap 0.25] [--max-relevant 4]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from retrieval import DEFAULT_OPTIONS, _normalize, candidate_pool, mmr_rerank
+
+
+def build_corpus(rng, topics: int, dupes: int, dim: int, noise: float):
+    centers = _normalize(rng.normal(size=(topics, dim)).astype(np.float32))
+    corpus = np.repeat(centers, dupes, axis=0)
+    corpus += noise * rng.normal(size=corpus.shape).astype(np.float32) / np.sqrt(dim)
+    return centers, _normalize(corpus)
+
+
+def build_queries(rng, centers: np.ndarray, n: int, max_relevant: int, noise: float):
+    """Queries mixing 1..max_relevant topic centers, with the relevant topics of each."""
+    topics, dim = centers.shape
+    relevant = [rng.choice(topics, size=rng.integers(1, max_relevant + 1), replace=False) for _ in range(n)]
+    queries = np.stack([centers[r].mean(axis=0) for r in relevant])
+    queries = _normalize(queries + noise * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(dim))
+    return queries, relevant
+
+
+def recall(selected: np.ndarray, relevant_topics: np.ndarray, dupes: int, k: int) -> tuple:
+    """(topic recall, chunk recall@k) of the selected chunk indices."""
+    topics = set((selected // dupes).tolist())
+    hits = sum(1 for t in (selected // dupes).tolist() if t in set(relevant_topics.tolist()))
+    topic_recall = len(topics & set(relevant_topics.tolist())) / len(relevant_topics)
+    return topic_recall, hits / min(k, len(relevant_topics) * dupes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--topics", type=int, default=400)
+    parser.add_argument("--dupes", type=int, default=3, help="near-duplicate chunks per topic")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--min-gap", type=float, default=0.25, help="adaptive-k score gap")
+    parser.add_argument("--max-relevant", type=int, default=4, help="relevant topics per query, drawn from 1..N")
+    parser.add_argument("--query-noise", type=float, default=0.9, help="noise added to each query, relative to a topic center")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    centers, corpus = build_corpus(rng, args.topics, args.dupes, args.dim, noise=0.15)
+    dup_threshold = DEFAULT_OPTIONS["duplicate_threshold"]
+    queries, relevant = build_queries(rng, centers, args.queries, args.max_relevant, args.query_noise)
+    n_relevant = np.asarray([len(r) for r in relevant])
+
+    print(f"corpus={len(corpus)} chunks, dim={args.dim}, queries={args.queries}, k={args.k}, "
+          f"relevant topics/query=1..{args.max_relevant}")
+    print(f"{'fetch_k':>8} {'mode':>9} {'rerank us/q':>12} {'calls/q':>8} {'saved':>7} "
+          f"{'dupes/q':>8} {'topic rec':>10} {'chunk rec@k':>12}  topic recall by relevant topics")
+
+    for fetch_k in (10, 20, 50, 100):
+        rerank_time = 0.0
+        rows = {"baseline": [], "mmr": []}  # (calls, dupes, topic recall, chunk recall) per query
+        for q, topics in zip(queries, relevant):
+            scores = corpus @ q
+            top = np.argpartition(-scores, fetch_k)[:fetch_k]
+            top = top[np.argsort(-scores[top])]
+
+            start = time.perf_counter()
+            pool = top[candidate_pool(scores[top], min_gap=args.min_gap)]
+            order = mmr_rerank(q, corpus[pool], args.k, duplicate_threshold=dup_threshold)
+            rerank_time += time.perf_counter() - start
+
+            for mode, selected in (("baseline", top[: args.k]), ("mmr", pool[order])):
+                sims = corpus[selected] @ corpus[selected].T
+                dupes = int(np.count_nonzero((np.triu(sims, 1) >= dup_threshold).any(axis=0)))
+                rows[mode].append((len(selected), dupes, *recall(selected, topics, args.dupes, args.k)))
+
+        baseline_calls = sum(r[0] for r in rows["baseline"])
+        for mode, per_query in rows.items():
+            calls, dupes, topic_recall, chunk_recall = map(np.asarray, zip(*per_query))
+            by_relevant = " ".join(
+                f"{r}:{topic_recall[n_relevant == r].mean():.2f}" for r in range(1, args.max_relevant + 1)
+                if np.any(n_relevant == r)
+            )
+            us = f"{1e6 * rerank_time / len(queries):.1f}" if mode == "mmr" else "-"
+            print(f"{fetch_k:>8} {mode:>9} {us:>12} {calls.mean():>8.2f} "
+                  f"{100 * (1 - calls.sum() / baseline_calls):>6.1f}% {dupes.mean():>8.2f} "
+                  f"{topic_recall.mean():>10.3f} {chunk_recall.mean():>12.3f}  {by_relevant}")
+
+if __name__ == "__main__":
+    main()
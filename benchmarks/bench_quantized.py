@@ -0,0 +1,79 @@
+"""
+Benchmark quantized vector storage: memory footprint, query latency and recall@k.
+
+Builds ``vector_index.VectorIndex`` over the same synthetic embeddings as
+float32 (the unquantized baseline, all in RAM), float16 and int8, and compares
+each against exact float32 search. The quantized variants rescore their top
+``k * rescore`` candidates against the memory-mapped float32 rows; the
+"no rescoring" rows show what quantization alone would cost in recall.
+
+Usage:
+    python -m benchmarks.bench_quantized [--vectors 20000] [--dim 1536] [--k 10] [--rescore 4]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def synthetic_embeddings(rng: np.random.Generator, n: int, dim: int, clusters: int) -> np.ndarray:
+    """Unit vectors around topic centroids, so near neighbours are close calls."""
+    centroids = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed_queries(search, queries: np.ndarray):
+    results, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        results.append(search(q))
+        latencies.append(time.perf_counter() - start)
+    return results, np.asarray(latencies) * 1e3
+
+
+def recall(results, truth, k: int) -> float:
+    return float(np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1536, help="1536 matches OpenAI text-embedding models")
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore", type=int, default=4, help="candidates rescored per result")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = synthetic_embeddings(rng, args.vectors, args.dim, args.clusters)
+    queries = synthetic_embeddings(rng, args.queries, args.dim, args.clusters)
+    ids = [str(i) for i in range(args.vectors)]
+    truth = [np.argsort(-(vectors @ q))[: args.k].astype(str).tolist() for q in queries]
+
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, k={args.k}, rescore x{args.rescore}")
+    print(f"{'index':<24} {'RAM MB':>8} {'p50 ms':>8} {'p95 ms':>8} {f'recall@{args.k}':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in ("float32", "float16", "int8"):
+            index = VectorIndex.build(f"{tmp}/{dtype}", ids, vectors, dtype, rescore_factor=args.rescore)
+            index.search(queries[0], args.k)  # warm up the memory map
+            variants = [(dtype, lambda q: [i for i, _ in index.search(q, args.k)])]
+            if dtype != "float32":
+                variants.append((
+                    f"{dtype}, no rescoring",
+                    lambda q: np.argsort(-index.approximate_scores(q))[: args.k].astype(str).tolist(),
+                ))
+            for name, search in variants:
+                results, latencies = timed_queries(search, queries)
+                print(f"{name:<24} {index.nbytes / 1e6:>8.1f} {np.percentile(latencies, 50):>8.2f} "
+                      f"{np.percentile(latencies, 95):>8.2f} {recall(results, truth, args.k):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
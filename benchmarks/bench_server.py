@@ -0,0 +1,181 @@
+"""
+Load-test the headless query server against stubbed chains.
+
+Starts ``server.QueryServer`` in-process on a free port with every LLM chain,
+the retriever and web search replaced by stubs that sleep ``--llm-ms`` /
+``--retrieval-ms``, so only the server, the graph and the thread pool are
+measured. Clients then either keep ``--concurrency`` requests outstanding
+(closed loop, the default) or send at a fixed ``--rate`` (open loop, the mode
+that shows load shedding). Reports sustained QPS and latency percentiles of
+successful requests, plus how many were shed (503) or timed out (504).
+
+Usage:
+    python -m benchmarks.bench_server [--duration 10] [--concurrency 32] [--rate 0] [--workers 8]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import List, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")  # never used: chains are stubbed
+os.environ.setdefault("TAVILY_API_KEY", "tvly-benchmark")
+
+import numpy as np
+from langchain_core.documents import Document
+
+from server import QueryServer, ServerConfig
+
+
+class StubChain:
+    def __init__(self, seconds: float, result) -> None:
+        self.seconds = seconds
+        self.result = result
+
+    def invoke(self, inputs, config=None):
+        time.sleep(self.seconds)
+        return self.result
+
+
+def stub_chains(llm_s: float, retrieval_s: float) -> None:
+    """Replace the graph's chains, retriever and web search with fixed-latency stubs."""
+    import graph.graph as graph_module
+    import sharding
+    from graph.chains.answer_grader import GradeAnswer
+    from graph.chains.hallucination_grader import GradeHallucinations
+    from graph.chains.retrieval_grader import GradeDocuments
+    from graph.chains.router import RouteQuery
+
+    # graph.nodes re-exports the node functions under the module names.
+    nodes = {name: sys.modules[f"graph.nodes.{name}"] for name in (
+        "route_question", "grade_documents", "generate", "web_search",
+    )}
+    nodes["route_question"].question_router = StubChain(llm_s, RouteQuery(datasource="vectorstore"))
+    nodes["grade_documents"].retrieval_grader = StubChain(llm_s, GradeDocuments(binary_score="yes"))
+    nodes["generate"].generation_chain = StubChain(llm_s, "A stubbed answer.")
+    nodes["web_search"].web_search_tool = StubChain(retrieval_s, [{"content": "web result", "url": "https://example.com"}])
+    graph_module.hallucination_grader = StubChain(llm_s, GradeHallucinations(binary_score=True))
+    graph_module.answer_grader = StubChain(llm_s, GradeAnswer(binary_score=True))
+
+    def search(question: str, k: int = 4, where=None):
+        time.sleep(retrieval_s)
+        return [
+            (Document(page_content=f"{question} chunk {i}", metadata={"source": f"doc-{i}"}), 0.9 - 0.1 * i)
+            for i in range(k)
+        ]
+
+    sharding.sharded_index.similarity_search_with_scores = search
+
+
+async def post(port: int, path: str, payload: dict) -> Tuple[int, float]:
+    """POST ``payload`` on a fresh connection; returns (status, seconds)."""
+    body = json.dumps(payload).encode()
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        await reader.read()
+    finally:
+        writer.close()
+    return status, time.perf_counter() - start
+
+
+async def get(port: int, path: str) -> str:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    response = (await reader.read()).decode()
+    writer.close()
+    return response.split("\r\n\r\n", 1)[1]
+
+
+async def run_load(port: int, args: argparse.Namespace) -> Tuple[List[Tuple[int, float]], float]:
+    results: List[Tuple[int, float]] = []
+    counter = iter(range(10 ** 9))
+
+    async def one() -> None:
+        payload = {"question": f"question {next(counter)}", "deadline_ms": args.deadline_ms}
+        try:
+            results.append(await post(port, "/query", payload))
+        except (ConnectionError, OSError, ValueError, IndexError):
+            results.append((0, 0.0))
+
+    start = time.perf_counter()
+    stop_at = start + args.duration
+    if args.rate > 0:
+        pending = set()
+        while time.perf_counter() < stop_at:
+            pending.add(asyncio.create_task(one()))
+            await asyncio.sleep(random.expovariate(args.rate))
+        await asyncio.gather(*pending)
+    else:
+        async def client() -> None:
+            while time.perf_counter() < stop_at:
+                await one()
+
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    return results, time.perf_counter() - start
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    config = ServerConfig(
+        port=0,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        deadline_s=args.deadline_ms / 1e3,
+    )
+    server = await QueryServer(config=config).start()
+    try:
+        # The graph logs every step; keep the report readable.
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            await post(server.port, "/query", {"question": "warm up"})
+            results, elapsed = await run_load(server.port, args)
+        metrics = await get(server.port, "/metrics")
+    finally:
+        await server.close()
+
+    statuses = Counter(status for status, _ in results)
+    ok = np.asarray([seconds for status, seconds in results if status == 200]) * 1e3
+    mode = f"open loop at {args.rate:g} req/s" if args.rate > 0 else f"closed loop, {args.concurrency} clients"
+    print(f"{mode}; {args.workers} workers, queue {args.queue_size}, deadline {args.deadline_ms} ms, "
+          f"{args.llm_ms:g} ms per LLM call")
+    print(f"sent {len(results)} in {elapsed:.1f}s: " + ", ".join(f"{s}: {n}" for s, n in sorted(statuses.items())))
+    if len(ok):
+        print(f"sustained {len(ok) / elapsed:.1f} QPS; latency ms p50 {np.percentile(ok, 50):.0f} "
+              f"p95 {np.percentile(ok, 95):.0f} p99 {np.percentile(ok, 99):.0f} max {ok.max():.0f}")
+    shed = [line for line in metrics.splitlines() if line.startswith("rag_shed_total")]
+    if shed:
+        print("\n".join(shed))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--concurrency", type=int, default=32, help="closed-loop clients")
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop requests/s (overrides --concurrency)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--deadline-ms", type=int, default=5000)
+    parser.add_argument("--llm-ms", type=float, default=50.0, help="latency of each stubbed LLM call")
+    parser.add_argument("--retrieval-ms", type=float, default=10.0, help="latency of stubbed retrieval and web search")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    stub_chains(args.llm_ms / 1e3, args.retrieval_ms / 1e3)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
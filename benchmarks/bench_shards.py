@@ -0,0 +1,114 @@
+"""
+Benchmark sharded retrieval: query latency and ingestion throughput versus shard count.
+
+Ingests the same synthetic corpus into a ``sharding.ShardedIndex`` of 1, 2, 4
+and 8 shards, each a fresh Chroma collection under a temporary directory,
+then times top-k queries fanned out over the shards. Embeddings come from a
+lookup table so no API is called; ``--embed-ms`` adds a simulated round trip
+per embedding batch, which is the part of ingestion that shards overlap.
+"agreement" is the share of each query's top-k that matches the 1-shard run.
+
+Usage:
+    python -m benchmarks.bench_shards [--chunks 20000] [--dim 384] [--shards 1 2 4 8] [--embed-ms 0]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")  # never used: embeddings are faked
+
+import numpy as np
+from langchain_core.documents import Document
+
+from sharding import ShardedIndex
+
+
+class TableEmbeddings:
+    """Embeddings looked up by text, with an optional simulated API round trip."""
+
+    def __init__(self, table: Dict[str, np.ndarray], dim: int, latency_s: float) -> None:
+        self.table = table
+        self.dim = dim
+        self.latency_s = latency_s
+
+    def _vector(self, text: str) -> List[float]:
+        if text in self.table:
+            return self.table[text].tolist()
+        return np.random.default_rng(zlib.crc32(text.encode())).normal(size=self.dim).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency_s)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text)
+
+
+def synthetic_corpus(rng: np.random.Generator, n: int, queries: int, dim: int, sources: int, clusters: int):
+    """Chunks and queries embedded around shared topic centroids."""
+    centroids = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, clusters, n + queries)]
+    vectors += 0.6 * rng.normal(size=vectors.shape).astype(np.float32)
+    documents = [
+        Document(page_content=f"chunk {i}", metadata={"source": f"upload-{i % sources}"}) for i in range(n)
+    ]
+    texts = [d.page_content for d in documents] + [f"query {i}" for i in range(queries)]
+    return documents, texts[n:], dict(zip(texts, vectors))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--sources", type=int, default=500, help="distinct routing-key values")
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="simulated latency per embedding batch")
+    parser.add_argument("--vector-dtype", default=None, help="serve search from a quantized index")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    documents, queries, table = synthetic_corpus(
+        rng, args.chunks, args.queries, args.dim, args.sources, args.clusters
+    )
+    embeddings = TableEmbeddings(table, args.dim, args.embed_ms / 1e3)
+
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.sources} sources, k={args.k}, "
+          f"{args.embed_ms:g} ms per embedding batch")
+    print(f"{'shards':>6} {'ingest chunks/s':>16} {'p50 ms':>8} {'p95 ms':>8} {'agreement':>10}")
+    baseline = None
+    for shards in args.shards:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = ShardedIndex.create("bench", tmp, shards, vector_dtype=args.vector_dtype)
+            for manager in index.managers:
+                manager._embeddings = embeddings
+            index.snapshots  # open the empty collections outside the timings
+
+            start = time.perf_counter()
+            index.ingest(documents)
+            throughput = len(documents) / (time.perf_counter() - start)
+
+            index.similarity_search_with_scores(queries[0], k=args.k)
+            results, latencies = [], []
+            for query in queries:
+                t0 = time.perf_counter()
+                hits = index.similarity_search_with_scores(query, k=args.k)
+                latencies.append(time.perf_counter() - t0)
+                results.append({d.page_content for d, _ in hits})
+            if baseline is None:
+                baseline = results
+            agreement = np.mean([len(r & b) / args.k for r, b in zip(results, baseline)])
+            latencies_ms = np.asarray(latencies) * 1e3
+            print(f"{shards:>6} {throughput:>16.0f} {np.percentile(latencies_ms, 50):>8.2f} "
+                  f"{np.percentile(latencies_ms, 95):>8.2f} {agreement:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
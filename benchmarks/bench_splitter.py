@@ -0,0 +1,89 @@
+"""
+Benchmark splitter throughput (MB/s) against the current recursive splitter.
+
+Splits the same corpus with ``RecursiveCharacterTextSplitter.from_tiktoken_encoder``
+(what ingestion used before) and with ``text_splitter.FastTokenTextSplitter``,
+serially and with worker processes, and checks the chunks are identical.
+
+Usage:
+    python -m benchmarks.bench_splitter [--docs 200] [--files "docs/**/*.md"] [--workers 4]
+"""
+
+import argparse
+import glob
+import random
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from text_splitter import FastTokenTextSplitter
+
+WORDS = (
+    "agent memory planning tool retrieval prompt model attack adversarial token "
+    "the a of and to in is that for with as on by this be are from it an or "
+    "language large reasoning chain thought reflection vector embedding index "
+    "gradient jailbreak robustness evaluation benchmark task instruction example"
+).split()
+
+
+def synthetic_corpus(rng: random.Random, docs: int, paragraphs: int) -> list:
+    """Web-page-like documents, plus PDF-like ones whose text runs on without blank lines."""
+    corpus = []
+    for n in range(docs):
+        paras = []
+        for _ in range(rng.randint(paragraphs // 2, paragraphs)):
+            sentences = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                for _ in range(rng.randint(2, 8))
+            ]
+            paras.append(" ".join(sentences))
+        corpus.append(("\n\n" if n % 2 else " ").join(paras))
+    return corpus
+
+
+def timed_split(splitter, documents):
+    start = time.perf_counter()
+    chunks = splitter.split_documents(documents)
+    return chunks, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=200, help="synthetic documents to generate")
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--files", help="glob of real text files to split instead")
+    parser.add_argument("--encoding", default="gpt2")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.files:
+        texts = [open(p, errors="ignore").read() for p in sorted(glob.glob(args.files, recursive=True))]
+    else:
+        texts = synthetic_corpus(random.Random(args.seed), args.docs, args.paragraphs)
+    documents = [Document(page_content=t, metadata={"source": str(i)}) for i, t in enumerate(texts)]
+    megabytes = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+
+    baseline = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=args.encoding, chunk_size=500, chunk_overlap=50
+    )
+    fast = FastTokenTextSplitter(chunk_size=500, chunk_overlap=50, encoding_name=args.encoding)
+    parallel = FastTokenTextSplitter(
+        chunk_size=500, chunk_overlap=50, encoding_name=args.encoding, workers=args.workers
+    )
+    fast.split_text("warm up the cached encoder")
+
+    reference, base_time = timed_split(baseline, documents)
+    print(f"corpus: {len(documents)} documents, {megabytes:.2f} MB, {len(reference)} chunks")
+    print(f"{'splitter':<28} {'seconds':>8} {'MB/s':>8} {'speedup':>8} {'identical':>10}")
+    print(f"{'recursive (tiktoken)':<28} {base_time:>8.2f} {megabytes / base_time:>8.2f} {1.0:>8.2f} {'-':>10}")
+    for name, splitter in (("fast", fast), (f"fast, {args.workers} workers", parallel)):
+        chunks, elapsed = timed_split(splitter, documents)
+        identical = [c.page_content for c in chunks] == [c.page_content for c in reference]
+        print(f"{name:<28} {elapsed:>8.2f} {megabytes / elapsed:>8.2f} "
+              f"{base_time / elapsed:>8.2f} {str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark per-request memory and graph step overhead of the state representation.
+
+Runs the graph's topology (retrieve -> grade -> websearch -> generate ->
+finalize) with no-op nodes in two variants: one that passes full ``Document``
+lists through the state, as the nodes used to, and one that keeps chunks in a
+request-scoped ``graph.chunk_store.ChunkStore`` and passes only IDs and
+scores. Requests run concurrently on a thread pool, with a ``MemorySaver``
+checkpointer so the state is serialized at every step as it would be with
+checkpointing on.
+
+Usage:
+    python -m benchmarks.bench_state [--requests 200] [--concurrency 16] [--chunk-chars 2000] [--k 8]
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, TypedDict
+
+from langchain_core.documents import Document
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import StateGraph
+
+from graph.chunk_store import chunk_stores
+
+STEPS = ("retrieve", "grade", "websearch", "generate", "finalize")
+WEB_RESULTS = 3
+
+
+class DocumentState(TypedDict, total=False):
+    question: str
+    documents: List[Document]
+    generation: str
+    sources: List[dict]
+
+
+class ChunkState(TypedDict, total=False):
+    question: str
+    request_id: str
+    chunk_ids: List[str]
+    chunk_scores: List[Optional[float]]
+    generation: str
+    sources: List[dict]
+
+
+def make_corpus(rng: random.Random, n: int, chars: int) -> List[Document]:
+    alphabet = "abcdefghijklmnopqrstuvwxyz     "
+    return [
+        Document(
+            page_content="".join(rng.choice(alphabet) for _ in range(chars)),
+            metadata={"source": f"https://example.com/{i}", "title": f"Document {i}", "page": i % 7},
+        )
+        for i in range(n)
+    ]
+
+
+def fetch(corpus: List[Document], question: Optional[str], n: int) -> List[Document]:
+    """Fresh copies of n corpus chunks, as a vectorstore or search API returns them."""
+    start = len(corpus) - n if question is None else hash(question) % (len(corpus) - n - WEB_RESULTS)
+    return [Document(page_content=d.page_content[:], metadata=dict(d.metadata)) for d in corpus[start:start + n]]
+
+
+def _chain(builder: StateGraph, checkpointer):
+    for a, b in zip(STEPS, STEPS[1:]):
+        builder.add_edge(a, b)
+    builder.set_entry_point(STEPS[0])
+    builder.set_finish_point(STEPS[-1])
+    return builder.compile(checkpointer=checkpointer)
+
+
+def documents_graph(corpus: List[Document], k: int, checkpointer):
+    def retrieve(state):
+        return {"documents": fetch(corpus, state["question"], k)}
+
+    def grade(state):
+        return {"documents": [d for d in state["documents"]]}
+
+    def websearch(state):
+        return {"documents": state["documents"] + fetch(corpus, None, WEB_RESULTS)}
+
+    def generate(state):
+        context = "\n\n".join(d.page_content for d in state["documents"])
+        return {"documents": state["documents"], "generation": context[:40]}
+
+    def finalize(state):
+        return {"sources": [d.metadata for d in state["documents"]]}
+
+    builder = StateGraph(DocumentState)
+    for name, fn in zip(STEPS, (retrieve, grade, websearch, generate, finalize)):
+        builder.add_node(name, fn)
+    return _chain(builder, checkpointer)
+
+
+def chunk_graph(corpus: List[Document], k: int, checkpointer):
+    def store(state):
+        return chunk_stores.store(state["request_id"])
+
+    def retrieve(state):
+        refs = store(state).add_scored((d, 1.0) for d in fetch(corpus, state["question"], k))
+        return {"chunk_ids": refs["ids"], "chunk_scores": refs["scores"]}
+
+    def grade(state):
+        return {"chunk_ids": list(state["chunk_ids"]), "chunk_scores": list(state["chunk_scores"])}
+
+    def websearch(state):
+        refs = store(state).add_documents(fetch(corpus, None, WEB_RESULTS))
+        return {
+            "chunk_ids": state["chunk_ids"] + refs["ids"],
+            "chunk_scores": state["chunk_scores"] + refs["scores"],
+        }
+
+    def generate(state):
+        context = "\n\n".join(store(state).texts(state["chunk_ids"]))
+        return {"generation": context[:40]}
+
+    def finalize(state):
+        sources = store(state).sources(state["chunk_ids"])
+        chunk_stores.release(state["request_id"])
+        return {"sources": sources}
+
+    builder = StateGraph(ChunkState)
+    for name, fn in zip(STEPS, (retrieve, grade, websearch, generate, finalize)):
+        builder.add_node(name, fn)
+    return _chain(builder, checkpointer)
+
+
+def run(app, requests: int, concurrency: int) -> float:
+    def one(i: int) -> None:
+        request_id = uuid.uuid4().hex
+        app.invoke(
+            {"question": f"question {i}", "request_id": request_id},
+            config={"configurable": {"thread_id": request_id}},
+        )
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return time.perf_counter() - start
+
+
+def measure(build, corpus, args):
+    checkpointer = MemorySaver() if args.checkpoint else None
+    app = build(corpus, args.k, checkpointer)
+    run(app, min(args.requests, args.concurrency), args.concurrency)  # warm up
+
+    elapsed = run(app, args.requests, args.concurrency)
+    step_us = elapsed / (args.requests * len(STEPS)) * 1e6
+
+    # Memory of in-flight requests; the checkpointer is left out because it
+    # retains every finished request's history.
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    run(build(corpus, args.k, None), args.concurrency * 4, args.concurrency)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_request_kb = (peak - base) / args.concurrency / 1024
+
+    checkpoint_kb = None
+    if checkpointer is not None:
+        sizes = [sum(len(c) + len(m) for c, m in saved.values()) for saved in checkpointer.storage.values()]
+        checkpoint_kb = sum(sizes) / len(sizes) / 1024
+    return step_us, per_request_kb, checkpoint_kb
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--chunk-chars", type=int, default=2000, help="characters per chunk")
+    parser.add_argument("--k", type=int, default=8, help="chunks retrieved per request")
+    parser.add_argument("--corpus", type=int, default=500)
+    parser.add_argument("--no-checkpoint", dest="checkpoint", action="store_false")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = make_corpus(random.Random(args.seed), args.corpus, args.chunk_chars)
+    print(f"{args.requests} requests, concurrency {args.concurrency}, k={args.k}, "
+          f"{args.chunk_chars} chars/chunk, checkpointing {'on' if args.checkpoint else 'off'}")
+    print(f"{'state':<12} {'us/step':>10} {'peak KB/req':>12} {'ckpt KB/req':>12}")  # us/step: wall time / all steps
+    for name, build in (("documents", documents_graph), ("chunk ids", chunk_graph)):
+        step_us, per_request_kb, checkpoint_kb = measure(build, corpus, args)
+        ckpt = f"{checkpoint_kb:>12.1f}" if checkpoint_kb is not None else f"{'-':>12}"
+        print(f"{name:<12} {step_us:>10.1f} {per_request_kb:>12.1f} {ckpt}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 from langchain import hub
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import ConfigurableField
 from langchain_openai import ChatOpenAI
 
-llm = ChatOpenAI(temperature=0)
+llm = ChatOpenAI(temperature=0).configurable_fields(
+    temperature=ConfigurableField(id="generation_temperature")
+)
 prompt = hub.pull("rlm/rag-prompt")
 
 generation_chain = prompt | llm | StrOutputParser()
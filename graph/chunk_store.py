@@ -0,0 +1,164 @@
+"""
+Request-scoped chunk store.
+
+Graph nodes used to hand the full list of ``Document`` objects from step to
+step, so LangGraph copied (and, with a checkpointer, serialized) every chunk's
+text and metadata at every step. Instead, retrieved and web-searched chunks
+are put in the request's :class:`ChunkStore` once, and ``GraphState`` carries
+only their IDs and scores. Nodes resolve text when they actually need it and
+``finalize`` materializes documents and sources at the end of the request.
+
+Chunk IDs are content hashes, so the same chunk gets the same ID on every
+retry and in every request, which also makes them good memoization keys.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from graph.memo import stable_hash
+from graph.state import ChunkRefs, GraphState
+
+DEFAULT_SCOPE = "default"
+
+
+def chunk_id(document: Document) -> str:
+    """Stable ID of a chunk, derived from its content and metadata."""
+    return stable_hash(document)[:20]
+
+
+class Chunk:
+    """One stored chunk; ``__slots__`` keeps the per-chunk overhead to three references."""
+
+    __slots__ = ("id", "text", "metadata")
+
+    def __init__(self, id: str, text: str, metadata: Dict[str, Any]) -> None:
+        self.id = id
+        self.text = text
+        self.metadata = metadata
+
+    def to_document(self) -> Document:
+        return Document(page_content=self.text, metadata=dict(self.metadata))
+
+
+class ChunkStore:
+    """Chunks seen by one request, keyed by :func:`chunk_id`."""
+
+    __slots__ = ("_chunks",)
+
+    def __init__(self) -> None:
+        self._chunks: Dict[str, Chunk] = {}
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def add(self, document: Document) -> str:
+        cid = chunk_id(document)
+        if cid not in self._chunks:
+            # dict.setdefault is atomic, so concurrent speculative tasks are safe.
+            self._chunks.setdefault(cid, Chunk(cid, document.page_content, dict(document.metadata or {})))
+        return cid
+
+    def add_scored(self, scored: Iterable[Tuple[Document, Optional[float]]]) -> ChunkRefs:
+        """Store ``(document, score)`` pairs and return references to them."""
+        ids: List[str] = []
+        scores: List[Optional[float]] = []
+        for document, score in scored:
+            ids.append(self.add(document))
+            scores.append(None if score is None else float(score))
+        return {"ids": ids, "scores": scores}
+
+    def add_documents(self, documents: Iterable[Document]) -> ChunkRefs:
+        return self.add_scored((d, None) for d in documents)
+
+    def get(self, cid: str) -> Chunk:
+        return self._chunks[cid]
+
+    def text(self, cid: str) -> str:
+        return self._chunks[cid].text
+
+    def texts(self, ids: Sequence[str]) -> List[str]:
+        return [self._chunks[cid].text for cid in ids]
+
+    def documents(self, ids: Sequence[str]) -> List[Document]:
+        return [self._chunks[cid].to_document() for cid in ids]
+
+    def sources(self, ids: Sequence[str]) -> List[Dict[str, Any]]:
+        return [dict(self._chunks[cid].metadata) for cid in ids]
+
+
+class ChunkStoreRegistry:
+    """
+    Live chunk stores, one per in-flight request.
+
+    ``finalize`` releases a request's store. The registry is also bounded so
+    requests that fail before reaching ``finalize`` can't leak their chunks,
+    but only stores idle for ``idle_s`` are evicted: a running request touches
+    its store at every step, and losing it would fail the request mid-graph.
+    Past ``max_stores`` with nothing idle, the registry grows instead.
+    """
+
+    def __init__(self, max_stores: int = 1024, idle_s: float = 600.0) -> None:
+        self.max_stores = max_stores
+        self.idle_s = idle_s
+        self._stores: "OrderedDict[str, ChunkStore]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def store(self, scope: str) -> ChunkStore:
+        now = time.monotonic()
+        with self._lock:
+            store = self._stores.get(scope)
+            if store is None:
+                store = self._stores[scope] = ChunkStore()
+            else:
+                self._stores.move_to_end(scope)
+            self._last_used[scope] = now
+            self._evict(now)
+            return store
+
+    def _evict(self, now: float) -> None:
+        # Least recently used first, so the first scope still in use ends the scan.
+        while len(self._stores) > self.max_stores:
+            oldest = next(iter(self._stores))
+            if now - self._last_used[oldest] < self.idle_s:
+                break
+            del self._stores[oldest]
+            del self._last_used[oldest]
+
+    def release(self, scope: str) -> None:
+        with self._lock:
+            self._stores.pop(scope, None)
+            self._last_used.pop(scope, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"stores": len(self._stores), "chunks": sum(len(s) for s in self._stores.values())}
+
+
+chunk_stores = ChunkStoreRegistry(
+    max_stores=int(os.getenv("RAG_MAX_CHUNK_STORES", "1024")),
+    idle_s=float(os.getenv("RAG_CHUNK_STORE_IDLE_S", "600")),
+)
+
+
+def store_for(state: GraphState) -> ChunkStore:
+    """The chunk store of the request ``state`` belongs to."""
+    return chunk_stores.store(state.get("request_id") or DEFAULT_SCOPE)
+
+
+def release_store(state: GraphState) -> None:
+    chunk_stores.release(state.get("request_id") or DEFAULT_SCOPE)
+
+
+def chunk_refs(state: GraphState) -> ChunkRefs:
+    """The request's current chunk IDs and scores."""
+    ids = list(state.get("chunk_ids") or [])
+    scores = list(state.get("chunk_scores") or [None] * len(ids))
+    return {"ids": ids, "scores": scores}
@@ -1,10 +1,12 @@
 from dotenv import load_dotenv
 from langgraph.graph import END, StateGraph
 from graph.chains.answer_grader import answer_grader
-from graph.chains.hallucination_grader import hallucination_grader
-from graph.chains.router import question_router, RouteQuery
-from graph.node_constants import RETRIEVE, GRADE_DOCUMENTS, GENERATE, WEBSEARCH
-from graph.nodes import generate, grade_documents, retrieve, web_search
+from graph.chains.hallucination_grader import GradeHallucinations, hallucination_grader
+from graph.chunk_store import release_store, store_for
+from graph.grounding import check_grounding, grounding_precheck_enabled, grounding_stats
+from graph.memo import cache_scope, memo_cache, memoized
+from graph.node_constants import ROUTE_QUESTION, RETRIEVE, GRADE_DOCUMENTS, GENERATE, WEBSEARCH
+from graph.nodes import generate, grade_documents, retrieve, route_question, web_search
 from graph.state import GraphState
 from typing import Dict, Any
 
@@ -19,16 +21,38 @@ def decide_to_generate(state: GraphState):
         print("---DECISION: GENERATE---")
         return GENERATE
 
+def grade_hallucinations(state: GraphState, chunk_ids, generation: str) -> GradeHallucinations:
+    documents = store_for(state).documents(chunk_ids)
+    if not grounding_precheck_enabled(state):
+        return hallucination_grader.invoke({"documents": documents, "generation": generation})
+    check = check_grounding(generation, documents)
+    grounding_stats.record(check)
+    if check.grounded:
+        print("---GROUNDING PRE-CHECK: EVERY SENTENCE SUPPORTED, SKIPPING GRADER---")
+        return GradeHallucinations(binary_score=True)
+    print(f"---GROUNDING PRE-CHECK: GRADING ON {check.excerpt_chars}/{check.full_chars} CHARS OF EXCERPTS---")
+    return hallucination_grader.invoke({"documents": check.excerpts, "generation": generation})
+
 def grade_generation_grounded_in_documents_and_question(state: GraphState) -> str:
     print("---CHECK HALLUCINATIONS---")
     question = state["question"]
-    documents = state.get("documents", [])
+    chunk_ids = state.get("chunk_ids", []) or []
     generation = state.get("generation", "")
 
-    score = hallucination_grader.invoke({"documents": documents, "generation": generation})
+    score = memoized(
+        "hallucination_grader",
+        state,
+        (chunk_ids, generation, grounding_precheck_enabled(state)),
+        lambda: grade_hallucinations(state, chunk_ids, generation),
+    )
     if score.binary_score:  # grounded
         print("---DECISION: GENERATION IS GROUNDED---")
-        score2 = answer_grader.invoke({"question": question, "generation": generation})
+        score2 = memoized(
+            "answer_grader",
+            state,
+            (question, generation),
+            lambda: answer_grader.invoke({"question": question, "generation": generation}),
+        )
         if score2.binary_score:
             print("---DECISION: GENERATION ADDRESSES QUESTION---")
             return "useful"
@@ -39,10 +63,8 @@ def grade_generation_grounded_in_documents_and_question(state: GraphState) -> st
         print("---DECISION: NOT GROUNDED → RE-TRY---")
         return "not supported"
 
-def route_question(state: GraphState) -> str:
-    print("---ROUTE QUESTION---")
-    source: RouteQuery = question_router.invoke({"question": state["question"]})
-    if source.datasource == WEBSEARCH:
+def decide_route(state: GraphState) -> str:
+    if state.get("datasource") == WEBSEARCH:
         print("---ROUTE QUESTION TO WEB SEARCH---")
         return WEBSEARCH
     else:
@@ -50,30 +72,32 @@ def route_question(state: GraphState) -> str:
         return RETRIEVE
 
 def finalize(state: GraphState) -> Dict[str, Any]:
-    docs = state.get("documents", []) or []
-    sources = []
-    for d in docs:
-        try:
-            sources.append(getattr(d, "metadata", {}))
-        except Exception:
-            pass
+    memo_cache.drop_scope(cache_scope(state))
+    store = store_for(state)
+    chunk_ids = state.get("chunk_ids", []) or []
+    documents = store.documents(chunk_ids)
+    release_store(state)
     return {
         "generation": state.get("generation", ""),
-        "doc_count": len(docs),
-        "sources": sources,
+        "documents": documents,
+        "doc_count": len(documents),
+        "sources": [d.metadata for d in documents],
         "used_web_search": bool(state.get("used_web_search", False)),
         "route": state.get("route", "vector"),
     }
 
 workflow = StateGraph(GraphState)
+workflow.add_node(ROUTE_QUESTION, route_question)
 workflow.add_node(RETRIEVE, retrieve)
 workflow.add_node(GRADE_DOCUMENTS, grade_documents)
 workflow.add_node(GENERATE, generate)
 workflow.add_node(WEBSEARCH, web_search)
 workflow.add_node("finalize", finalize)
 
-workflow.set_conditional_entry_point(
-    route_question,
+workflow.set_entry_point(ROUTE_QUESTION)
+workflow.add_conditional_edges(
+    ROUTE_QUESTION,
+    decide_route,
     { WEBSEARCH: WEBSEARCH, RETRIEVE: RETRIEVE },
 )
 
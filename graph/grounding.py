@@ -0,0 +1,360 @@
+"""
+Local sentence-level grounding pre-check for the hallucination grader.
+
+The hallucination grader gets every chunk of the request in its prompt, on
+every generation and every retry, which makes it the largest prompt in the
+graph. Most generations copy or closely restate their sources, and that can
+be checked without an LLM: the generation is split into sentences, the
+chunks into spans of consecutive sentences, and each sentence is matched
+against the spans with one TF-IDF similarity matrix product plus
+IDF-weighted word and bigram coverage.
+
+If every sentence is covered by a single span, including all of its numbers
+and names in the source's order, the generation is accepted without calling
+the grader. Otherwise the grader is still asked, but only sees the spans
+that best support each sentence instead of the full documents. The
+pre-check never rejects a generation on its own: paraphrases and summaries
+score low here and are left to the grader.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from graph.state import GraphState
+
+_TRUTHY = {"1", "true", "yes", "on"}
+
+DEFAULT_ACCEPT = 0.85
+DEFAULT_BIGRAM_ACCEPT = 0.5
+DEFAULT_SPANS_PER_SENTENCE = 2
+DEFAULT_CONTEXT_SENTENCES = 0
+# Sentences per span: generations often fuse two neighbouring source sentences into one.
+SPAN_SENTENCES = 2
+
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\s*\n\s*")
+_TOKEN = re.compile(r"[A-Za-z0-9]+(?:[.,'][A-Za-z0-9]+)*")
+# A period after these ends an abbreviation, not a sentence.
+_ABBREVIATION = re.compile(r"(?:\b(?:al|e\.g|i\.e|etc|vs|cf|fig|eq|no|dr|mr|ms)|\b[A-Z])\.$", re.IGNORECASE)
+# Negations stay content words: dropping them would make "X is not Y" match "X is Y".
+_STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had
+has have having he her here hers herself him himself his how i if in into is it its itself just
+let me more most my myself of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves one ones may might must shall us
+""".split())
+_SUFFIXES = ("ing", "ed", "es", "s", "ly")
+
+
+def grounding_precheck_enabled(state: GraphState) -> bool:
+    """Per-request ``grounding_precheck`` flag, falling back to RAG_GROUNDING_PRECHECK."""
+    if "grounding_precheck" in state:
+        return bool(state["grounding_precheck"])
+    return os.getenv("RAG_GROUNDING_PRECHECK", "").lower() in _TRUTHY
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences and lines of ``text``, without empty fragments."""
+    sentences: List[str] = []
+    glue = False
+    for fragment in _SENTENCE_BREAK.split(text):
+        fragment = fragment.strip() if fragment else ""
+        if not fragment:
+            continue
+        if glue:
+            sentences[-1] = f"{sentences[-1]} {fragment}"
+        else:
+            sentences.append(fragment)
+        glue = bool(_ABBREVIATION.search(fragment))
+    return sentences
+
+
+def _stem(token: str) -> str:
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)]
+    return token
+
+
+@lru_cache(maxsize=65536)
+def _features(sentence: str) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+    """
+    Content words (stemmed), word bigrams and key terms of one sentence, and
+    its content words in order with repeats.
+
+    Key terms are numbers and names (capitalized words, acronyms), which a
+    supporting span must contain verbatim and in the same order. A
+    capitalized first word counts too: it is usually the subject, and
+    copying a definition under another subject changes the claim.
+    """
+    words, terms = [], []
+    for token in _TOKEN.findall(sentence):
+        lower = token.lower()
+        if lower in _STOPWORDS:
+            continue
+        word = _stem(lower.replace(",", ""))
+        words.append(word)
+        if any(c.isdigit() for c in token) or any(c.isupper() for c in token[1:]) or token[0].isupper():
+            terms.append(word)
+    bigrams = tuple(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return tuple(dict.fromkeys(words)), tuple(dict.fromkeys(bigrams)), tuple(dict.fromkeys(terms)), tuple(words)
+
+
+@lru_cache(maxsize=4096)
+def _chunk_sentences(text: str) -> Tuple[str, ...]:
+    # Chunks come back on every retry; split each one once.
+    return tuple(split_sentences(text))
+
+
+@dataclass
+class SentenceSupport:
+    """How well one generated sentence is covered by its best spans."""
+
+    text: str
+    coverage: float  # IDF-weighted share of its content words found in the best span
+    bigram_coverage: float
+    missing_terms: List[str]  # numbers and names no single sentence of the best span holds
+    terms_in_order: bool  # the others appear in that sentence in the same order
+    spans: List[int]  # indices into GroundingCheck.spans, best first
+    supported: bool
+
+
+@dataclass
+class GroundingCheck:
+    """Result of :func:`check_grounding`."""
+
+    grounded: bool  # accepted without the LLM grader
+    sentences: List[SentenceSupport]
+    spans: List[Tuple[int, int, int]] = field(default_factory=list)  # (document, first, stop sentence)
+    excerpts: List[Document] = field(default_factory=list)  # grader input when not grounded
+    full_chars: int = 0
+    excerpt_chars: int = 0
+
+
+class _Vocabulary(dict):
+    def ids(self, features: Sequence[str]) -> List[int]:
+        return [self.setdefault(f, len(self)) for f in features]
+
+
+def _binary(rows: Sequence[List[int]], width: int) -> np.ndarray:
+    matrix = np.zeros((len(rows), width), dtype=np.float32)
+    for i, ids in enumerate(rows):
+        matrix[i, ids] = 1.0
+    return matrix
+
+
+def check_grounding(
+    generation: str,
+    documents: Sequence[Document],
+    accept: Optional[float] = None,
+    bigram_accept: Optional[float] = None,
+    spans_per_sentence: Optional[int] = None,
+    context_sentences: Optional[int] = None,
+) -> GroundingCheck:
+    """
+    Match each sentence of ``generation`` to its best-supporting document spans.
+
+    Args:
+        generation: Generated answer
+        documents: Chunks the answer was generated from
+        accept: Minimum IDF-weighted share of a sentence's content words that
+            one span must contain for the sentence to count as supported
+            (RAG_GROUNDING_ACCEPT, default 0.85)
+        bigram_accept: Minimum share of its word bigrams in that span as well
+            (RAG_GROUNDING_BIGRAM_ACCEPT, default 0.5)
+        spans_per_sentence: Best spans per sentence sent to the grader as
+            excerpts (RAG_GROUNDING_SPANS, default 2)
+        context_sentences: Neighbouring sentences added on each side of a
+            span in the excerpts (RAG_GROUNDING_CONTEXT, default 0)
+
+    Returns:
+        A :class:`GroundingCheck`; ``grounded`` is set only when every sentence
+        with content words is supported, and ``excerpts`` holds the grader
+        input otherwise
+    """
+    accept = float(os.getenv("RAG_GROUNDING_ACCEPT", DEFAULT_ACCEPT)) if accept is None else accept
+    if bigram_accept is None:
+        bigram_accept = float(os.getenv("RAG_GROUNDING_BIGRAM_ACCEPT", DEFAULT_BIGRAM_ACCEPT))
+    if spans_per_sentence is None:
+        spans_per_sentence = int(os.getenv("RAG_GROUNDING_SPANS", DEFAULT_SPANS_PER_SENTENCE))
+    if context_sentences is None:
+        context_sentences = int(os.getenv("RAG_GROUNDING_CONTEXT", DEFAULT_CONTEXT_SENTENCES))
+
+    full_chars = sum(len(d.page_content) for d in documents)
+    sentences = [s for s in split_sentences(generation) if _features(s)[0]]
+    spans = [
+        (i, j, min(j + SPAN_SENTENCES, n))
+        for i, n in enumerate(len(_chunk_sentences(d.page_content)) for d in documents)
+        for j in range(max(n - SPAN_SENTENCES + 1, 1) if n else 0)
+    ]
+    if not sentences or not spans:
+        return GroundingCheck(False, [], spans, list(documents), full_chars, full_chars)
+
+    span_texts = [" ".join(_chunk_sentences(documents[i].page_content)[j:k]) for i, j, k in spans]
+    vocabulary = _Vocabulary()
+    span_words = [vocabulary.ids(_features(t)[0]) for t in span_texts]
+    span_bigrams = [vocabulary.ids(_features(t)[1]) for t in span_texts]
+    sentence_words = [vocabulary.ids(_features(s)[0]) for s in sentences]
+    sentence_bigrams = [vocabulary.ids(_features(s)[1]) for s in sentences]
+    width = len(vocabulary)
+
+    in_span = _binary([w + b for w, b in zip(span_words, span_bigrams)], width)
+    in_sentence = _binary([w + b for w, b in zip(sentence_words, sentence_bigrams)], width)
+    sentence_bigram_rows = _binary(sentence_bigrams, width)
+    # Features the spans never use get the highest weight, so unsupported words cost the most.
+    idf = np.log((1.0 + len(spans)) / (1.0 + in_span.sum(axis=0))) + 1.0
+    span_vectors = in_span * idf
+    span_vectors /= np.linalg.norm(span_vectors, axis=1, keepdims=True) + 1e-9
+    sentence_vectors = in_sentence * idf
+    weights = sentence_vectors.copy()
+    sentence_vectors /= np.linalg.norm(sentence_vectors, axis=1, keepdims=True) + 1e-9
+
+    # (sentences, spans): cosine similarity, and the IDF-weighted share of each
+    # sentence's words and the share of its bigrams that each span contains.
+    # Coverage is judged against one span at a time: pooling spans would let a
+    # name from one passage complete a claim made about another.
+    similarity = sentence_vectors @ span_vectors.T
+    word_weights = np.zeros_like(weights)
+    for s, words in enumerate(sentence_words):
+        word_weights[s, words] = weights[s, words]
+    coverage = (word_weights @ in_span.T) / word_weights.sum(axis=1, keepdims=True)
+    bigram_coverage = (sentence_bigram_rows @ in_span.T) / np.maximum(sentence_bigram_rows.sum(axis=1, keepdims=True), 1)
+    bigram_coverage[sentence_bigram_rows.sum(axis=1) == 0] = 1.0
+    ranking = 0.5 * similarity + 0.5 * coverage
+    top = np.argsort(-ranking, axis=1, kind="stable")[:, :spans_per_sentence]
+
+    results = []
+    for s, sentence in enumerate(sentences):
+        best = [int(p) for p in top[s] if ranking[s, p] > 0]
+        first = best[0] if best else 0
+        missing, in_order = _check_terms(sentence, documents, spans[first])
+        supported = bool(
+            best
+            and coverage[s, first] >= accept
+            and bigram_coverage[s, first] >= bigram_accept
+            and not missing
+            and in_order
+        )
+        results.append(SentenceSupport(
+            sentence, float(coverage[s, first]), float(bigram_coverage[s, first]), missing, in_order, best, supported
+        ))
+
+    grounded = all(r.supported for r in results)
+    excerpts = [] if grounded else _excerpts(documents, spans, results, context_sentences) or list(documents)
+    return GroundingCheck(
+        grounded, results, spans, excerpts, full_chars, sum(len(d.page_content) for d in excerpts)
+    )
+
+
+def _check_terms(
+    sentence: str, documents: Sequence[Document], span: Tuple[int, int, int]
+) -> Tuple[List[str], bool]:
+    """
+    Key terms of ``sentence`` absent from the span sentence closest to it,
+    and whether the present ones appear there in the same order.
+
+    All of a sentence's numbers and names must come from the one source
+    sentence that shares the most of its content words: otherwise a citation
+    could be attached to a method named in the neighbouring sentence, or a
+    definition copied under the subject of the next one. Coverage is a bag of
+    words, so order is checked separately: "rose from 60% to 20%" has every
+    word of "rose from 20% to 60%".
+    """
+    words, _, terms, _ = _features(sentence)
+    if not terms:
+        return [], True
+    doc, first, stop = span
+    closest = max(
+        _chunk_sentences(documents[doc].page_content)[first:stop],
+        key=lambda source: len(set(words) & set(_features(source)[0])),
+    )
+    source_words = _features(closest)[3]
+    missing = [t for t in terms if t not in source_words]
+    # Subsequence test: each term must be found after the previous one.
+    remaining = iter(source_words)
+    in_order = all(t in remaining for t in terms if t not in missing)
+    return missing, in_order
+
+
+def _excerpts(
+    documents: Sequence[Document],
+    spans: List[Tuple[int, int, int]],
+    results: List[SentenceSupport],
+    context_sentences: int,
+) -> List[Document]:
+    """The supporting spans of every sentence, with context, merged per document in document order."""
+    selected: Dict[int, set] = {}
+    for result in results:
+        for p in result.spans:
+            doc, first, stop = spans[p]
+            last = len(_chunk_sentences(documents[doc].page_content))
+            lo, hi = max(0, first - context_sentences), min(last, stop + context_sentences)
+            selected.setdefault(doc, set()).update(range(lo, hi))
+
+    excerpts = []
+    for doc in sorted(selected):
+        sentences = _chunk_sentences(documents[doc].page_content)
+        runs, previous = [], None
+        for j in sorted(selected[doc]):
+            if previous is not None and j == previous + 1:
+                runs[-1].append(sentences[j])
+            else:
+                runs.append([sentences[j]])
+            previous = j
+        text = " ... ".join(" ".join(run) for run in runs)
+        excerpts.append(Document(page_content=text, metadata=dict(documents[doc].metadata)))
+    return excerpts
+
+
+class GroundingStats:
+    """Thread-safe counters of grader calls and prompt text the pre-check saved."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checks = 0
+            self.accepted = 0
+            self.excerpted = 0
+            self.full_chars = 0
+            self.sent_chars = 0
+
+    def record(self, check: GroundingCheck) -> None:
+        with self._lock:
+            self.checks += 1
+            self.full_chars += check.full_chars
+            if check.grounded:
+                self.accepted += 1
+            else:
+                self.excerpted += 1
+                self.sent_chars += check.excerpt_chars
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checks": self.checks,
+                "accepted_without_llm": self.accepted,
+                "graded_on_excerpts": self.excerpted,
+                "document_chars": self.full_chars,
+                "document_chars_sent": self.sent_chars,
+                # share of the grader's document text that never reached it
+                "chars_saved_ratio": (
+                    round(1.0 - self.sent_chars / self.full_chars, 4) if self.full_chars else None
+                ),
+            }
+
+
+grounding_stats = GroundingStats()
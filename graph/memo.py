@@ -0,0 +1,171 @@
+"""
+Memoization for graph nodes and grader calls.
+
+With ``temperature=0`` the corrective loop can ask for exactly the same
+generation, or the same grade, more than once in a request. Results are cached
+under a stable hash of the inputs that determine them, scoped to the request
+(``request_id``) or, when cross-request caching is enabled, shared by all
+requests. Results that go stale, such as web searches, are stored with a
+time-to-live. Counters report how much repeated work was avoided.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from graph.state import GraphState
+
+_TRUTHY = {"1", "true", "yes", "on"}
+GLOBAL_SCOPE = "*"
+
+
+def _canonical(value: Any) -> Any:
+    if hasattr(value, "page_content"):
+        return {"content": value.page_content, "metadata": _canonical(getattr(value, "metadata", {}))}
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+
+def stable_hash(*parts: Any) -> str:
+    """Hash of the given values that is stable across processes and runs."""
+    payload = json.dumps(_canonical(parts), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_scope(state: GraphState) -> str:
+    """Cache scope for a request: its ``request_id``, or global when sharing is enabled."""
+    shared = state.get("cross_request_cache")
+    if shared is None:
+        shared = os.getenv("RAG_CROSS_REQUEST_CACHE", "").lower() in _TRUTHY
+    if shared:
+        return GLOBAL_SCOPE
+    return state.get("request_id") or GLOBAL_SCOPE
+
+
+class MemoCache:
+    """Thread-safe LRU of memoized results with per-name hit counters."""
+
+    def __init__(self, max_entries: int = 2048) -> None:
+        self.max_entries = max_entries
+        # (name, scope, key) -> (value, seconds to compute, monotonic expiry or None)
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[Any, float, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        # scope -> tokens of computations in flight; drop_scope discards them so late results aren't stored.
+        self._in_flight: Dict[str, Set[object]] = {}
+
+    def _counter(self, name: str) -> Dict[str, float]:
+        return self._stats.setdefault(name, {"hits": 0, "misses": 0, "seconds_saved": 0.0})
+
+    def get_or_compute(
+        self, name: str, scope: str, key: str, compute: Callable[[], Any], ttl: Optional[float] = None
+    ) -> Any:
+        """
+        Return the cached result for ``(name, scope, key)`` or compute and store it.
+
+        Args:
+            name: Node or grader name, used for the counters
+            scope: Result of :func:`cache_scope`
+            key: Result of :func:`stable_hash` over the inputs
+            compute: Produces the result on a miss
+            ttl: Seconds the result stays valid; ``None`` keeps it until evicted
+
+        Returns:
+            The cached or freshly computed result
+        """
+        entry_key = (name, scope, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                del self._entries[entry_key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(entry_key)
+                counter = self._counter(name)
+                counter["hits"] += 1
+                counter["seconds_saved"] += entry[1]
+                print(f"---MEMO: REUSING {name.upper()} RESULT---")
+                return entry[0]
+            token = object()
+            self._in_flight.setdefault(scope, set()).add(token)
+
+        start = time.perf_counter()
+        try:
+            value = compute()
+        except BaseException:
+            with self._lock:
+                self._finish(scope, token)
+            raise
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._counter(name)["misses"] += 1
+            if not self._finish(scope, token):
+                # The request finished while this ran (e.g. a grader call left behind by an early exit).
+                return value
+            self._entries[entry_key] = (value, elapsed, None if ttl is None else time.monotonic() + ttl)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def _finish(self, scope: str, token: object) -> bool:
+        """Retire an in-flight computation; False if its scope was dropped meanwhile."""
+        tokens = self._in_flight.get(scope)
+        if tokens is None or token not in tokens:
+            return False
+        tokens.discard(token)
+        if not tokens:
+            del self._in_flight[scope]
+        return True
+
+    def drop_scope(self, scope: str) -> None:
+        """Forget a finished request's entries, including results still being computed."""
+        if scope == GLOBAL_SCOPE:
+            return
+        with self._lock:
+            self._in_flight.pop(scope, None)
+            for entry_key in [k for k in self._entries if k[1] == scope]:
+                del self._entries[entry_key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+            self._in_flight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            per_name = {name: dict(c, seconds_saved=round(c["seconds_saved"], 4)) for name, c in self._stats.items()}
+            return {
+                "entries": len(self._entries),
+                "hits": sum(c["hits"] for c in per_name.values()),
+                "misses": sum(c["misses"] for c in per_name.values()),
+                "seconds_saved": round(sum(c["seconds_saved"] for c in per_name.values()), 4),
+                "by_name": per_name,
+            }
+
+
+memo_cache = MemoCache(max_entries=int(os.getenv("RAG_MEMO_MAX_ENTRIES", "2048")))
+
+
+def memoized(
+    name: str,
+    state: GraphState,
+    key_parts: Tuple[Any, ...],
+    compute: Callable[[], Any],
+    ttl: Optional[float] = None,
+) -> Any:
+    """Memoize ``compute`` under ``key_parts`` in the request's cache scope, for ``ttl`` seconds if given."""
+    return memo_cache.get_or_compute(name, cache_scope(state), stable_hash(*key_parts), compute, ttl)
@@ -1,3 +1,4 @@
+ROUTE_QUESTION = "route_question"
 RETRIEVE = "retrieve"
 GRADE_DOCUMENTS = "grade_documents"
 GENERATE = "generate"
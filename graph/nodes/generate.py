@@ -1,6 +1,9 @@
 from __future__ import annotations
+import os
 from typing import Any, Dict, List
 
+from graph.chunk_store import store_for
+from graph.memo import memoized, stable_hash
 from graph.state import GraphState
 
 try:
@@ -11,8 +14,11 @@ except Exception as e:
         from langchain_openai import ChatOpenAI
         from langchain_core.prompts import ChatPromptTemplate
         from langchain_core.output_parsers import StrOutputParser
+        from langchain_core.runnables import ConfigurableField
 
-        _llm = ChatOpenAI(temperature=0)
+        _llm = ChatOpenAI(temperature=0).configurable_fields(
+            temperature=ConfigurableField(id="generation_temperature")
+        )
         _prompt = ChatPromptTemplate.from_template(
             "You are a helpful assistant. Use ONLY the context to answer.\n\n"
             "Context:\n{context}\n\n"
@@ -24,30 +30,52 @@ except Exception as e:
         print("[generate] Could not build fallback chain:", ee)
         generation_chain = None
 
+RETRY_TEMPERATURE_STEP = float(os.getenv("RAG_RETRY_TEMPERATURE_STEP", "0.3"))
+MAX_RETRY_TEMPERATURE = float(os.getenv("RAG_MAX_RETRY_TEMPERATURE", "1.0"))
+
+def _retry_temperature(attempt: int) -> float:
+    """Temperature for the n-th generation over unchanged inputs (0 = first try)."""
+    return min(MAX_RETRY_TEMPERATURE, RETRY_TEMPERATURE_STEP * attempt)
+
+def _invoke_chain(context_text: str, question: str, temperature: float) -> str:
+    return generation_chain.invoke(
+        {"context": context_text, "question": question},
+        config={"configurable": {"generation_temperature": temperature}},
+    )
+
 def generate(state: GraphState) -> Dict[str, Any]:
     print("---GENERATE---")
     q = state["question"]
-    docs = state.get("documents", []) or []
-
-    context_text = "\n\n".join([getattr(d, "page_content", str(d)) for d in docs])
+    chunk_ids = state.get("chunk_ids", []) or []
 
     if generation_chain is None:
         return {
             "question": q,
-            "documents": docs,
             "generation": "Generation chain is not available (import/build error).",
             "web_search": state.get("web_search", False),
             "used_web_search": state.get("used_web_search", False),
             "route": state.get("route", "vector"),
         }
 
-    generation = generation_chain.invoke({"context": context_text, "question": q})
+    # Re-generating over the same inputs at temperature 0 would just return the
+    # same answer, so a retry changes an input: the sampling temperature.
+    inputs_key = stable_hash(q, chunk_ids)
+    attempt = state.get("generation_attempt", 0) + 1 if state.get("generation_inputs") == inputs_key else 0
+    temperature = _retry_temperature(attempt)
+    if attempt:
+        print(f"---GENERATE: RETRY {attempt} AT TEMPERATURE {temperature:.2f}---")
+
+    # Chunk text is only resolved when the chain actually runs.
+    store = store_for(state)
+    run = lambda: _invoke_chain("\n\n".join(store.texts(chunk_ids)), q, temperature)
+    generation = memoized("generate", state, (inputs_key,), run) if temperature == 0 else run()
 
     return {
         "question": q,
-        "documents": docs,
         "generation": generation,
         "web_search": state.get("web_search", False),
         "used_web_search": state.get("used_web_search", False),
         "route": state.get("route", "vector"),
+        "generation_inputs": inputs_key,
+        "generation_attempt": attempt,
     }
@@ -1,25 +1,136 @@
 from __future__ import annotations
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from graph.chains.retrieval_grader import retrieval_grader
-from graph.state import GraphState
-from typing import Any, Dict, List
+from graph.chunk_store import ChunkStore, chunk_refs, store_for
+from graph.memo import memoized
+from graph.state import ChunkRefs, GraphState
+from typing import Any, Dict, List, Optional
+
+_TRUTHY = {"1", "true", "yes", "on"}
+
+_grading_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RAG_GRADER_WORKERS", "8")),
+    thread_name_prefix="grade",
+)
+_fallback_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="grade-fallback")
+
+def _is_relevant(state: GraphState, store: ChunkStore, question: str, cid: str) -> bool:
+    # Chunk IDs are content hashes, so they key the cache as well as the text would.
+    score = memoized(
+        "retrieval_grader",
+        state,
+        (question, cid),
+        lambda: retrieval_grader.invoke({"question": question, "document": store.text(cid)}),
+    )
+    return str(score.binary_score).lower() == "yes"
+
+def _incremental_enabled(state: GraphState) -> bool:
+    if "incremental_grading" in state:
+        return bool(state["incremental_grading"])
+    return os.getenv("RAG_INCREMENTAL_GRADING", "").lower() in _TRUTHY
+
+def _relevance_threshold(state: GraphState, n_docs: int) -> int:
+    """Relevant documents needed to skip web search; defaults to all of them."""
+    threshold = state.get("min_relevant_docs")
+    if threshold is None:
+        threshold = int(os.getenv("RAG_MIN_RELEVANT_DOCS", "0")) or n_docs
+    return max(1, min(int(threshold), n_docs))
+
+def _start_web_fallback(state: GraphState, question: str) -> Future:
+    from graph.nodes.web_search import WEB_SEARCH_TTL, search_web
+    return _fallback_pool.submit(
+        memoized, "web_search", state, (question,), lambda: search_web(question), WEB_SEARCH_TTL
+    )
+
+def _collect_web_fallback(store: ChunkStore, future: Optional[Future]) -> Optional[ChunkRefs]:
+    if future is None:
+        return None
+    try:
+        return store.add_documents(future.result())
+    except Exception as e:
+        print(f"[grade_documents] Early web search failed, websearch node will retry: {e}")
+        return None
+
+def _grade_incrementally(state: GraphState, question: str, refs: ChunkRefs, threshold: int) -> Dict[str, Any]:
+    """
+    Grade documents concurrently and act on verdicts as they arrive.
+
+    Stops as soon as ``threshold`` documents are relevant, and starts the
+    web-search fallback the moment the threshold has become unreachable so it
+    overlaps with the verdicts still in flight.
+    """
+    store = store_for(state)
+    futures = {
+        _grading_pool.submit(_is_relevant, state, store, question, cid): i
+        for i, cid in enumerate(refs["ids"])
+    }
+    pending = set(futures)
+    relevant: List[int] = []
+    web_future: Optional[Future] = None
+    early_exit = False
+
+    while pending and not early_exit:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            i = futures[f]
+            try:
+                is_relevant = f.result()
+            except Exception as e:
+                print(f"[grade_documents] Grading failed for document {i}: {e}")
+                is_relevant = False
+            if is_relevant:
+                relevant.append(i)
+
+        if len(relevant) >= threshold:
+            early_exit = True
+            # Calls already running can't be cancelled; once finalize drops the
+            # request's memo scope, their results are discarded instead of cached.
+            for f in pending:
+                f.cancel()
+            print(f"---GRADE: {len(relevant)} RELEVANT DOCS, SKIPPING {len(pending)} REMAINING---")
+        elif web_future is None and len(relevant) + len(pending) < threshold:
+            print("---GRADE: THRESHOLD UNREACHABLE → STARTING WEB SEARCH---")
+            web_future = _start_web_fallback(state, question)
+
+    trigger_web = len(relevant) < threshold
+    relevant.sort()
+    return {
+        "chunk_ids": [refs["ids"][i] for i in relevant],
+        "chunk_scores": [refs["scores"][i] for i in relevant],
+        "web_search": trigger_web,
+        "prefetched_web": _collect_web_fallback(store, web_future) if trigger_web else None,
+    }
 
 def grade_documents(state: GraphState) -> Dict[str, Any]:
     print("---CHECK DOCUMENT RELEVANCE TO QUESTION---")
     question = state["question"]
-    documents = state.get("documents", []) or []
+    refs = chunk_refs(state)
+
+    if refs["ids"] and _incremental_enabled(state):
+        graded = _grade_incrementally(state, question, refs, _relevance_threshold(state, len(refs["ids"])))
+        return {
+            "question": question,
+            **graded,
+            "used_web_search": state.get("used_web_search", False),
+            "route": "hybrid" if graded["web_search"] else "vector",
+        }
 
-    filtered_docs = []
+    store = store_for(state)
+    filtered_ids = []
+    filtered_scores = []
     trigger_web = False
-    for d in documents:
-        score = retrieval_grader.invoke({"question": question, "document": d.page_content})
-        if str(score.binary_score).lower() == "yes":
-            filtered_docs.append(d)
+    for cid, score in zip(refs["ids"], refs["scores"]):
+        if _is_relevant(state, store, question, cid):
+            filtered_ids.append(cid)
+            filtered_scores.append(score)
         else:
             trigger_web = True
 
     return {
         "question": question,
-        "documents": filtered_docs,
+        "chunk_ids": filtered_ids,
+        "chunk_scores": filtered_scores,
         "web_search": trigger_web,
         "used_web_search": state.get("used_web_search", False),
         "route": "hybrid" if trigger_web else "vector",
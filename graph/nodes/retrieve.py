@@ -1,17 +1,23 @@
 from __future__ import annotations
 from typing import Any, Dict
+from graph.chunk_store import store_for
 from graph.state import GraphState
-from ingestion import get_retriever
+from retrieval import retrieve_scored
 
 def retrieve(state: GraphState) -> Dict[str, Any]:
     print("---RETRIEVE---")
     q = state["question"]
-    retriever = get_retriever()
-    documents = retriever.invoke(q)
+    refs = state.get("prefetched_chunks")
+    if refs is None:
+        refs = store_for(state).add_scored(retrieve_scored(q, state.get("retrieval")))
+    else:
+        print("---RETRIEVE: USING SPECULATIVE RESULTS---")
     return {
         "question": q,
-        "documents": documents,
+        "chunk_ids": refs["ids"],
+        "chunk_scores": refs["scores"],
         "web_search": state.get("web_search", False),
         "used_web_search": state.get("used_web_search", False),
         "route": "vector",
+        "prefetched_chunks": None,
     }
@@ -0,0 +1,38 @@
+from __future__ import annotations
+import uuid
+from functools import partial
+from typing import Any, Dict, Optional
+from graph.chains.router import question_router, RouteQuery
+from graph.chunk_store import ChunkStore, store_for
+from graph.speculation import speculate_web_enabled, speculation_enabled, speculative_route
+from graph.state import ChunkRefs, GraphState
+
+def _route(question: str) -> str:
+    source: RouteQuery = question_router.invoke({"question": question})
+    return source.datasource
+
+def _retrieve(question: str, store: ChunkStore, options: Optional[Dict[str, Any]] = None) -> ChunkRefs:
+    from retrieval import retrieve_scored
+    return store.add_scored(retrieve_scored(question, options))
+
+def _search_web(question: str, store: ChunkStore) -> ChunkRefs:
+    from graph.nodes.web_search import search_web
+    return store.add_documents(search_web(question))
+
+def route_question(state: GraphState) -> Dict[str, Any]:
+    print("---ROUTE QUESTION---")
+    question = state["question"]
+    request_id = state.get("request_id") or uuid.uuid4().hex
+
+    if not speculation_enabled(state):
+        return {"question": question, "request_id": request_id, "datasource": _route(question)}
+
+    print("---ROUTE QUESTION: SPECULATIVE RETRIEVAL---")
+    store = store_for({"request_id": request_id})
+    update = speculative_route(
+        question,
+        _route,
+        partial(_retrieve, store=store, options=state.get("retrieval")),
+        partial(_search_web, store=store) if speculate_web_enabled(state) else None,
+    )
+    return {"question": question, "request_id": request_id, **update}
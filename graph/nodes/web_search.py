@@ -1,30 +1,45 @@
 from __future__ import annotations  # optional, but helps
 from langchain.schema import Document
 from langchain_community.tools.tavily_search import TavilySearchResults
+from graph.chunk_store import chunk_refs, store_for
+from graph.memo import memoized
 from graph.state import GraphState
 from typing import Any, Dict, List
+import os
 
 web_search_tool = TavilySearchResults(k=3)
+# Web results go stale; shared across requests they are reused for this long.
+WEB_SEARCH_TTL = float(os.getenv("RAG_WEB_SEARCH_TTL", "600"))
 
-def web_search(state: GraphState) -> Dict[str, Any]:
-    print("---WEB SEARCH---")
-    question = state["question"]
-    documents: List[Document] = state.get("documents", []) or []
-
+def search_web(question: str) -> List[Document]:
+    """Run the Tavily search and wrap each hit as a Document."""
     results = web_search_tool.invoke({"query": question})  # list[dict]
-    web_docs = [
+    return [
         Document(
             page_content=r.get("content", ""),
             metadata={**{k: v for k, v in r.items() if k != "content"}, "source": "tavily"},
         )
         for r in results if r.get("content")
     ]
-    documents.extend(web_docs)
+
+def web_search(state: GraphState) -> Dict[str, Any]:
+    print("---WEB SEARCH---")
+    question = state["question"]
+    refs = chunk_refs(state)
+
+    web_refs = state.get("prefetched_web")
+    if web_refs is None:
+        web_docs = memoized("web_search", state, (question,), lambda: search_web(question), WEB_SEARCH_TTL)
+        web_refs = store_for(state).add_documents(web_docs)
+    else:
+        print("---WEB SEARCH: USING PREFETCHED RESULTS---")
 
     return {
         "question": question,
-        "documents": documents,
+        "chunk_ids": refs["ids"] + web_refs["ids"],
+        "chunk_scores": refs["scores"] + web_refs["scores"],
         "web_search": False,
         "used_web_search": True,
         "route": "web" if not state.get("route") else state["route"],
+        "prefetched_web": None,
     }
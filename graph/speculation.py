@@ -0,0 +1,178 @@
+"""
+Speculative retrieval that runs alongside the question router.
+
+The router is an LLM round-trip, while vector retrieval (and optionally a
+Tavily search) is needed for most questions anyway. In speculative mode both
+are started on a small thread pool at the same moment as the router; the
+result the chosen route needs is handed to the graph and the rest is
+cancelled (or, if it already started, left to finish and counted as waste).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from graph.state import ChunkRefs, GraphState
+
+_TRUTHY = {"1", "true", "yes", "on"}
+
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RAG_SPECULATION_WORKERS", "8")),
+    thread_name_prefix="speculate",
+)
+
+
+def speculation_enabled(state: GraphState) -> bool:
+    """Per-request ``speculative`` flag, falling back to RAG_SPECULATIVE_ROUTING."""
+    if "speculative" in state:
+        return bool(state["speculative"])
+    return os.getenv("RAG_SPECULATIVE_ROUTING", "").lower() in _TRUTHY
+
+
+def speculate_web_enabled(state: GraphState) -> bool:
+    """Per-request ``speculative_web`` flag, falling back to RAG_SPECULATIVE_WEB."""
+    if "speculative_web" in state:
+        return bool(state["speculative_web"])
+    return os.getenv("RAG_SPECULATIVE_WEB", "").lower() in _TRUTHY
+
+
+class SpeculationStats:
+    """Thread-safe counters comparing wasted speculative work to latency saved."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = 0
+            self.used = 0
+            self.failed = 0
+            self.cancelled = 0
+            self.wasted_tasks = 0
+            self.saved_seconds = 0.0
+            self.wasted_seconds = 0.0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_used(self, saved_seconds: float) -> None:
+        with self._lock:
+            self.used += 1
+            self.saved_seconds += saved_seconds
+
+    def record_failed(self) -> None:
+        with self._lock:
+            self.failed += 1
+
+    def record_cancelled(self) -> None:
+        with self._lock:
+            self.cancelled += 1
+
+    def record_wasted(self, seconds: float) -> None:
+        with self._lock:
+            self.wasted_tasks += 1
+            self.wasted_seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "used": self.used,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "wasted_tasks": self.wasted_tasks,
+                "saved_seconds": round(self.saved_seconds, 4),
+                "wasted_seconds": round(self.wasted_seconds, 4),
+                # seconds of background work burned per second of latency saved
+                "waste_per_saved_second": (
+                    round(self.wasted_seconds / self.saved_seconds, 4)
+                    if self.saved_seconds
+                    else None
+                ),
+            }
+
+
+speculation_stats = SpeculationStats()
+
+
+def _timed(fn: Callable[[str], ChunkRefs], question: str) -> Tuple[ChunkRefs, float, float]:
+    start = time.perf_counter()
+    result = fn(question)
+    return result, start, time.perf_counter()
+
+
+def _discard(future: Optional[Future]) -> None:
+    """Cancel a speculative task, or account for it as waste once it finishes."""
+    if future is None:
+        return
+    if future.cancel():
+        speculation_stats.record_cancelled()
+        return
+
+    def _on_done(f: Future) -> None:
+        if f.exception() is None:
+            _, start, end = f.result()
+            speculation_stats.record_wasted(end - start)
+
+    future.add_done_callback(_on_done)
+
+
+def _claim(future: Optional[Future], router_done: float) -> Optional[ChunkRefs]:
+    """Wait for the speculative result the route needs and record time saved."""
+    if future is None:
+        return None
+    try:
+        refs, start, end = future.result()
+    except Exception as e:
+        print(f"[speculation] Speculative task failed, falling back: {e}")
+        speculation_stats.record_failed()
+        return None
+    # Without speculation the task would have started when the router returned.
+    saved = (end - start) - max(0.0, end - router_done)
+    speculation_stats.record_used(saved)
+    return refs
+
+
+def speculative_route(
+    question: str,
+    route_fn: Callable[[str], str],
+    retrieve_fn: Callable[[str], ChunkRefs],
+    web_fn: Optional[Callable[[str], ChunkRefs]] = None,
+) -> Dict[str, Any]:
+    """
+    Run the router while retrieval (and optionally web search) runs speculatively.
+
+    Args:
+        question: User question
+        route_fn: Returns the chosen datasource ("vectorstore" or "websearch")
+        retrieve_fn: Vector retrieval for the question
+        web_fn: Web search for the question; skipped when None
+
+    Returns:
+        State update with ``datasource`` and whichever prefetched result the
+        chosen route consumes
+    """
+    speculation_stats.record_request()
+    vector_future = _executor.submit(_timed, retrieve_fn, question)
+    web_future = _executor.submit(_timed, web_fn, question) if web_fn is not None else None
+
+    try:
+        datasource = route_fn(question)
+    except Exception:
+        _discard(vector_future)
+        _discard(web_future)
+        raise
+    router_done = time.perf_counter()
+
+    if datasource == "websearch":
+        _discard(vector_future)
+        return {"datasource": datasource, "prefetched_web": _claim(web_future, router_done)}
+
+    _discard(web_future)
+    return {"datasource": datasource, "prefetched_chunks": _claim(vector_future, router_done)}
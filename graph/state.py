@@ -1,10 +1,29 @@
-from typing import List, TypedDict, Literal
+from typing import Any, Dict, List, Optional, TypedDict, Literal
 try:
     from langchain_core.documents import Document
 except ImportError:
     from langchain.schema import Document  # type: ignore
 
 
+class RetrievalOptions(TypedDict, total=False):
+    """Per-request retrieval settings; see retrieval.DEFAULT_OPTIONS."""
+    mode: Literal["similarity", "mmr"]
+    k: int
+    fetch_k: int
+    lambda_mult: float
+    min_k: int
+    score_threshold: Optional[float]
+    min_gap: Optional[float]
+    duplicate_threshold: Optional[float]
+    filter: Optional[Dict[str, Any]]
+
+
+class ChunkRefs(TypedDict):
+    """Chunks in the request's chunk store (graph/chunk_store.py) and their scores."""
+    ids: List[str]
+    scores: List[Optional[float]]
+
+
 class GraphState(TypedDict, total=False):
     """
     State carried through the graph (used at runtime by LangGraph).
@@ -12,8 +31,37 @@ class GraphState(TypedDict, total=False):
     """
     question: str
     generation: str
-    documents: List[Document]
+
+    # chunks are kept in the request's chunk store; the state only refers to them
+    chunk_ids: List[str]
+    chunk_scores: List[Optional[float]]
 
     web_search: bool
     used_web_search: bool
     route: Literal["vector", "web", "hybrid"]
+    retrieval: RetrievalOptions
+
+    # routing / speculative execution
+    datasource: Literal["vectorstore", "websearch"]
+    speculative: bool
+    speculative_web: bool
+    prefetched_chunks: Optional[ChunkRefs]
+    prefetched_web: Optional[ChunkRefs]
+
+    # memoization
+    request_id: str
+    cross_request_cache: bool
+    generation_inputs: str
+    generation_attempt: int
+
+    # incremental document grading
+    incremental_grading: bool
+    min_relevant_docs: int
+
+    # local grounding pre-check before the hallucination grader (graph/grounding.py)
+    grounding_precheck: bool
+
+    # materialized by finalize from the chunk store
+    documents: List[Document]
+    sources: List[dict]
+    doc_count: int
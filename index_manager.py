@@ -0,0 +1,629 @@
+"""
+Process-wide, hot-swappable index manager.
+
+Every Streamlit session and every graph run reads through the one
+``index_manager`` in this module instead of opening its own Chroma client.
+Reads are served from an immutable :class:`IndexSnapshot`; an ingestion is
+embedded off to the side, written under a new ``index_version`` tag and then
+published by swapping the snapshot reference. Readers never take a lock:
+chunks tagged with a version newer than the snapshot they hold are filtered
+out, so a half-written ingestion is never visible.
+
+With ``vector_dtype`` set, similarity search is served from a quantized
+:class:`vector_index.VectorIndex` that is published with each snapshot, and
+Chroma is only used to fetch the text and metadata of the hits.
+
+If a :mod:`snapshot_file` export of the collection at the current version
+exists, the index starts from that file instead: it is memory-mapped and
+checksummed, and Chroma is only opened on the first write.
+"""
+
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from langchain_openai import OpenAIEmbeddings
+
+from metadata_index import DEFAULT_FIELDS, LazyMetadataIndex, MetadataIndex
+from snapshot_file import SnapshotFile
+from vector_index import VectorIndex
+
+VERSION_KEY = "index_version"
+EMBED_BATCH_SIZE = 64
+# Chroma's relevance functions, by ``hnsw:space``.
+RELEVANCE_FUNCTIONS = {
+    "l2": VectorStore._euclidean_relevance_score_fn,
+    "cosine": VectorStore._cosine_relevance_score_fn,
+    "ip": VectorStore._max_inner_product_relevance_score_fn,
+}
+
+
+class IngestionCancelled(Exception):
+    """Raised when an ingestion is cancelled before it was published."""
+
+
+@dataclass(frozen=True)
+class IndexSnapshot:
+    """
+    A published, read-only view of the index.
+
+    A view loaded from a snapshot file has ``file`` set and no
+    ``vectorstore``; see :meth:`IndexManager.writable`.
+    """
+
+    version: int
+    vectorstore: Optional[Chroma]
+    chunk_count: int
+    created_at: float
+    vectors: Optional[VectorIndex] = None
+    metadata: Optional[MetadataIndex] = None
+    file: Optional[SnapshotFile] = None
+
+    @property
+    def space(self) -> str:
+        if self.file is not None:
+            return self.file.space
+        return (self.vectorstore._collection.metadata or {}).get("hnsw:space", "l2")
+
+
+@dataclass(frozen=True)
+class _StagedVersion:
+    """Rows written under a version that is not published yet."""
+
+    base: IndexSnapshot
+    version: int
+    ids: List[str]
+    vectors: Optional[VectorIndex]
+    metadata: Optional[MetadataIndex]
+
+
+class SnapshotRetriever(BaseRetriever):
+    """Retriever that always queries the manager's latest snapshot."""
+
+    manager: Any
+    k: int = 4
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        return self.manager.similarity_search(query, k=self.k)
+
+
+class IndexManager:
+    """
+    Owns the vectorstore and publishes versioned snapshots of it.
+
+    Args:
+        collection_name: Chroma collection to serve
+        persist_directory: Directory Chroma persists to
+        vector_dtype: "float32", "float16" or "int8" to serve similarity
+            search from a quantized in-memory index; ``None`` searches Chroma
+        rescore_factor: Candidates rescored at full precision per result
+            when ``vector_dtype`` is set
+        indexed_fields: Metadata fields kept in the posting index that
+            filters are evaluated against when ``vector_dtype`` is set
+        snapshot_verify: How a snapshot file is checked before it is served
+            ("full" or "header", see :meth:`SnapshotFile.open`); "off" or
+            ``None`` always opens Chroma
+        export_on_ingest: Rewrite the snapshot file after every ingestion
+    """
+
+    def __init__(
+        self,
+        collection_name: str = "rag-chroma",
+        persist_directory: str = "./chroma_db",
+        vector_dtype: Optional[str] = None,
+        rescore_factor: int = 4,
+        indexed_fields: Sequence[str] = DEFAULT_FIELDS,
+        snapshot_verify: Optional[str] = "full",
+        export_on_ingest: bool = False,
+    ) -> None:
+        self.collection_name = collection_name
+        self.persist_directory = persist_directory
+        self.vector_dtype = vector_dtype
+        self.rescore_factor = rescore_factor
+        self.indexed_fields = tuple(f.strip() for f in indexed_fields if f.strip())
+        self.snapshot_verify = snapshot_verify
+        self.export_on_ingest = export_on_ingest
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._allocated_version = 0
+        self._load_lock = threading.Lock()
+        # Chroma handle for queries a snapshot file can't answer; never published.
+        self._file_chroma: Optional[Chroma] = None
+        self._write_lock = threading.Lock()
+        self._embeddings: Optional[OpenAIEmbeddings] = None
+
+    # --- reads -----------------------------------------------------------
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def current(self) -> IndexSnapshot:
+        """Latest published snapshot, loading the index on first use."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._load_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._open()
+                snapshot = self._snapshot
+        return snapshot
+
+    def writable(self) -> IndexSnapshot:
+        """
+        Latest snapshot, backed by Chroma.
+
+        A snapshot served from a snapshot file has no Chroma client; this
+        opens the persisted store and publishes it in the file's place.
+        """
+        snapshot = self.current
+        if snapshot.vectorstore is not None:
+            return snapshot
+        with self._load_lock:
+            if self._snapshot.vectorstore is None:
+                self._snapshot = self._open(create_if_unavailable=False, use_file=False)
+            return self._snapshot
+
+    def _chroma(self, snapshot: IndexSnapshot) -> Chroma:
+        """
+        Chroma store to query ``snapshot`` through.
+
+        A snapshot served from a snapshot file shares a separately opened
+        store, so one unindexed filter doesn't replace the file for every read.
+        """
+        if snapshot.vectorstore is not None:
+            return snapshot.vectorstore
+        with self._load_lock:
+            if self._file_chroma is None:
+                self._file_chroma = self._load_chroma()
+            return self._file_chroma
+
+    @property
+    def embeddings(self) -> OpenAIEmbeddings:
+        if self._embeddings is None:
+            self._embeddings = OpenAIEmbeddings()
+        return self._embeddings
+
+    def visibility_filter(self, snapshot: IndexSnapshot) -> Optional[Dict[str, Any]]:
+        """Chroma ``where`` clause hiding chunks newer than ``snapshot``."""
+        newer = list(range(snapshot.version + 1, self._allocated_version + 1))
+        if not newer:
+            return None
+        return {VERSION_KEY: {"$nin": newer}}
+
+    def _where(self, snapshot: IndexSnapshot, where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        visibility = self.visibility_filter(snapshot)
+        if visibility is None or where is None:
+            return visibility or where
+        return {"$and": [visibility, where]}
+
+    def similarity_search(
+        self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_scores(query, k=k, where=where)]
+
+    def similarity_search_with_scores(
+        self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Like :meth:`similarity_search`, with relevance scores in [0, 1]."""
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k, where=where)
+
+    def similarity_search_by_vector(
+        self, embedding: Sequence[float], k: int = 4, where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search with an already embedded query; relevance scores in [0, 1].
+
+        With a quantized index, ``where`` is evaluated against the metadata
+        postings before the scan; filters on fields that aren't indexed, and
+        searches without a quantized index, are handed to Chroma's ``where``.
+        """
+        snapshot = self.current
+        relevance = RELEVANCE_FUNCTIONS[snapshot.space]
+        if snapshot.vectors is not None and snapshot.metadata.supports(where):
+            mask = snapshot.metadata.evaluate(where) if where else None
+            return self._vector_search(snapshot, embedding, k, mask, relevance)
+        results = self._chroma(snapshot).similarity_search_by_vector_with_relevance_scores(
+            list(embedding), k=k, filter=self._where(snapshot, where)
+        )
+        return [(document, relevance(distance)) for document, distance in results]
+
+    def _vector_search(
+        self,
+        snapshot: IndexSnapshot,
+        embedding: Sequence[float],
+        k: int,
+        mask: Optional[np.ndarray],
+        relevance: Callable[[float], float],
+    ) -> List[Tuple[Document, float]]:
+        """Search the snapshot's quantized index, then fetch the hits from Chroma."""
+        hits = snapshot.vectors.search(np.asarray(embedding), k=k, mask=mask)
+        to_distance = _cosine_to_distance(snapshot.space)
+        if snapshot.file is not None:
+            rows = [snapshot.file.row(chunk_id) for chunk_id, _ in hits]
+            return [(snapshot.file.document(row), relevance(to_distance(cos))) for row, (_, cos) in zip(rows, hits)]
+        if not hits:
+            return []
+        found = snapshot.vectorstore._collection.get(
+            ids=[chunk_id for chunk_id, _ in hits], include=["documents", "metadatas"]
+        )
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [(by_id[chunk_id], relevance(to_distance(cos))) for chunk_id, cos in hits if chunk_id in by_id]
+
+    def query(self, where: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        """Raw ``collection.query`` against the current snapshot."""
+        snapshot = self.current
+        if snapshot.file is not None and snapshot.metadata.supports(where):
+            return self._query_file(snapshot, where, **kwargs)
+        return self._chroma(snapshot)._collection.query(where=self._where(snapshot, where), **kwargs)
+
+    def _query_file(
+        self,
+        snapshot: IndexSnapshot,
+        where: Optional[Dict[str, Any]],
+        query_embeddings: Sequence[Sequence[float]],
+        n_results: int = 10,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+    ) -> Dict[str, Any]:
+        """``collection.query`` answered from a snapshot file."""
+        file = snapshot.file
+        mask = snapshot.metadata.evaluate(where) if where else None
+        to_distance = _cosine_to_distance(snapshot.space)
+        result: Dict[str, Any] = {"ids": [], **{field: [] for field in include}}
+        for embedding in query_embeddings:
+            hits = snapshot.vectors.search(np.asarray(embedding), k=n_results, mask=mask)
+            rows = [file.row(chunk_id) for chunk_id, _ in hits]
+            result["ids"].append([chunk_id for chunk_id, _ in hits])
+            if "documents" in include:
+                result["documents"].append([file.text(row) for row in rows])
+            if "metadatas" in include:
+                result["metadatas"].append([file.metadata(row) for row in rows])
+            if "embeddings" in include:
+                result["embeddings"].append(file.vectors[rows])
+            if "distances" in include:
+                result["distances"].append([to_distance(cos) for _, cos in hits])
+        return result
+
+    def retriever(self, k: int = 4) -> SnapshotRetriever:
+        return SnapshotRetriever(manager=self, k=k)
+
+    # --- writes ----------------------------------------------------------
+
+    def ingest(
+        self,
+        documents: List[Document],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        vectors: Optional[List[List[float]]] = None,
+    ) -> IndexSnapshot:
+        """
+        Add documents as a new index version and publish it.
+
+        Embedding happens before any lock is taken; only the local Chroma
+        write and the snapshot swap are serialized between writers.
+
+        Args:
+            documents: Chunks to add
+            on_progress: Called as ``on_progress(embedded, total)`` after each
+                embedding batch
+            should_cancel: Polled between embedding batches; returning True
+                raises ``IngestionCancelled`` and nothing is written
+            vectors: Embeddings from :meth:`embed_documents`, to skip
+                embedding here
+
+        Returns:
+            The newly published snapshot
+        """
+        if not documents:
+            return self.writable()
+        if vectors is None:
+            vectors = self.embed_documents(documents, on_progress, should_cancel)
+
+        with self._write_lock:
+            snapshot = self._publish(self._stage(documents, vectors))
+        if self.export_on_ingest:
+            self.export_snapshot()
+        return snapshot
+
+    def embed_documents(
+        self,
+        documents: List[Document],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+    ) -> List[List[float]]:
+        """Embed documents in batches; see :meth:`ingest` for the callbacks."""
+        texts = [d.page_content for d in documents]
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            if should_cancel and should_cancel():
+                raise IngestionCancelled(f"Cancelled after embedding {len(vectors)}/{len(texts)} chunks")
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+            if on_progress:
+                on_progress(len(vectors), len(texts))
+        return vectors
+
+    def rebuild(self, urls: Optional[List[str]] = None) -> IndexSnapshot:
+        """Load the given URLs (or the defaults) and publish them as a new version."""
+        from ingestion import load_and_split_documents
+
+        return self.ingest(load_and_split_documents(urls))
+
+    def export_snapshot(self) -> Path:
+        """Write the latest snapshot to :attr:`snapshot_path` as one snapshot file."""
+        snapshot = self.current
+        if snapshot.file is not None:
+            return snapshot.file.path
+        collection = snapshot.vectorstore._collection
+        where = self.visibility_filter(snapshot)
+        ids: List[str] = []
+        texts: List[str] = []
+        metadatas: List[Any] = []
+        embeddings: List[Any] = []
+        page = snapshot.vectorstore._client.get_max_batch_size()
+        offset = 0
+        while True:
+            batch = collection.get(
+                where=where, include=["documents", "metadatas", "embeddings"], limit=page, offset=offset
+            )
+            ids.extend(batch["ids"])
+            texts.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+            embeddings.extend(batch["embeddings"])
+            offset += page
+            if len(batch["ids"]) < page:
+                break
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1) if ids else np.zeros((0, 0), np.float32)
+        path = SnapshotFile.write(
+            self.snapshot_path, ids, vectors, texts, metadatas, version=snapshot.version, space=snapshot.space
+        )
+        print(f"[index] Exported version {snapshot.version} ({len(ids)} chunks) to {path}")
+        return path
+
+    def reload(self) -> IndexSnapshot:
+        """Reopen the persisted store (e.g. after an external write) and swap it in."""
+        # Under the write lock, so an ingestion can't publish between the
+        # open and the swap and then be replaced by the older snapshot.
+        with self._write_lock:
+            snapshot = self._open(create_if_unavailable=False)
+            self._snapshot = snapshot
+        return snapshot
+
+    # --- internals -------------------------------------------------------
+
+    def _stage(self, documents: List[Document], vectors: List[List[float]]) -> "_StagedVersion":
+        """
+        Write documents to Chroma under a new version without publishing it.
+
+        The caller holds ``_write_lock`` until it publishes or discards the
+        result; until then the rows are hidden by :meth:`visibility_filter`.
+        """
+        base = self.writable()
+        version = self._allocated_version + 1
+        self._allocated_version = version
+        metadatas = [{**(d.metadata or {}), VERSION_KEY: version} for d in documents]
+        ids = [str(uuid.uuid4()) for _ in documents]
+
+        collection = base.vectorstore._collection
+        batch = base.vectorstore._client.get_max_batch_size()
+        try:
+            for start in range(0, len(ids), batch):
+                end = start + batch
+                collection.add(
+                    ids=ids[start:end],
+                    embeddings=vectors[start:end],
+                    documents=[d.page_content for d in documents[start:end]],
+                    metadatas=metadatas[start:end],
+                )
+            vector_index, metadata_index = self._extend_indexes(base, ids, vectors, metadatas)
+        except Exception:
+            # Never let a later version publish a half-written one.
+            collection.delete(ids=ids)
+            raise
+        return _StagedVersion(base, version, ids, vector_index, metadata_index)
+
+    def _discard(self, staged: "_StagedVersion") -> None:
+        """Delete the rows of a staged version that will not be published."""
+        staged.base.vectorstore._collection.delete(ids=staged.ids)
+
+    def _publish(self, staged: "_StagedVersion") -> IndexSnapshot:
+        """Swap in the snapshot of a staged version; the caller holds ``_write_lock``."""
+        self._write_version(staged.version)
+        vectorstore = staged.base.vectorstore
+        snapshot = IndexSnapshot(
+            version=staged.version,
+            vectorstore=vectorstore,
+            chunk_count=vectorstore._collection.count(),
+            created_at=time.time(),
+            vectors=staged.vectors,
+            metadata=staged.metadata,
+        )
+        self._snapshot = snapshot
+        print(f"[index] Published version {staged.version} (+{len(staged.ids)} chunks, {snapshot.chunk_count} total)")
+        return snapshot
+
+
+    @property
+    def _version_file(self) -> Path:
+        return Path(self.persist_directory) / f"{self.collection_name}.version"
+
+    def _read_version(self) -> int:
+        try:
+            return int(self._version_file.read_text().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_version(self, version: int) -> None:
+        try:
+            self._version_file.parent.mkdir(parents=True, exist_ok=True)
+            self._version_file.write_text(str(version))
+        except OSError as e:
+            print(f"[index] Could not persist index version: {e}")
+
+    @property
+    def snapshot_path(self) -> Path:
+        return Path(self.persist_directory) / f"{self.collection_name}.snapshot"
+
+    def _open(self, create_if_unavailable: bool = True, use_file: bool = True) -> IndexSnapshot:
+        if use_file and self.snapshot_verify not in (None, "off"):
+            snapshot = self._open_file()
+            if snapshot is not None:
+                return snapshot
+
+        from ingestion import create_vectorstore, load_and_split_documents
+
+        try:
+            print("Attempting to load existing vectorstore...")
+            vectorstore = self._load_chroma()
+            print("Loaded existing vectorstore")
+        except Exception as e:
+            if not create_if_unavailable:
+                raise
+            print(f"Could not load existing vectorstore: {e}")
+            print("Creating new vectorstore...")
+            vectorstore = create_vectorstore(
+                load_and_split_documents(),
+                collection_name=self.collection_name,
+                persist_directory=self.persist_directory,
+            )
+
+        # The last published version: one allocated to a staged or failed
+        # ingestion must stay hidden.
+        version = max(self._read_version(), self._snapshot.version if self._snapshot else 0)
+        self._allocated_version = max(self._allocated_version, version)
+        vector_index, metadata_index = self._open_vectors(vectorstore)
+        return IndexSnapshot(
+            version=version,
+            vectorstore=vectorstore,
+            chunk_count=vectorstore._collection.count(),
+            created_at=time.time(),
+            vectors=vector_index,
+            metadata=metadata_index,
+        )
+
+    def _load_chroma(self) -> Chroma:
+        from ingestion import _healthcheck
+
+        vectorstore = Chroma(
+            collection_name=self.collection_name,
+            embedding_function=self.embeddings,
+            persist_directory=self.persist_directory,
+        )
+        _healthcheck(vectorstore)
+        return vectorstore
+
+    def _open_file(self) -> Optional[IndexSnapshot]:
+        """Snapshot served from the snapshot file, or ``None`` if it is missing, corrupt or stale."""
+        path = self.snapshot_path
+        if not path.exists():
+            return None
+        try:
+            file = SnapshotFile.open(path, verify=self.snapshot_verify)
+        except (OSError, ValueError) as e:
+            print(f"[index] Ignoring snapshot file: {e}")
+            return None
+        version = max(self._read_version(), self._snapshot.version if self._snapshot else 0)
+        if file.version != version:
+            print(f"[index] Snapshot file is at version {file.version}, index at {version}; opening Chroma")
+            return None
+        self._allocated_version = max(self._allocated_version, version)
+        print(f"[index] Loaded version {version} ({file.count} chunks) from {path}")
+        return IndexSnapshot(
+            version=version,
+            vectorstore=None,
+            chunk_count=file.count,
+            created_at=time.time(),
+            vectors=VectorIndex.from_rows(
+                path, file.ids, file.vectors, self.vector_dtype or "float32", self.rescore_factor
+            ),
+            metadata=LazyMetadataIndex(self.indexed_fields, file.count, file.metadatas),
+            file=file,
+        )
+
+    @property
+    def _vectors_path(self) -> Path:
+        return Path(self.persist_directory) / f"{self.collection_name}.vectors"
+
+    def _open_vectors(self, vectorstore: Chroma) -> Tuple[Optional[VectorIndex], Optional[MetadataIndex]]:
+        """
+        Open the quantized index, rebuilding it from Chroma if it is missing
+        or stale, and index the metadata of its rows.
+        """
+        if not self.vector_dtype:
+            return None, None
+        collection = vectorstore._collection
+        count = collection.count()
+        vectors: Optional[VectorIndex] = None
+        try:
+            vectors = VectorIndex.open(self._vectors_path, self.vector_dtype, self.rescore_factor)
+            if len(vectors) != count:
+                print(f"[index] Quantized index has {len(vectors)} rows, collection has {count}; rebuilding")
+                vectors = None
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[index] Building quantized index: {e}")
+        if count == 0:
+            return None, None
+
+        include = ["metadatas"] if vectors is not None else ["metadatas", "embeddings"]
+        ids: List[str] = []
+        metadatas: List[Any] = []
+        embeddings: List[Any] = []
+        page = vectorstore._client.get_max_batch_size()
+        for offset in range(0, count, page):
+            batch = collection.get(include=include, limit=page, offset=offset)
+            ids.extend(batch["ids"])
+            metadatas.extend(batch["metadatas"])
+            if vectors is None:
+                embeddings.extend(batch["embeddings"])
+
+        if vectors is None:
+            vectors = VectorIndex.build(
+                self._vectors_path, ids, np.asarray(embeddings, dtype=np.float32),
+                self.vector_dtype, self.rescore_factor,
+            )
+        else:
+            by_id = dict(zip(ids, metadatas))
+            metadatas = [by_id.get(chunk_id) for chunk_id in vectors.ids]
+        return vectors, MetadataIndex.build(metadatas, self.indexed_fields)
+
+    def _extend_indexes(
+        self,
+        base: IndexSnapshot,
+        ids: List[str],
+        vectors: List[List[float]],
+        metadatas: List[Dict[str, Any]],
+    ) -> Tuple[Optional[VectorIndex], Optional[MetadataIndex]]:
+        if not self.vector_dtype:
+            return None, None
+        if base.vectors is None or base.metadata is None:
+            return self._open_vectors(base.vectorstore)
+        return base.vectors.extend(ids, np.asarray(vectors, dtype=np.float32)), base.metadata.extend(metadatas)
+
+
+def _cosine_to_distance(space: str) -> Callable[[float], float]:
+    """Cosine similarity as the distance Chroma reports; its l2 space uses squared distances."""
+    return (lambda cos: 2.0 - 2.0 * cos) if space == "l2" else (lambda cos: 1.0 - cos)
+
+
+index_manager = IndexManager(
+    collection_name=os.getenv("RAG_COLLECTION", "rag-chroma"),
+    persist_directory=os.getenv("RAG_PERSIST_DIRECTORY", "./chroma_db"),
+    vector_dtype=os.getenv("RAG_VECTOR_DTYPE") or None,
+    rescore_factor=int(os.getenv("RAG_RESCORE_FACTOR", "4")),
+    indexed_fields=os.getenv("RAG_INDEXED_FIELDS", ",".join(DEFAULT_FIELDS)).split(","),
+    snapshot_verify=os.getenv("RAG_SNAPSHOT_VERIFY", "full"),
+    export_on_ingest=os.getenv("RAG_SNAPSHOT_ON_INGEST", "").lower() in ("1", "true", "yes", "on"),
+)
@@ -5,14 +5,17 @@ This module handles loading documents, creating embeddings,
 and setting up the vectorstore for retrieval.
 """
 
-from typing import List, Optional
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 
+from text_splitter import FastTokenTextSplitter
+
 # Default URLs to load (customize for your use case)
 DEFAULT_URLS = [
     "https://lilianweng.github.io/posts/2023-06-23-agent/",
@@ -20,6 +23,9 @@ DEFAULT_URLS = [
     "https://lilianweng.github.io/posts/2023-10-25-adv-attack-llm/",
 ]
 
+# Worker processes for splitting large URL batches (0 = split in-process)
+SPLIT_WORKERS = int(os.getenv("RAG_SPLIT_WORKERS", "0"))
+
 
 def load_and_split_documents(
     urls: Optional[List[str]] = None,
@@ -47,15 +53,23 @@ def load_and_split_documents(
     docs_list = [item for sublist in docs for item in sublist]
 
     # Split documents
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    text_splitter = FastTokenTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, workers=SPLIT_WORKERS
     )
     doc_splits = text_splitter.split_documents(docs_list)
+    tag_chunks(doc_splits, {"file_type": "html", "ingested_at": int(time.time())})
 
     print(f"Split into {len(doc_splits)} chunks")
     return doc_splits
 
 
+def tag_chunks(chunks: List[Document], metadata: Dict[str, Any]) -> List[Document]:
+    """Add filterable metadata (file type, ingestion time, upload) to chunks in place."""
+    for chunk in chunks:
+        chunk.metadata = {**(chunk.metadata or {}), **metadata}
+    return chunks
+
+
 def create_vectorstore(
     documents: List[Document],
     collection_name: str = "rag-chroma",
@@ -103,46 +117,46 @@ def get_or_create_vectorstore(
     Returns:
         Chroma vectorstore instance
     """
-    persist_directory = "./chroma_db"
+    return get_vectorstore(force_reload=force_reload, urls=urls)
 
-    if not force_reload:
-        try:
-            # Try to load existing vectorstore
-            print("Attempting to load existing vectorstore...")
-            vectorstore = Chroma(
-                collection_name="rag-chroma",
-                embedding_function=OpenAIEmbeddings(),
-                persist_directory=persist_directory,
-            )
-            print("Loaded existing vectorstore")
-            return vectorstore
-        except Exception as e:
-            print(f"Could not load existing vectorstore: {e}")
 
-    # Create new vectorstore
-    print("Creating new vectorstore...")
-    documents = load_and_split_documents(urls)
-    vectorstore = create_vectorstore(documents)
-    return vectorstore
-
-
-def process_documents(file_paths: List[str]) -> None:
+def process_documents(
+    file_paths: List[str],
+    on_file: Optional[Callable[[str, str, int], None]] = None,
+    on_chunks: Optional[Callable[[int, int], None]] = None,
+    should_cancel: Optional[Callable[[], bool]] = None,
+    upload_id: Optional[str] = None,
+) -> None:
     """
     Process uploaded documents and add them to vectorstore.
 
     Args:
         file_paths: List of file paths to process
+        on_file: Called as ``on_file(path, status, chunks)`` once per file,
+            with status "loaded", "skipped" or "failed"
+        on_chunks: Called as ``on_chunks(embedded, total)`` as chunks are embedded
+        should_cancel: Polled between files and embedding batches; returning
+            True aborts with ``IngestionCancelled`` before anything is published
+        upload_id: Stored as ``upload_id`` metadata so searches can be
+            filtered to this upload
     """
     from langchain_community.document_loaders import (
         TextLoader,
         PyPDFLoader,
         Docx2txtLoader,
     )
+    from index_manager import IngestionCancelled
+    from sharding import sharded_index
 
     print(f"Processing {len(file_paths)} documents...")
 
-    all_docs = []
+    text_splitter = FastTokenTextSplitter(chunk_size=500, chunk_overlap=50)
+
+    ingested_at = int(time.time())
+    doc_splits = []
     for file_path in file_paths:
+        if should_cancel and should_cancel():
+            raise IngestionCancelled("Cancelled while loading files")
         try:
             # Determine loader based on file extension
             if file_path.endswith('.txt'):
@@ -153,38 +167,34 @@ def process_documents(file_paths: List[str]) -> None:
                 loader = Docx2txtLoader(file_path)
             else:
                 print(f"Skipping unsupported file: {file_path}")
+                if on_file:
+                    on_file(file_path, "skipped", 0)
                 continue
 
-            # Load documents
+            # Load and split documents
             docs = loader.load()
-            all_docs.extend(docs)
+            splits = text_splitter.split_documents(docs)
+            tag = {"file_type": os.path.splitext(file_path)[1].lstrip(".").lower(), "ingested_at": ingested_at}
+            if upload_id:
+                tag["upload_id"] = upload_id
+            doc_splits.extend(tag_chunks(splits, tag))
             print(f"Loaded {len(docs)} documents from {file_path}")
+            if on_file:
+                on_file(file_path, "loaded", len(splits))
 
         except Exception as e:
             print(f"Error loading {file_path}: {e}")
+            if on_file:
+                on_file(file_path, "failed", 0)
 
-    if not all_docs:
+    if not doc_splits:
         print("No documents were loaded")
         return
 
-    # Split documents
-    text_splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-        chunk_size=500, chunk_overlap=50
-    )
-    doc_splits = text_splitter.split_documents(all_docs)
-
     print(f"Split into {len(doc_splits)} chunks")
 
-    # Add to existing vectorstore
-    embeddings = OpenAIEmbeddings()
-    vectorstore = Chroma(
-        collection_name="rag-chroma",
-        embedding_function=embeddings,
-        persist_directory="./chroma_db",
-    )
-
-    # Add documents
-    vectorstore.add_documents(doc_splits)
+    # Publish as a new version of every shard that received chunks
+    sharded_index.ingest(doc_splits, on_progress=on_chunks, should_cancel=should_cancel)
     print(f"Added {len(doc_splits)} chunks to vectorstore")
 
 
@@ -195,52 +205,28 @@ from typing import Optional
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 
-# --- lazy singletons ---
-_vectorstore: Optional[Chroma] = None
-_retriever = None
-
 def _healthcheck(vs: Chroma) -> None:
-    """Touch the index to ensure it's usable; don’t crash the app if not."""
+    """Touch the index to ensure it's usable, without an embedding call; don’t crash the app if not."""
     try:
-        _ = vs.similarity_search("healthcheck", k=1)
+        _ = vs._collection.count()
     except Exception as e:
         print(f"[ingestion] Vectorstore healthcheck failed: {e}")
 
 def get_vectorstore(force_reload: bool = False, urls: Optional[list[str]] = None) -> Chroma:
-    global _vectorstore
-    persist_directory = "./chroma_db"
-
-    if _vectorstore is not None and not force_reload:
-        return _vectorstore
+    """
+    Vectorstore behind the shared index; ``force_reload`` re-ingests ``urls``.
 
-    if not force_reload:
-        try:
-            print("Attempting to load existing vectorstore...")
-            _vectorstore = Chroma(
-                collection_name="rag-chroma",
-                embedding_function=OpenAIEmbeddings(),
-                persist_directory=persist_directory,
-            )
-            _healthcheck(_vectorstore)
-            print("Loaded existing vectorstore")
-            return _vectorstore
-        except Exception as e:
-            print(f"Could not load existing vectorstore: {e}")
+    With ``RAG_SHARDS`` > 1 this is the first shard's store only; search
+    through :func:`get_retriever` to cover every shard.
+    """
+    from sharding import sharded_index
 
-    print("Creating new vectorstore...")
-    documents = load_and_split_documents(urls)
-    _vectorstore = create_vectorstore(
-        documents,
-        collection_name="rag-chroma",
-        persist_directory=persist_directory,
-    )
-    _healthcheck(_vectorstore)
-    return _vectorstore
+    if force_reload:
+        sharded_index.rebuild(urls)
+    return sharded_index.managers[0].writable().vectorstore
 
 def get_retriever():
-    """Lazily create and cache the retriever."""
-    global _retriever
-    if _retriever is None:
-        vs = get_vectorstore()
-        _retriever = vs.as_retriever(search_kwargs={"k": 4})
-    return _retriever
+    """Retriever that always reads the latest published snapshot of every shard."""
+    from sharding import sharded_index
+
+    return sharded_index.retriever(k=4)
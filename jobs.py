@@ -0,0 +1,246 @@
+"""
+Background ingestion job queue.
+
+Uploads are handed to a process-wide ``job_queue`` instead of being processed
+inside the Streamlit script thread. Jobs run on a bounded worker pool, report
+per-file and per-chunk progress, can be cancelled, and persist their state as
+JSON under ``state_dir`` so the UI (any session) can poll them and a restart
+doesn't lose the record of what happened. Finished jobs are pruned past a
+retention count and age, and a restart removes the uploads of jobs it
+interrupted.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+class JobQueue:
+    """
+    Runs ingestion jobs on a bounded pool of worker threads.
+
+    Args:
+        state_dir: Directory holding one JSON file (and one upload folder) per job
+        max_concurrent: Ingestion jobs allowed to run at the same time
+        keep_jobs: Finished jobs kept, most recent first
+        retention_s: Finished jobs older than this are deleted
+    """
+
+    def __init__(
+        self,
+        state_dir: str = "./.ingest_jobs",
+        max_concurrent: int = 1,
+        keep_jobs: int = 200,
+        retention_s: float = 7 * 24 * 3600,
+    ) -> None:
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.keep_jobs = keep_jobs
+        self.retention_s = retention_s
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._cancel: Dict[str, threading.Event] = {}
+        self._restore()
+
+    # --- public API ------------------------------------------------------
+
+    def upload_dir(self, job_id: str) -> Path:
+        """Directory where a job's uploaded files should be written."""
+        path = self.state_dir / job_id
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def new_job_id(self) -> str:
+        return uuid.uuid4().hex[:12]
+
+    def submit(self, file_paths: List[str], job_id: Optional[str] = None, cleanup: bool = True) -> str:
+        """
+        Queue an ingestion job for the given files.
+
+        Args:
+            file_paths: Files to ingest
+            job_id: Id from :meth:`new_job_id` when files were staged in
+                :meth:`upload_dir` beforehand
+            cleanup: Delete the job's upload directory when it finishes
+
+        Returns:
+            The job id
+        """
+        job_id = job_id or self.new_job_id()
+        job = {
+            "id": job_id,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "files": [
+                {"path": p, "name": Path(p).name, "status": "pending", "chunks": 0, "embedded": 0}
+                for p in file_paths
+            ],
+            "chunks_total": 0,
+            "chunks_embedded": 0,
+            "error": None,
+            "cleanup": cleanup,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._cancel[job_id] = threading.Event()
+            self._persist(job)
+            self._prune()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """Request cancellation; queued jobs never start, running ones stop at the next checkpoint."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] not in ACTIVE_STATES:
+                return False
+            self._cancel[job_id].set()
+            if job["status"] == QUEUED:
+                self._finish(job, CANCELLED)
+        return True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent jobs first."""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j["created_at"], reverse=True)[:limit]
+            return json.loads(json.dumps(jobs))
+
+    def has_active(self) -> bool:
+        with self._lock:
+            return any(j["status"] in ACTIVE_STATES for j in self._jobs.values())
+
+    # --- worker ----------------------------------------------------------
+
+    def _run(self, job_id: str) -> None:
+        from index_manager import IngestionCancelled
+        from ingestion import process_documents
+
+        cancel = self._cancel[job_id]
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] != QUEUED:
+                self._cleanup(job)
+                return
+            job["status"] = RUNNING
+            job["started_at"] = time.time()
+            self._persist(job)
+
+        files = {f["path"]: f for f in job["files"]}
+
+        def on_file(path: str, status: str, chunks: int) -> None:
+            with self._lock:
+                files[path].update(status=status, chunks=chunks)
+                job["chunks_total"] += chunks
+                self._persist(job)
+
+        def on_chunks(embedded: int, total: int) -> None:
+            # Chunks are embedded in file order, so attribute progress file by file.
+            with self._lock:
+                job["chunks_embedded"] = embedded
+                remaining = embedded
+                for f in job["files"]:
+                    f["embedded"] = min(f["chunks"], remaining)
+                    remaining -= f["embedded"]
+                self._persist(job)
+
+        try:
+            process_documents(
+                [f["path"] for f in job["files"]],
+                on_file=on_file,
+                on_chunks=on_chunks,
+                should_cancel=cancel.is_set,
+                upload_id=job_id,
+            )
+        except IngestionCancelled:
+            with self._lock:
+                self._finish(job, CANCELLED)
+        except Exception as e:
+            with self._lock:
+                self._finish(job, FAILED, error=str(e))
+        else:
+            with self._lock:
+                self._finish(job, SUCCEEDED)
+        finally:
+            self._cleanup(job)
+
+    def _cleanup(self, job: Dict[str, Any]) -> None:
+        if job.get("cleanup"):
+            shutil.rmtree(self.state_dir / job["id"], ignore_errors=True)
+
+    # --- persistence -----------------------------------------------------
+
+    def _finish(self, job: Dict[str, Any], status: str, error: Optional[str] = None) -> None:
+        job["status"] = status
+        job["error"] = error
+        job["finished_at"] = time.time()
+        self._persist(job)
+
+    def _persist(self, job: Dict[str, Any]) -> None:
+        path = self.state_dir / f"{job['id']}.json"
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(job))
+        os.replace(tmp, path)
+
+    def _restore(self) -> None:
+        for path in self.state_dir.glob("*.json.tmp"):
+            path.unlink(missing_ok=True)
+        for path in self.state_dir.glob("*.json"):
+            try:
+                job = json.loads(path.read_text())
+            except (OSError, ValueError) as e:
+                print(f"[jobs] Skipping unreadable job file {path}: {e}")
+                continue
+            if job.get("status") in ACTIVE_STATES:
+                self._finish(job, FAILED, error="Interrupted by restart")
+                self._cleanup(job)
+            self._jobs[job["id"]] = job
+        # Upload folders without a job were staged by a session that never submitted.
+        for path in self.state_dir.iterdir():
+            if path.is_dir() and path.name not in self._jobs:
+                shutil.rmtree(path, ignore_errors=True)
+        self._prune()
+
+    def _prune(self) -> None:
+        """Delete finished jobs past ``keep_jobs`` or older than ``retention_s``."""
+        finished = sorted(
+            (j for j in self._jobs.values() if j["status"] not in ACTIVE_STATES),
+            key=lambda j: j.get("finished_at") or j["created_at"],
+            reverse=True,
+        )
+        cutoff = time.time() - self.retention_s
+        for rank, job in enumerate(finished):
+            if rank < self.keep_jobs and (job.get("finished_at") or job["created_at"]) >= cutoff:
+                continue
+            del self._jobs[job["id"]]
+            self._cancel.pop(job["id"], None)
+            (self.state_dir / f"{job['id']}.json").unlink(missing_ok=True)
+            self._cleanup(job)
+
+
+job_queue = JobQueue(
+    state_dir=os.getenv("RAG_JOB_DIR", "./.ingest_jobs"),
+    max_concurrent=int(os.getenv("RAG_MAX_INGEST_JOBS", "1")),
+    keep_jobs=int(os.getenv("RAG_JOB_KEEP", "200")),
+    retention_s=float(os.getenv("RAG_JOB_RETENTION_DAYS", "7")) * 24 * 3600,
+)
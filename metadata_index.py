@@ -0,0 +1,245 @@
+"""
+Posting index over chunk metadata.
+
+Filtering by metadata after a vector search returns fewer than k hits. A
+:class:`MetadataIndex` instead keeps, for every indexed field and every
+value, the rows carrying it, so a filter expression becomes a row mask with a
+few vectorized boolean ops before the scan starts. Rows are aligned with
+:class:`vector_index.VectorIndex`.
+
+Frequent values are stored as packed bitmaps (n/8 bytes) and rare ones, which
+is most values of high-cardinality fields like ``source`` and
+``ingested_at``, as sorted row-id arrays; masks are only built at query time.
+
+Filters use Chroma's ``where`` syntax: ``{"field": value}``, operators
+``$eq $ne $in $nin $gt $gte $lt $lte`` and ``$and`` / ``$or`` lists.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+DEFAULT_FIELDS = ("source", "file_type", "upload_id", "ingested_at")
+
+_RANGE_OPS = {
+    "$gt": lambda v, x: v > x,
+    "$gte": lambda v, x: v >= x,
+    "$lt": lambda v, x: v < x,
+    "$lte": lambda v, x: v <= x,
+}
+# A row id costs 32 bits and a bitmap one bit per row: values on more than
+# 1/32 of the rows are cheaper as bitmaps.
+_DENSE_FRACTION = 32
+ROW_DTYPE = np.uint32
+
+
+class MetadataIndex:
+    """
+    Per-field, per-value postings for a fixed number of rows.
+
+    A posting is either a sorted ``uint32`` array of row ids or a packed
+    ``uint8`` bitmap, which may be shorter than ``size`` (missing rows are
+    unset). Instances are immutable and share the postings of values
+    :meth:`extend` did not touch.
+
+    Args:
+        fields: Metadata fields to index
+        size: Number of rows
+        postings: ``{field: {value: row ids or packed bitmap}}``
+    """
+
+    def __init__(self, fields: Sequence[str], size: int, postings: Dict[str, Dict[Any, np.ndarray]]) -> None:
+        self.fields = tuple(fields)
+        self.size = size
+        self._postings = postings
+
+    @classmethod
+    def build(
+        cls,
+        metadatas: Iterable[Optional[Mapping[str, Any]]],
+        fields: Sequence[str] = DEFAULT_FIELDS,
+    ) -> "MetadataIndex":
+        return cls(fields, 0, {f: {} for f in fields}).extend(metadatas)
+
+    def extend(self, metadatas: Iterable[Optional[Mapping[str, Any]]]) -> "MetadataIndex":
+        """
+        Index with ``metadatas`` appended as rows ``size, size + 1, ...``.
+
+        Costs time in the new rows and the postings of the values they carry;
+        the postings of every other value are reused as they are.
+        """
+        metadatas = list(metadatas)
+        if not metadatas:
+            return self
+        size = self.size + len(metadatas)
+        rows: Dict[str, Dict[Any, List[int]]] = {f: {} for f in self.fields}
+        for row, metadata in enumerate(metadatas, start=self.size):
+            for field in self.fields:
+                value = (metadata or {}).get(field)
+                if _indexable(value):
+                    rows[field].setdefault(value, []).append(row)
+
+        postings: Dict[str, Dict[Any, np.ndarray]] = {}
+        for field in self.fields:
+            postings[field] = dict(self._postings.get(field, {}))
+            for value, new_rows in rows[field].items():
+                postings[field][value] = _append(postings[field].get(value), new_rows, size)
+        return MetadataIndex(self.fields, size, postings)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(p.nbytes for values in self._postings.values() for p in values.values())
+
+    def values(self, field: str) -> List[Any]:
+        """Distinct indexed values of ``field``."""
+        return list(self._postings[field])
+
+    def supports(self, where: Optional[Mapping[str, Any]]) -> bool:
+        """True if every field ``where`` refers to is indexed."""
+        if not where:
+            return True
+        for key, cond in where.items():
+            if key in ("$and", "$or"):
+                if not all(self.supports(c) for c in cond):
+                    return False
+            elif key not in self._postings:
+                return False
+        return True
+
+    def evaluate(self, where: Mapping[str, Any]) -> np.ndarray:
+        """
+        Boolean row mask of the rows matching ``where``.
+
+        Raises:
+            KeyError: ``where`` refers to a field that isn't indexed
+            ValueError: Unknown operator
+        """
+        mask = np.ones(self.size, dtype=bool)
+        for key, cond in where.items():
+            if key == "$and":
+                for clause in cond:
+                    mask &= self.evaluate(clause)
+            elif key == "$or":
+                any_mask = np.zeros(self.size, dtype=bool)
+                for clause in cond:
+                    any_mask |= self.evaluate(clause)
+                mask &= any_mask
+            else:
+                mask &= self._field_mask(key, cond)
+        return mask
+
+    def _bits(self, field: str, value: Any) -> np.ndarray:
+        return self._any_of(field, [value])
+
+    def _any_of(self, field: str, values: Iterable[Any]) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        sparse = []
+        for value in values:
+            posting = self._postings[field].get(value)
+            if posting is None:
+                continue
+            if posting.dtype == ROW_DTYPE:
+                sparse.append(posting)
+            else:
+                bits = np.unpackbits(posting, count=min(len(posting) * 8, self.size)).astype(bool)
+                mask[: len(bits)] |= bits
+        if sparse:
+            mask[np.concatenate(sparse)] = True
+        return mask
+
+    def _field_mask(self, field: str, cond: Any) -> np.ndarray:
+        if field not in self._postings:
+            raise KeyError(f"Metadata field {field!r} is not indexed")
+        if not isinstance(cond, Mapping):
+            return self._bits(field, cond)
+
+        mask = np.ones(self.size, dtype=bool)
+        for op, operand in cond.items():
+            if op == "$eq":
+                mask &= self._bits(field, operand)
+            elif op == "$ne":
+                mask &= ~self._bits(field, operand)
+            elif op == "$in":
+                mask &= self._any_of(field, operand)
+            elif op == "$nin":
+                mask &= ~self._any_of(field, operand)
+            elif op in _RANGE_OPS:
+                test = _RANGE_OPS[op]
+                in_range = [v for v in self._postings[field] if _comparable(v, operand) and test(v, operand)]
+                mask &= self._any_of(field, in_range)
+            else:
+                raise ValueError(f"Unsupported filter operator {op!r}")
+        return mask
+
+
+def _append(posting: Optional[np.ndarray], rows: List[int], size: int) -> np.ndarray:
+    """``posting`` plus ``rows`` (all past its last row), as row ids or a bitmap for ``size`` rows."""
+    new = np.asarray(rows, dtype=np.int64)
+    if posting is None or posting.dtype == ROW_DTYPE:
+        ids = new if posting is None else np.concatenate([posting, new])
+        if len(ids) * _DENSE_FRACTION <= size:
+            return ids.astype(ROW_DTYPE)
+        bitmap = np.zeros(-(-size // 8), dtype=np.uint8)
+        np.bitwise_or.at(bitmap, ids >> 3, (0x80 >> (ids & 7)).astype(np.uint8))
+        return bitmap
+    # Grow the bitmap with zero bytes and set only the new bits.
+    bitmap = np.zeros(-(-size // 8), dtype=np.uint8)
+    bitmap[: len(posting)] = posting
+    np.bitwise_or.at(bitmap, new >> 3, (0x80 >> (new & 7)).astype(np.uint8))
+    return bitmap
+
+
+class LazyMetadataIndex(MetadataIndex):
+    """
+    A :class:`MetadataIndex` whose bitmaps are built by the first call that needs them.
+
+    :meth:`supports` only looks at field names, so an unfiltered search
+    never pays for reading every row's metadata.
+
+    Args:
+        fields: Metadata fields to index
+        size: Number of rows
+        load: Returns the metadata of every row, in row order
+    """
+
+    def __init__(self, fields: Sequence[str], size: int, load: Callable[[], Iterable[Optional[Mapping[str, Any]]]]) -> None:
+        super().__init__(fields, size, {f: {} for f in fields})
+        self._load: Optional[Callable[[], Iterable[Optional[Mapping[str, Any]]]]] = load
+        self._lock = threading.Lock()
+
+    def _ensure_built(self) -> None:
+        if self._load is not None:
+            with self._lock:
+                if self._load is not None:
+                    self._postings = MetadataIndex.build(self._load(), self.fields)._postings
+                    self._load = None
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._load is not None else super().nbytes
+
+    def values(self, field: str) -> List[Any]:
+        self._ensure_built()
+        return super().values(field)
+
+    def evaluate(self, where: Mapping[str, Any]) -> np.ndarray:
+        self._ensure_built()
+        return super().evaluate(where)
+
+    def extend(self, metadatas: Iterable[Optional[Mapping[str, Any]]]) -> MetadataIndex:
+        self._ensure_built()
+        return super().extend(metadatas)
+
+
+def _indexable(value: Any) -> bool:
+    return isinstance(value, (str, int, float, bool))
+
+
+def _comparable(value: Any, operand: Any) -> bool:
+    numeric = (int, float)
+    if isinstance(value, bool) or isinstance(operand, bool):
+        return False
+    return isinstance(value, numeric) and isinstance(operand, numeric) or (
+        isinstance(value, str) and isinstance(operand, str)
+    )
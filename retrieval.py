@@ -0,0 +1,214 @@
+"""
+Diversity-aware retrieval on top of the vectorstore.
+
+Plain similarity search with a fixed k lets near-duplicate chunks take up
+result slots, and every slot costs a retrieval-grader call downstream. The
+"mmr" mode over-fetches candidates, picks k adaptively from the relevance
+distribution, and reranks with a NumPy-vectorized maximal marginal relevance
+pass that also drops near-duplicates outright.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+DEFAULT_OPTIONS: Dict[str, Any] = {
+    "mode": "similarity",
+    "k": 4,
+    "fetch_k": 20,
+    "lambda_mult": 0.5,
+    "min_k": 1,
+    "score_threshold": None,
+    "min_gap": None,
+    "duplicate_threshold": 0.95,
+    "filter": None,
+}
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def adaptive_k(
+    scores: Sequence[float],
+    max_k: int,
+    min_k: int = 1,
+    score_threshold: Optional[float] = None,
+    min_gap: Optional[float] = None,
+) -> int:
+    """
+    Pick how many results to keep from a relevance distribution.
+
+    Args:
+        scores: Relevance scores, any order
+        max_k: Upper bound on the result count
+        min_k: Lower bound on the result count
+        score_threshold: Drop results scoring below this
+        min_gap: Cut at the first drop between consecutive sorted scores
+            at least this large
+
+    Returns:
+        Number of results to keep
+    """
+    ranked = np.sort(np.asarray(scores, dtype=np.float32))[::-1][:max_k]
+    k = len(ranked)
+    if score_threshold is not None:
+        k = int(np.count_nonzero(ranked >= score_threshold))
+    if min_gap is not None and k > 1:
+        gaps = ranked[: k - 1] - ranked[1:k]
+        cuts = np.flatnonzero(gaps >= min_gap)
+        cuts = cuts[cuts + 1 >= min_k]
+        if cuts.size:
+            k = int(cuts[0]) + 1
+    return max(min(min_k, len(ranked)), min(k, max_k))
+
+
+def candidate_pool(
+    relevance: np.ndarray,
+    min_k: int = 1,
+    score_threshold: Optional[float] = None,
+    min_gap: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Indices of the candidates relevant enough for MMR to choose from.
+
+    Returns the top candidates by relevance, cut by :func:`adaptive_k`, so the
+    final k adapts to the score distribution: MMR never reaches past a score
+    gap or threshold to fill a slot once near-duplicates are removed.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    size = adaptive_k(
+        relevance,
+        max_k=len(relevance),
+        min_k=min_k,
+        score_threshold=score_threshold,
+        min_gap=min_gap,
+    )
+    return np.argsort(-relevance, kind="stable")[:size]
+
+
+def mmr_rerank(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    duplicate_threshold: Optional[float] = 0.95,
+) -> List[int]:
+    """
+    Select up to k candidate indices by maximal marginal relevance.
+
+    The pairwise similarity matrix is computed once and the greedy loop only
+    updates a running "max similarity to the selection" vector, so each step
+    is a single vectorized pass over the candidates.
+
+    Args:
+        query: Query embedding, shape (d,)
+        candidates: Candidate embeddings, shape (n, d)
+        k: Maximum number of indices to return
+        lambda_mult: 1.0 ranks purely by relevance, 0.0 purely by diversity
+        duplicate_threshold: Candidates at least this similar to an already
+            selected one are never selected
+
+    Returns:
+        Selected candidate indices in selection order
+    """
+    n = len(candidates)
+    if n == 0 or k <= 0:
+        return []
+    cand = _normalize(np.asarray(candidates, dtype=np.float32))
+    q = _normalize(np.asarray(query, dtype=np.float32))
+    relevance = cand @ q
+    pairwise = cand @ cand.T
+
+    available = np.ones(n, dtype=bool)
+    max_sim = np.full(n, -np.inf, dtype=np.float32)
+    selected = [int(np.argmax(relevance))]
+    available[selected[0]] = False
+
+    while len(selected) < min(k, n):
+        max_sim = np.maximum(max_sim, pairwise[selected[-1]])
+        if duplicate_threshold is not None:
+            available &= max_sim < duplicate_threshold
+        if not available.any():
+            break
+        score = lambda_mult * relevance - (1.0 - lambda_mult) * max_sim
+        score[~available] = -np.inf
+        best = int(np.argmax(score))
+        selected.append(best)
+        available[best] = False
+    return selected
+
+
+# Options that None switches off; None for any other option keeps its default.
+_NULLABLE_OPTIONS = frozenset({"score_threshold", "min_gap", "duplicate_threshold", "filter"})
+
+
+def _resolve_options(options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    resolved = dict(DEFAULT_OPTIONS)
+    resolved.update({k: v for k, v in (options or {}).items() if v is not None or k in _NULLABLE_OPTIONS})
+    return resolved
+
+
+def mmr_search(manager: Any, question: str, options: Dict[str, Any]) -> List[Tuple[Document, float]]:
+    """Over-fetch from the index, choose k adaptively and rerank with MMR."""
+    query = np.asarray(manager.embeddings.embed_query(question), dtype=np.float32)
+    results = manager.query(
+        where=options["filter"],
+        query_embeddings=[query.tolist()],
+        n_results=max(options["fetch_k"], options["k"]),
+        include=["documents", "metadatas", "embeddings"],
+    )
+    texts = results["documents"][0]
+    if not texts:
+        return []
+    metadatas = results["metadatas"][0] or [None] * len(texts)
+    embeddings = np.asarray(results["embeddings"][0], dtype=np.float32)
+
+    relevance = _normalize(embeddings) @ _normalize(query)
+    pool = candidate_pool(
+        relevance,
+        min_k=options["min_k"],
+        score_threshold=options["score_threshold"],
+        min_gap=options["min_gap"],
+    )
+    order = mmr_rerank(
+        query,
+        embeddings[pool],
+        options["k"],
+        lambda_mult=options["lambda_mult"],
+        duplicate_threshold=options["duplicate_threshold"],
+    )
+    return [
+        (Document(page_content=texts[pool[i]], metadata=metadatas[pool[i]] or {}), float(relevance[pool[i]]))
+        for i in order
+    ]
+
+
+def retrieve_scored(question: str, options: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+    """
+    Retrieve documents with their relevance scores using per-request options.
+
+    Args:
+        question: User question
+        options: ``GraphState["retrieval"]``; ``None`` keeps the default
+            similarity search with k=4. ``options["filter"]`` restricts the
+            search to chunks whose metadata matches a Chroma-style ``where``
+            expression, e.g. ``{"file_type": {"$in": ["pdf", "docx"]}}``
+
+    Returns:
+        ``(document, relevance)`` pairs, most relevant first
+    """
+    from sharding import sharded_index
+
+    resolved = _resolve_options(options)
+    if resolved["mode"] == "mmr":
+        return mmr_search(sharded_index, question, resolved)
+    return sharded_index.similarity_search_with_scores(question, k=resolved["k"], where=resolved["filter"])
+
+
+def retrieve_documents(question: str, options: Optional[Dict[str, Any]] = None) -> List[Document]:
+    """Documents from :func:`retrieve_scored`, without the scores."""
+    return [document for document, _ in retrieve_scored(question, options)]
@@ -0,0 +1,577 @@
+"""
+Headless HTTP server for the corrective RAG graph.
+
+Serves ``graph.graph.app`` to other services on plain asyncio, without a web
+framework. Requests wait in a bounded queue for one of ``workers`` graph runs.
+A request is shed with 503 when the queue is full, or when the expected queue
+wait already exceeds its deadline, rather than queueing work that would time
+out anyway. A run that passes its deadline stops before its next graph step
+and answers 504.
+
+Endpoints::
+
+    POST /query          {"question": ..., "deadline_ms": 30000, ...GraphState options}
+    POST /query/stream   same body, answered as server-sent events
+    GET  /health         200 while accepting requests, 503 when saturated
+    GET  /metrics        Prometheus text format
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8080] [--workers 8] [--queue-size 64]
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+
+# Body keys passed through to GraphState. ``request_id`` is not one of them: it
+# scopes the run's chunk store and memo entries, so the server always makes a
+# fresh one, and a client's own id is only echoed back as ``client_request_id``.
+REQUEST_OPTIONS = (
+    "retrieval",
+    "speculative",
+    "speculative_web",
+    "incremental_grading",
+    "min_relevant_docs",
+    "grounding_precheck",
+    "cross_request_cache",
+)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Weight of the latest run in the moving average of graph run time.
+SERVICE_TIME_ALPHA = 0.2
+FINAL_NODE = "finalize"
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of queued."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(f"Server overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's deadline passes before its answer is ready."""
+
+
+class HTTPError(Exception):
+    """A malformed request, answered with ``status``."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class ServerConfig:
+    host: str = "127.0.0.1"
+    port: int = 8080
+    workers: int = 8  # concurrent graph runs
+    queue_size: int = 64  # requests waiting for a worker
+    deadline_s: float = 60.0  # used when a request sets no deadline_ms
+    max_deadline_s: float = 300.0
+    max_body_bytes: int = 1 << 20
+    idle_timeout_s: float = 15.0  # keep-alive connections
+
+    @classmethod
+    def from_env(cls) -> "ServerConfig":
+        return cls(
+            host=os.getenv("RAG_SERVER_HOST", cls.host),
+            port=int(os.getenv("RAG_SERVER_PORT", cls.port)),
+            workers=int(os.getenv("RAG_SERVER_WORKERS", cls.workers)),
+            queue_size=int(os.getenv("RAG_SERVER_QUEUE_SIZE", cls.queue_size)),
+            deadline_s=float(os.getenv("RAG_REQUEST_DEADLINE", cls.deadline_s)),
+        )
+
+
+@dataclass
+class _Job:
+    state: Dict[str, Any]
+    deadline: float  # time.monotonic()
+    future: asyncio.Future
+    events: Optional[asyncio.Queue] = None
+    abandoned: threading.Event = field(default_factory=threading.Event)
+
+    def abandon(self) -> None:
+        """Stop the run at its next step; nobody will read its result."""
+        self.abandoned.set()
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+class Metrics:
+    """Request counters and a latency histogram, only touched on the event loop."""
+
+    def __init__(self) -> None:
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self.shed: Dict[str, int] = {}
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+
+    def observe(self, endpoint: str, status: int, seconds: float) -> None:
+        self.requests[(endpoint, status)] = self.requests.get((endpoint, status), 0) + 1
+        if status == 200:
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+            self.latency_sum += seconds
+            self.latency_count += 1
+
+    def render(self, gauges: Dict[str, float]) -> str:
+        lines = ["# TYPE rag_requests_total counter"]
+        for (endpoint, status), count in sorted(self.requests.items()):
+            lines.append(f'rag_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append("# TYPE rag_shed_total counter")
+        for reason, count in sorted(self.shed.items()):
+            lines.append(f'rag_shed_total{{reason="{reason}"}} {count}')
+        lines.append("# TYPE rag_request_latency_seconds histogram")
+        for bound, count in zip(LATENCY_BUCKETS, self.buckets):
+            lines.append(f'rag_request_latency_seconds_bucket{{le="{bound}"}} {count}')
+        lines.append(f'rag_request_latency_seconds_bucket{{le="+Inf"}} {self.latency_count}')
+        lines.append(f"rag_request_latency_seconds_sum {self.latency_sum:.6f}")
+        lines.append(f"rag_request_latency_seconds_count {self.latency_count}")
+        for name, value in gauges.items():
+            lines += [f"# TYPE rag_{name} gauge", f"rag_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+class QueryServer:
+    """
+    Asyncio HTTP front end that runs graph invocations on a bounded worker pool.
+
+    Args:
+        graph: Compiled graph to serve (default ``graph.graph.app``)
+        config: Limits and bind address (default :meth:`ServerConfig.from_env`)
+    """
+
+    def __init__(self, graph: Any = None, config: Optional[ServerConfig] = None) -> None:
+        if graph is None:
+            from graph.graph import app as graph
+        self.graph = graph
+        self.config = config or ServerConfig.from_env()
+        self.metrics = Metrics()
+        self.accepted = 0  # queued or running
+        self.in_flight = 0
+        self.service_time: Optional[float] = None
+        self._executor = ThreadPoolExecutor(max_workers=self.config.workers, thread_name_prefix="query")
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    # --- lifecycle -------------------------------------------------------
+
+    async def start(self) -> "QueryServer":
+        # Unbounded: admission is limited in submit(), counting running requests too.
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.config.workers)]
+        self._server = await asyncio.start_server(self._handle, self.config.host, self.config.port)
+        return self
+
+    @property
+    def port(self) -> int:
+        """Bound port, useful when started with port 0."""
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- admission -------------------------------------------------------
+
+    @property
+    def queued(self) -> int:
+        """Accepted requests still waiting for a worker."""
+        return self.accepted - self.in_flight
+
+    @property
+    def saturated(self) -> bool:
+        return self.accepted >= self.config.workers + self.config.queue_size
+
+    def expected_wait(self) -> float:
+        """Seconds a new request would wait for a worker, from the average run time."""
+        if self.service_time is None or self.accepted < self.config.workers:
+            return 0.0
+        return (self.accepted - self.config.workers + 1) / self.config.workers * self.service_time
+
+    def submit(self, state: Dict[str, Any], deadline: float, events: Optional[asyncio.Queue] = None) -> _Job:
+        """
+        Queue a graph run.
+
+        Raises:
+            Overloaded: The queue is full, or the request would wait past its deadline
+        """
+        wait = self.expected_wait()
+        if self.saturated:
+            reason = "queue_full"
+        elif wait > 0 and time.monotonic() + wait + self.service_time > deadline:
+            reason = "deadline"
+        else:
+            job = _Job(state, deadline, asyncio.get_running_loop().create_future(), events)
+            self._queue.put_nowait(job)
+            self.accepted += 1
+            return job
+        self.metrics.shed[reason] = self.metrics.shed.get(reason, 0) + 1
+        raise Overloaded(reason, retry_after=max(1.0, wait))
+
+    async def _work(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            if job.abandoned.is_set() or time.monotonic() >= job.deadline:
+                self.accepted -= 1
+                job.future.set_exception(DeadlineExceeded("Deadline passed while queued"))
+                continue
+            self.in_flight += 1
+            started = time.monotonic()
+            try:
+                result = await loop.run_in_executor(self._executor, self._run, job, loop)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+                elapsed = time.monotonic() - started
+                if self.service_time is None:
+                    self.service_time = elapsed
+                else:
+                    self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+            finally:
+                self.in_flight -= 1
+                self.accepted -= 1
+
+    def _run(self, job: _Job, loop: asyncio.AbstractEventLoop) -> Dict[str, Any]:
+        """Run the graph step by step on a worker thread, stopping at the deadline."""
+        state = dict(job.state)
+        try:
+            for update in self.graph.stream(job.state, stream_mode="updates"):
+                for node, values in update.items():
+                    state.update(values or {})
+                    if job.events is not None:
+                        event = {"node": node}
+                        if "generation" in (values or {}) and node != FINAL_NODE:
+                            event["generation"] = values["generation"]
+                        loop.call_soon_threadsafe(job.events.put_nowait, ("step", event))
+                if FINAL_NODE not in update and (job.abandoned.is_set() or time.monotonic() >= job.deadline):
+                    raise DeadlineExceeded(f"Deadline passed after {', '.join(update)}")
+        except BaseException:
+            # Only finalize frees the run's chunk store and memo scope; every other exit does it here.
+            _discard(state)
+            raise
+        return state
+
+    # --- HTTP ------------------------------------------------------------
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        _read_request(reader, self.config.max_body_bytes), self.config.idle_timeout_s
+                    )
+                except HTTPError as e:
+                    writer.write(_response(e.status, _json_body({"error": str(e)}), keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, path, keep_alive, body = request
+                if (method, path) == ("POST", "/query/stream"):
+                    await self._query_stream(writer, body)
+                    break
+                started = time.monotonic()
+                status, payload, content_type, headers = await self._dispatch(method, path, body)
+                if path in ("/query", "/health", "/metrics"):
+                    self.metrics.observe(path, status, time.monotonic() - started)
+                writer.write(_response(status, payload, content_type, headers, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, bytes, str, Dict[str, str]]:
+        routes = {"/query": "POST", "/query/stream": "POST", "/health": "GET", "/metrics": "GET"}
+        if path not in routes:
+            return _json(404, {"error": f"No route {path}"})
+        if method != routes[path]:
+            return _json(405, {"error": f"{path} expects {routes[path]}"}, {"Allow": routes[path]})
+        if path == "/health":
+            return _json(503 if self.saturated else 200, self.health())
+        if path == "/metrics":
+            text = self.metrics.render(self._gauges())
+            return 200, text.encode(), "text/plain; version=0.0.4", {}
+        return await self._query(body)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "saturated" if self.saturated else "ok",
+            "queued": self.queued,
+            "queue_size": self.config.queue_size,
+            "in_flight": self.in_flight,
+            "workers": self.config.workers,
+            "expected_wait_s": round(self.expected_wait(), 3),
+        }
+
+    def _gauges(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self.queued,
+            "queue_capacity": self.config.queue_size,
+            "in_flight": self.in_flight,
+            "workers": self.config.workers,
+            "service_time_seconds": round(self.service_time or 0.0, 6),
+        }
+
+    def _parse_query(self, body: bytes, now: float) -> Tuple[Dict[str, Any], float, Optional[str]]:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as e:
+            raise HTTPError(400, f"Invalid JSON: {e}") from None
+        if not isinstance(request, dict) or not isinstance(request.get("question"), str) or not request["question"].strip():
+            raise HTTPError(400, 'Body must be a JSON object with a non-empty "question"')
+        deadline_s = self.config.deadline_s
+        if "deadline_ms" in request:
+            deadline_ms = request["deadline_ms"]
+            if isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float)) or deadline_ms <= 0:
+                raise HTTPError(400, '"deadline_ms" must be a positive number')
+            deadline_s = min(request["deadline_ms"] / 1e3, self.config.max_deadline_s)
+        client_request_id = request.get("request_id")
+        if client_request_id is not None and not isinstance(client_request_id, str):
+            raise HTTPError(400, '"request_id" must be a string')
+        state = {"question": request["question"], **{k: request[k] for k in REQUEST_OPTIONS if k in request}}
+        state["request_id"] = uuid.uuid4().hex
+        return state, now + deadline_s, client_request_id
+
+    async def _query(self, body: bytes) -> Tuple[int, bytes, str, Dict[str, str]]:
+        started = time.monotonic()
+        try:
+            state, deadline, client_request_id = self._parse_query(body, started)
+            job = self.submit(state, deadline)
+            try:
+                result = await asyncio.wait_for(asyncio.shield(job.future), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                job.abandon()
+                raise DeadlineExceeded("Deadline passed") from None
+        except HTTPError as e:
+            return _json(e.status, {"error": str(e)})
+        except Overloaded as e:
+            return _json(503, {"error": str(e)}, {"Retry-After": str(math.ceil(e.retry_after))})
+        except DeadlineExceeded as e:
+            return _json(504, {"error": str(e), **_ids(state, client_request_id)})
+        except Exception as e:
+            print(f"[server] Query failed: {e!r}")
+            return _json(500, {"error": f"{type(e).__name__}: {e}"})
+        return _json(200, _answer(result, started, client_request_id))
+
+    async def _query_stream(self, writer: asyncio.StreamWriter, body: bytes) -> None:
+        """Answer ``/query/stream`` with ``step`` events, then ``answer`` or ``error``."""
+        started = time.monotonic()
+        events: asyncio.Queue = asyncio.Queue()
+        try:
+            state, deadline, client_request_id = self._parse_query(body, started)
+            job = self.submit(state, deadline, events)
+        except (HTTPError, Overloaded) as e:
+            status = e.status if isinstance(e, HTTPError) else 503
+            headers = {"Retry-After": str(math.ceil(e.retry_after))} if isinstance(e, Overloaded) else {}
+            writer.write(_response(status, _json_body({"error": str(e)}), headers=headers, keep_alive=False))
+            self.metrics.observe("/query/stream", status, time.monotonic() - started)
+            return
+
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n"
+        )
+        writer.write(_sse("queued", {**_ids(state, client_request_id), "queued": self.queued}))
+        status = 200
+        next_event = asyncio.ensure_future(events.get())
+        try:
+            await writer.drain()
+            while True:
+                done, _ = await asyncio.wait(
+                    {next_event, job.future},
+                    timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if next_event in done:
+                    writer.write(_sse(*next_event.result()))
+                    await writer.drain()
+                    next_event = asyncio.ensure_future(events.get())
+                elif job.future in done:
+                    break
+                else:
+                    raise DeadlineExceeded("Deadline passed")
+            while not events.empty():
+                writer.write(_sse(*events.get_nowait()))
+            writer.write(_sse("answer", _answer(job.future.result(), started, client_request_id)))
+        except DeadlineExceeded as e:
+            job.abandon()
+            status = 504
+            writer.write(_sse("error", {"status": status, "error": str(e), **_ids(state, client_request_id)}))
+        except ConnectionError:
+            job.abandon()
+            status = 499  # client closed the stream
+        except Exception as e:
+            status = 500
+            print(f"[server] Query failed: {e!r}")
+            writer.write(_sse("error", {"status": status, "error": f"{type(e).__name__}: {e}"}))
+        finally:
+            next_event.cancel()
+            self.metrics.observe("/query/stream", status, time.monotonic() - started)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def _discard(state: Dict[str, Any]) -> None:
+    """Free what an abandoned run left behind; ``finalize`` does this for finished ones."""
+    from graph.chunk_store import release_store
+    from graph.memo import cache_scope, memo_cache
+
+    memo_cache.drop_scope(cache_scope(state))
+    release_store(state)
+
+
+def _ids(state: Dict[str, Any], client_request_id: Optional[str]) -> Dict[str, str]:
+    ids = {"request_id": state["request_id"]}
+    if client_request_id is not None:
+        ids["client_request_id"] = client_request_id
+    return ids
+
+
+def _answer(state: Dict[str, Any], started: float, client_request_id: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        **_ids(state, client_request_id),
+        "generation": state.get("generation", ""),
+        "sources": state.get("sources", []),
+        "doc_count": state.get("doc_count", 0),
+        "used_web_search": bool(state.get("used_web_search", False)),
+        "route": state.get("route"),
+        "latency_ms": round((time.monotonic() - started) * 1e3, 1),
+    }
+
+
+async def _read_request(reader: asyncio.StreamReader, max_body: int) -> Optional[Tuple[str, str, bool, bytes]]:
+    """``(method, path, keep_alive, body)`` of the next request, ``None`` at EOF."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line") from None
+    headers: Dict[str, str] = {}
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length") from None
+    if length > max_body:
+        raise HTTPError(413, f"Body exceeds {max_body} bytes")
+    body = await reader.readexactly(length) if length else b""
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+    return method.upper(), target.split("?", 1)[0], keep_alive, body
+
+
+def _json_body(payload: Any) -> bytes:
+    return json.dumps(payload, default=str).encode()
+
+
+def _json(status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+    return status, _json_body(payload), "application/json", headers or {}
+
+
+def _response(
+    status: int,
+    body: bytes,
+    content_type: str = "application/json",
+    headers: Optional[Dict[str, str]] = None,
+    keep_alive: bool = True,
+) -> bytes:
+    head = [
+        f"HTTP/1.1 {status} {_reason(status)}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    head += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
+
+
+def _reason(status: int) -> str:
+    try:
+        return HTTPStatus(status).phrase
+    except ValueError:
+        return "Client Closed Request"
+
+
+def _sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+async def serve(config: ServerConfig, warm: bool = True) -> None:
+    """Run a :class:`QueryServer` until SIGINT or SIGTERM."""
+    loop = asyncio.get_running_loop()
+    if warm:
+        from sharding import sharded_index
+
+        # Open the index before the first request instead of inside it.
+        await loop.run_in_executor(None, lambda: sharded_index.snapshots)
+    server = await QueryServer(config=config).start()
+    print(f"[server] Serving on http://{config.host}:{server.port} "
+          f"({config.workers} workers, queue of {config.queue_size})")
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    print("[server] Shutting down")
+    await server.close()
+
+
+def main() -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    defaults = ServerConfig.from_env()
+    parser = argparse.ArgumentParser(description="Headless HTTP server for the corrective RAG graph.")
+    parser.add_argument("--host", default=defaults.host)
+    parser.add_argument("--port", type=int, default=defaults.port)
+    parser.add_argument("--workers", type=int, default=defaults.workers, help="concurrent graph runs")
+    parser.add_argument("--queue-size", type=int, default=defaults.queue_size, help="requests waiting for a worker")
+    parser.add_argument("--deadline", type=float, default=defaults.deadline_s, help="default deadline in seconds")
+    parser.add_argument("--no-warm", action="store_true", help="don't open the index before serving")
+    args = parser.parse_args()
+    config = ServerConfig(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        deadline_s=args.deadline,
+    )
+    asyncio.run(serve(config, warm=not args.no_warm))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Sharded retrieval over several collections.
+
+A :class:`ShardedIndex` spreads chunks over N independent
+:class:`index_manager.IndexManager` shards, each with its own Chroma
+collection and persist directory, so writes to different shards don't contend
+on one collection or one SQLite file. Ingestion routes each chunk by a
+configurable metadata key (``source`` by default; ``upload_id`` or a tenant
+field keep related chunks together). Queries embed the question once, search
+every shard in parallel and merge the per-shard top-k by relevance.
+
+With one shard (the default) the index is just the process-wide
+``index_manager`` and nothing fans out.
+"""
+
+import heapq
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from chromadb.errors import InvalidCollectionException
+from langchain_core.documents import Document
+
+from index_manager import IndexManager, IndexSnapshot, SnapshotRetriever, index_manager
+
+
+def shard_of(document: Document, shards: int, key: str = "source") -> int:
+    """Shard a chunk belongs to: crc32 of its ``key`` metadata, or of its text if it has none."""
+    value = (document.metadata or {}).get(key)
+    basis = document.page_content if value is None else str(value)
+    return zlib.crc32(basis.encode("utf-8")) % shards
+
+
+class ShardedIndex:
+    """
+    Fans searches out over shards and routes ingestion to them.
+
+    Args:
+        managers: One index manager per shard
+        shard_key: Metadata field ingestion routes chunks by
+    """
+
+    def __init__(self, managers: Sequence[IndexManager], shard_key: str = "source") -> None:
+        if not managers:
+            raise ValueError("ShardedIndex needs at least one shard")
+        self.managers = list(managers)
+        self.shard_key = shard_key
+        self._executor = (
+            ThreadPoolExecutor(max_workers=len(self.managers), thread_name_prefix="shard")
+            if len(self.managers) > 1
+            else None
+        )
+
+    @classmethod
+    def create(
+        cls,
+        collection_name: str,
+        persist_directory: str,
+        shards: int,
+        shard_key: str = "source",
+        **manager_kwargs: Any,
+    ) -> "ShardedIndex":
+        """Shards ``<collection_name>-s<i>`` persisted under ``<persist_directory>/shard-<i>``."""
+        managers = [
+            IndexManager(
+                collection_name=f"{collection_name}-s{i}",
+                persist_directory=str(Path(persist_directory) / f"shard-{i}"),
+                **manager_kwargs,
+            )
+            for i in range(shards)
+        ]
+        return cls(managers, shard_key)
+
+    def __len__(self) -> int:
+        return len(self.managers)
+
+    # --- reads -----------------------------------------------------------
+
+    @property
+    def embeddings(self):
+        return self.managers[0].embeddings
+
+    @property
+    def loaded(self) -> bool:
+        return all(m.loaded for m in self.managers)
+
+    @property
+    def snapshots(self) -> List[IndexSnapshot]:
+        """Current snapshot of every shard, loading them in parallel on first use."""
+        return self._map(lambda m: m.current)
+
+    @property
+    def chunk_count(self) -> int:
+        return sum(s.chunk_count for s in self.snapshots)
+
+    def similarity_search(
+        self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_scores(query, k=k, where=where)]
+
+    def similarity_search_with_scores(
+        self, query: str, k: int = 4, where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector(self.embeddings.embed_query(query), k=k, where=where)
+
+    def similarity_search_by_vector(
+        self, embedding: Sequence[float], k: int = 4, where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """Top-k of every shard, merged by relevance."""
+        per_shard = self._map(lambda m: m.similarity_search_by_vector(embedding, k=k, where=where))
+        if len(per_shard) == 1:
+            return per_shard[0]
+        return heapq.nlargest(k, (hit for hits in per_shard for hit in hits), key=lambda hit: hit[1])
+
+    def query(self, where: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        """
+        Raw ``collection.query`` on every shard, merged into one result.
+
+        Results are merged by distance, so each query keeps its global
+        ``n_results`` nearest chunks.
+        """
+        if len(self.managers) == 1:
+            return self.managers[0].query(where=where, **kwargs)
+        include = list(kwargs.pop("include", ["documents", "metadatas", "distances"]))
+        fields = include if "distances" in include else include + ["distances"]
+        per_shard = self._map(lambda m: m.query(where=where, include=fields, **kwargs))
+        n_results = kwargs.get("n_results", 10)
+
+        merged: Dict[str, Any] = {"ids": []}
+        merged.update({field: [] for field in include})
+        for q in range(len(per_shard[0]["ids"])):
+            hits = [
+                (result["distances"][q][i], shard, i)
+                for shard, result in enumerate(per_shard)
+                for i in range(len(result["ids"][q]))
+            ]
+            best = heapq.nsmallest(n_results, hits)
+            for field in ["ids"] + include:
+                merged[field].append([per_shard[shard][field][q][i] for _, shard, i in best])
+        return merged
+
+    def retriever(self, k: int = 4) -> SnapshotRetriever:
+        return SnapshotRetriever(manager=self, k=k)
+
+    # --- writes ----------------------------------------------------------
+
+    def route(self, documents: List[Document]) -> Dict[int, List[Document]]:
+        """Group chunks by the shard they belong to."""
+        groups: Dict[int, List[Document]] = {}
+        for document in documents:
+            groups.setdefault(shard_of(document, len(self.managers), self.shard_key), []).append(document)
+        return groups
+
+    def ingest(
+        self,
+        documents: List[Document],
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+    ) -> List[IndexSnapshot]:
+        """
+        Route chunks to their shards, embed and write them in parallel, then publish.
+
+        Every shard finishes embedding and writing its rows, still hidden
+        behind a new unpublished version, before any shard publishes. If any
+        shard fails, the rows the others wrote are deleted and every shard
+        keeps serving its previous snapshot; publishing itself is only a
+        reference swap per shard. Arguments are as for
+        :meth:`IndexManager.ingest`.
+
+        Returns:
+            The snapshots of the shards that received chunks
+        """
+        groups = sorted(self.route(documents).items())
+        if not groups:
+            return []
+        total = len(documents)
+        embedded = {shard: 0 for shard, _ in groups}
+        lock = threading.Lock()
+
+        def embed(item: Tuple[int, List[Document]]) -> List[List[float]]:
+            shard, chunks = item
+
+            def progress(done: int, _: int) -> None:
+                with lock:
+                    embedded[shard] = done
+                    count = sum(embedded.values())
+                if on_progress:
+                    on_progress(count, total)
+
+            return self.managers[shard].embed_documents(chunks, progress, should_cancel)
+
+        vectors = self._map_items(embed, groups)
+        managers = [self.managers[shard] for shard, _ in groups]
+        with ExitStack() as locks:
+            # Always in shard order, so concurrent ingestions can't deadlock.
+            for manager in managers:
+                locks.enter_context(manager._write_lock)
+            staged = self._map_items(
+                lambda item: _try(item[0]._stage, item[1][1], item[2]), list(zip(managers, groups, vectors))
+            )
+            failed = [result for result in staged if isinstance(result, BaseException)]
+            if failed:
+                for manager, result in zip(managers, staged):
+                    if not isinstance(result, BaseException):
+                        manager._discard(result)
+                raise failed[0]
+            snapshots = [manager._publish(result) for manager, result in zip(managers, staged)]
+        for manager in managers:
+            if manager.export_on_ingest:
+                manager.export_snapshot()
+        return snapshots
+
+    def rebuild(self, urls: Optional[List[str]] = None) -> List[IndexSnapshot]:
+        """Load the given URLs (or the defaults) and ingest them across the shards."""
+        from ingestion import load_and_split_documents
+
+        return self.ingest(load_and_split_documents(urls))
+
+    def reload(self) -> List[IndexSnapshot]:
+        return self._map(lambda m: m.reload())
+
+    def export_snapshots(self) -> List[Path]:
+        """Write every shard's snapshot file; see :meth:`IndexManager.export_snapshot`."""
+        return self._map(lambda m: m.export_snapshot())
+
+    # --- internals -------------------------------------------------------
+
+    def _map(self, fn: Callable[[IndexManager], Any]) -> List[Any]:
+        return self._map_items(fn, self.managers)
+
+    def _map_items(self, fn: Callable[[Any], Any], items: Sequence[Any]) -> List[Any]:
+        if self._executor is None or len(items) == 1:
+            return [fn(item) for item in items]
+        return list(self._executor.map(fn, items))
+
+
+def _try(fn: Callable[..., Any], *args: Any) -> Any:
+    """``fn(*args)``, or the exception it raised."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        return e
+
+
+def _unsharded_chunks(manager: IndexManager) -> int:
+    """Chunks in ``manager``'s own collection, which shards never read."""
+    if not Path(manager.persist_directory).exists():
+        return 0
+    import chromadb
+    from chromadb.config import Settings
+
+    # Same settings as langchain's Chroma, so the process shares one client.
+    client = chromadb.Client(Settings(is_persistent=True, persist_directory=manager.persist_directory))
+    try:
+        return client.get_collection(manager.collection_name).count()
+    except (InvalidCollectionException, ValueError):
+        return 0
+
+
+def _from_env() -> ShardedIndex:
+    shards = int(os.getenv("RAG_SHARDS", "1"))
+    shard_key = os.getenv("RAG_SHARD_KEY", "source")
+    if shards <= 1:
+        return ShardedIndex([index_manager], shard_key)
+    unsharded = _unsharded_chunks(index_manager)
+    if unsharded:
+        raise RuntimeError(
+            f"RAG_SHARDS={shards}, but collection {index_manager.collection_name!r} in "
+            f"{index_manager.persist_directory} still holds {unsharded} unsharded chunks that the shards would "
+            "not serve. Re-ingest its sources with RAG_SHARDS set and delete the collection, "
+            "or unset RAG_SHARDS."
+        )
+    return ShardedIndex.create(
+        collection_name=index_manager.collection_name,
+        persist_directory=index_manager.persist_directory,
+        shards=shards,
+        shard_key=shard_key,
+        vector_dtype=index_manager.vector_dtype,
+        rescore_factor=index_manager.rescore_factor,
+        indexed_fields=index_manager.indexed_fields,
+        snapshot_verify=index_manager.snapshot_verify,
+        export_on_ingest=index_manager.export_on_ingest,
+    )
+
+
+sharded_index = _from_env()
@@ -0,0 +1,268 @@
+"""
+Single-file, memory-mapped index snapshots.
+
+Opening Chroma's persistent store means starting its SQLite and HNSW
+segments, and a large collection takes a long time to become query-ready. A
+snapshot file packs one collection's vectors, chunk texts and metadata into
+one versioned file that is opened with ``mmap``. Nothing is parsed up front
+beyond the header and the ids; the OS pages vectors and texts in as queries
+touch them. Integrity is checked against per-section CRC32 checksums, not by
+running a query.
+
+Layout (little-endian)::
+
+    b"RAGSNAP1"
+    u32 header length, u32 header crc32
+    header      UTF-8 JSON: {"format", "version", "count", "dim", "space",
+                "created_at", "sections": {name: [offset, length, crc32]}}
+    sections    64-byte aligned, offsets relative to the end of the header:
+                vectors      float32 (count, dim), unit-normalized
+                ids          UTF-8, split by ids_offsets (uint64, count + 1)
+                texts        UTF-8, split by texts_offsets
+                metadatas    one JSON object per row, split by metadatas_offsets
+
+Usage:
+    python snapshot_file.py export            # every shard of the configured index
+    python snapshot_file.py verify PATH...
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+MAGIC = b"RAGSNAP1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+# Sections checked when verify="header": everything but the bulk data.
+INDEX_SECTIONS = ("ids", "ids_offsets", "texts_offsets", "metadatas_offsets")
+CRC_BLOCK_BYTES = 16 << 20
+_PREAMBLE = struct.Struct("<8sII")
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is truncated, corrupt or of an unknown format."""
+
+
+def _strings(values: Iterable[str]) -> Tuple[bytes, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+def _crc32(buffer: memoryview) -> int:
+    crc = 0
+    for start in range(0, len(buffer), CRC_BLOCK_BYTES):
+        crc = zlib.crc32(buffer[start:start + CRC_BLOCK_BYTES], crc)
+    return crc
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+class SnapshotFile:
+    """
+    A snapshot file mapped into memory.
+
+    Use :meth:`write` and :meth:`open` rather than the constructor.
+    """
+
+    def __init__(self, path: Path, buffer: mmap.mmap, header: Dict[str, Any], data_offset: int) -> None:
+        self.path = path
+        self.version: int = header["version"]
+        self.count: int = header["count"]
+        self.dim: int = header["dim"]
+        self.space: str = header["space"]
+        self.created_at: float = header["created_at"]
+        self._buffer = buffer
+        self._sections = header["sections"]
+        self._data_offset = data_offset
+        self.vectors = self._array("vectors", np.float32).reshape(self.count, self.dim)
+        self._offsets = {name: self._array(f"{name}_offsets", np.uint64) for name in ("ids", "texts", "metadatas")}
+        offset, length, _ = self._sections["ids"]
+        blob = buffer[data_offset + offset:data_offset + offset + length]
+        bounds = self._offsets["ids"].tolist()
+        self.ids = [blob[a:b].decode("utf-8") for a, b in zip(bounds[:-1], bounds[1:])]
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return self.count
+
+    # --- writing ---------------------------------------------------------
+
+    @classmethod
+    def write(
+        cls,
+        path: Union[str, Path],
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadatas: Sequence[Optional[Dict[str, Any]]],
+        version: int = 0,
+        space: str = "l2",
+    ) -> Path:
+        """Write a snapshot to ``path``, replacing any existing file atomically."""
+        path = Path(path)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError(f"Expected {len(ids)} vector rows, got an array of shape {vectors.shape}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        id_bytes, id_offsets = _strings(ids)
+        text_bytes, text_offsets = _strings(texts)
+        meta_bytes, meta_offsets = _strings(json.dumps(m or {}, default=str) for m in metadatas)
+        sections = {
+            "vectors": (vectors / norms).tobytes(),
+            "ids": id_bytes,
+            "ids_offsets": id_offsets.tobytes(),
+            "texts": text_bytes,
+            "texts_offsets": text_offsets.tobytes(),
+            "metadatas": meta_bytes,
+            "metadatas_offsets": meta_offsets.tobytes(),
+        }
+        table, offset, end = {}, 0, 0
+        for name, data in sections.items():
+            table[name] = [offset, len(data), zlib.crc32(data)]
+            end = offset + len(data)
+            offset = _aligned(end)
+        header = json.dumps({
+            "format": FORMAT_VERSION,
+            "version": version,
+            "count": len(ids),
+            "dim": vectors.shape[1],
+            "space": space,
+            "created_at": time.time(),
+            "sections": table,
+        }).encode("utf-8")
+        data_offset = _aligned(_PREAMBLE.size + len(header))
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique temp name: concurrent exports must not interleave their writes.
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                f.write(_PREAMBLE.pack(MAGIC, len(header), zlib.crc32(header)))
+                f.write(header)
+                for name, data in sections.items():
+                    f.seek(data_offset + table[name][0])
+                    f.write(data)
+                f.truncate(data_offset + end)
+                f.flush()
+                os.fsync(f.fileno())
+            # Readers that mapped the old file keep it until they let go.
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        return path
+
+    # --- reading ---------------------------------------------------------
+
+    @classmethod
+    def open(cls, path: Union[str, Path], verify: str = "full") -> "SnapshotFile":
+        """
+        Map a snapshot file and check it.
+
+        Args:
+            path: Snapshot file
+            verify: "full" checks every section's checksum, reading the whole
+                file once; "header" checks the header and the id and offset
+                sections only, leaving vectors, texts and metadata unread
+                until used
+
+        Raises:
+            FileNotFoundError: No file at ``path``
+            SnapshotError: The file is truncated, corrupt or of another format
+        """
+        if verify not in ("full", "header"):
+            raise ValueError(f"verify must be 'full' or 'header', not {verify!r}")
+        path = Path(path)
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _PREAMBLE.size:
+                raise SnapshotError(f"{path} is too short to be a snapshot")
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length, header_crc = _PREAMBLE.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not an index snapshot")
+        raw = buffer[_PREAMBLE.size:_PREAMBLE.size + header_length]
+        if len(raw) != header_length or zlib.crc32(raw) != header_crc:
+            raise SnapshotError(f"{path} has a corrupt header")
+        header = json.loads(raw)
+        if header.get("format") != FORMAT_VERSION:
+            raise SnapshotError(f"{path} has snapshot format {header.get('format')}, expected {FORMAT_VERSION}")
+
+        data_offset = _aligned(_PREAMBLE.size + header_length)
+        view = memoryview(buffer)
+        for name, (offset, length, crc) in header["sections"].items():
+            start = data_offset + offset
+            if start + length > size:
+                raise SnapshotError(f"{path} is truncated in section {name!r}")
+            if (verify == "full" or name in INDEX_SECTIONS) and _crc32(view[start:start + length]) != crc:
+                raise SnapshotError(f"{path} failed its checksum in section {name!r}")
+        view.release()
+        return cls(path, buffer, header, data_offset)
+
+    def _array(self, name: str, dtype: type) -> np.ndarray:
+        offset, length, _ = self._sections[name]
+        return np.frombuffer(
+            self._buffer, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=self._data_offset + offset
+        )
+
+    def _string(self, name: str, row: int) -> str:
+        offsets = self._offsets[name]
+        start = self._data_offset + self._sections[name][0]
+        return self._buffer[start + int(offsets[row]):start + int(offsets[row + 1])].decode("utf-8")
+
+    def row(self, chunk_id: str) -> Optional[int]:
+        return self._rows.get(chunk_id)
+
+    def text(self, row: int) -> str:
+        return self._string("texts", row)
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        return json.loads(self._string("metadatas", row))
+
+    def metadatas(self) -> List[Dict[str, Any]]:
+        return [self.metadata(row) for row in range(self.count)]
+
+    def document(self, row: int) -> Document:
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export or verify index snapshot files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("export", help="snapshot every shard of the configured index")
+    verify = commands.add_parser("verify", help="check snapshot files against their checksums")
+    verify.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        from sharding import sharded_index
+
+        for path in sharded_index.export_snapshots():
+            print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        return
+    for path in args.paths:
+        start = time.perf_counter()
+        snapshot = SnapshotFile.open(path, verify="full")
+        print(f"{path}: OK, version {snapshot.version}, {snapshot.count} chunks x {snapshot.dim} dims, "
+              f"verified in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# Modules build their OpenAI/Tavily clients at import time; tests never call them.
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("TAVILY_API_KEY", "tvly-test")
+os.environ.setdefault("USER_AGENT", "tests")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
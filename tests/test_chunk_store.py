@@ -0,0 +1,79 @@
+import pytest
+from langchain_core.documents import Document
+
+import graph.chunk_store as chunk_store_module
+from graph.chunk_store import ChunkStore, ChunkStoreRegistry, chunk_id, chunk_stores
+
+
+def test_chunk_id_is_stable_and_covers_metadata():
+    document = Document(page_content="agents plan", metadata={"source": "a", "page": 1})
+    same = Document(page_content="agents plan", metadata={"page": 1, "source": "a"})
+    assert chunk_id(document) == chunk_id(same)
+    assert len(chunk_id(document)) == 20
+    assert chunk_id(document) != chunk_id(Document(page_content="agents plan", metadata={"source": "b", "page": 1}))
+    assert chunk_id(document) != chunk_id(Document(page_content="agents act", metadata={"source": "a", "page": 1}))
+
+
+def test_add_and_resolve_round_trip():
+    store = ChunkStore()
+    first = Document(page_content="one", metadata={"source": "a"})
+    second = Document(page_content="two", metadata={"source": "b"})
+    refs = store.add_scored([(first, 0.9), (second, None), (first, 0.5)])
+
+    assert refs["ids"] == [chunk_id(first), chunk_id(second), chunk_id(first)]
+    assert refs["scores"] == [0.9, None, 0.5]
+    assert len(store) == 2
+    assert store.texts(refs["ids"]) == ["one", "two", "one"]
+    assert store.documents(refs["ids"][:2]) == [first, second]
+    assert store.sources(refs["ids"][:2]) == [{"source": "a"}, {"source": "b"}]
+
+    # Neither the caller's documents nor resolved copies alias stored metadata.
+    first.metadata["source"] = "changed"
+    store.sources(refs["ids"])[0]["source"] = "changed"
+    store.documents(refs["ids"])[0].metadata["source"] = "changed"
+    assert store.get(refs["ids"][0]).metadata == {"source": "a"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(chunk_store_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_eviction_skips_scopes_still_in_use(clock):
+    registry = ChunkStoreRegistry(max_stores=2, idle_s=60)
+    live = registry.store("live")
+    cid = live.add(Document(page_content="kept"))
+
+    clock[0] += 30
+    registry.store("b")
+    registry.store("c")
+    # Over the limit, but "live" was used 30 seconds ago: the registry grows.
+    assert registry.stats()["stores"] == 3
+    assert registry.store("live") is live and live.text(cid) == "kept"
+
+    clock[0] += 61
+    registry.store("d")
+    # "b" and "c" are idle and least recently used; "live" and "d" stay.
+    assert registry.stats()["stores"] == 2
+    assert registry.store("live") is live
+
+    registry.release("live")
+    assert registry.store("live") is not live
+
+
+def test_finalize_materializes_documents_and_releases_the_store():
+    from graph.graph import finalize
+
+    state = {"request_id": "req-finalize", "generation": "answer", "route": "websearch", "used_web_search": True}
+    documents = [Document(page_content="one", metadata={"source": "a"}), Document(page_content="two", metadata={"source": "b"})]
+    refs = chunk_store_module.store_for(state).add_documents(documents)
+
+    result = finalize({**state, "chunk_ids": refs["ids"], "chunk_scores": refs["scores"]})
+
+    assert result["documents"] == documents
+    assert result["sources"] == [{"source": "a"}, {"source": "b"}]
+    assert result["doc_count"] == 2
+    assert (result["generation"], result["route"], result["used_web_search"]) == ("answer", "websearch", True)
+    assert "req-finalize" not in chunk_stores._stores
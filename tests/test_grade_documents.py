@@ -0,0 +1,127 @@
+import importlib
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.documents import Document
+
+from graph.chunk_store import chunk_id, release_store, store_for
+from graph.memo import memo_cache
+
+grading = importlib.import_module("graph.nodes.grade_documents")
+web_search_module = importlib.import_module("graph.nodes.web_search")
+
+WEB_HIT = Document(page_content="web hit", metadata={"source": "tavily"})
+
+
+class StubGrader:
+    """retrieval_grader stand-in: ``verdicts`` maps a document's text to a function returning 'yes' or 'no'."""
+
+    def __init__(self, verdicts):
+        self.verdicts = verdicts
+        self.calls = []
+
+    def invoke(self, inputs):
+        self.calls.append(inputs["document"])
+        return SimpleNamespace(binary_score=self.verdicts[inputs["document"]]())
+
+
+@pytest.fixture
+def request_state():
+    memo_cache.clear()
+    state = {"request_id": "req-grade", "question": "what is an agent?", "incremental_grading": True}
+    yield state
+    release_store(state)
+    memo_cache.clear()
+
+
+def with_chunks(state, *texts, **extra):
+    refs = store_for(state).add_documents([Document(page_content=t) for t in texts])
+    return {**state, "chunk_ids": refs["ids"], "chunk_scores": refs["scores"], **extra}
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_early_exit_leaves_no_memo_entries_after_finalize(request_state, monkeypatch):
+    from graph.graph import finalize
+
+    started = threading.Semaphore(0)
+    release = threading.Event()
+
+    def first():
+        # Answer only once the other two calls are running, so they can't be cancelled.
+        assert started.acquire(timeout=5) and started.acquire(timeout=5)
+        return "yes"
+
+    def slow():
+        started.release()
+        release.wait(5)
+        return "no"
+
+    grader = StubGrader({"a": first, "b": slow, "c": slow})
+    monkeypatch.setattr(grading, "retrieval_grader", grader)
+    state = with_chunks(request_state, "a", "b", "c", min_relevant_docs=1)
+
+    result = grading.grade_documents(state)
+    assert result["chunk_ids"] == [chunk_id(Document(page_content="a"))]
+    assert result["web_search"] is False and result["prefetched_web"] is None
+
+    finalize({**state, **result})
+    release.set()
+    wait_until(lambda: memo_cache.stats()["by_name"]["retrieval_grader"]["misses"] == 3)
+    assert sorted(grader.calls) == ["a", "b", "c"]
+    assert memo_cache.stats()["entries"] == 0
+
+
+@pytest.fixture
+def web_search_stub(monkeypatch):
+    started = threading.Event()
+    calls = []
+
+    def search_web(question):
+        calls.append(question)
+        started.set()
+        return [WEB_HIT]
+
+    monkeypatch.setattr(web_search_module, "search_web", search_web)
+    return started, calls
+
+
+def test_web_search_starts_once_threshold_is_unreachable(request_state, monkeypatch, web_search_stub):
+    web_started, web_calls = web_search_stub
+
+    def after_web_search():
+        # Still in flight when the first verdict makes the threshold of 3 unreachable.
+        assert web_started.wait(5)
+        return "yes"
+
+    monkeypatch.setattr(grading, "retrieval_grader", StubGrader({"a": lambda: "no", "b": after_web_search, "c": after_web_search}))
+    state = with_chunks(request_state, "a", "b", "c")
+
+    result = grading.grade_documents(state)
+
+    assert web_calls == ["what is an agent?"]
+    assert result["chunk_ids"] == [chunk_id(Document(page_content=t)) for t in ("b", "c")]
+    assert result["web_search"] is True and result["route"] == "hybrid"
+    assert result["prefetched_web"] == {"ids": [chunk_id(WEB_HIT)], "scores": [None]}
+    assert store_for(state).texts(result["prefetched_web"]["ids"]) == ["web hit"]
+
+
+def test_web_search_node_uses_prefetched_results(request_state, monkeypatch, web_search_stub):
+    _, web_calls = web_search_stub
+    monkeypatch.setattr(grading, "retrieval_grader", StubGrader({"a": lambda: "yes", "b": lambda: "no"}))
+    state = with_chunks(request_state, "a", "b")
+
+    graded = {**state, **grading.grade_documents(state)}
+    assert web_calls == ["what is an agent?"]
+    result = web_search_module.web_search(graded)
+
+    assert web_calls == ["what is an agent?"]
+    assert result["chunk_ids"] == [chunk_id(Document(page_content="a")), chunk_id(WEB_HIT)]
+    assert result["used_web_search"] is True and result["prefetched_web"] is None
@@ -0,0 +1,36 @@
+import pytest
+from langchain_core.documents import Document
+
+from graph.grounding import check_grounding
+
+SOURCE = [
+    Document(page_content=(
+        "After RLHF, the attack success rate increased from 20% to 60% on held-out prompts. "
+        "Jailbreak prompts were collected from public forums."
+    ))
+]
+
+
+def test_copied_sentence_is_accepted():
+    check = check_grounding("After RLHF, the attack success rate increased from 20% to 60%.", SOURCE)
+    assert check.grounded
+    assert check.sentences[0].terms_in_order
+
+
+@pytest.mark.parametrize("generation", [
+    "After RLHF, the attack success rate increased from 60% to 20%.",
+    "The attack success rate increased from 60% to 20% after RLHF.",
+])
+def test_swapped_key_terms_go_to_the_grader(generation):
+    check = check_grounding(generation, SOURCE)
+    sentence = check.sentences[0]
+    assert sentence.coverage == 1.0 and not sentence.missing_terms
+    assert not sentence.terms_in_order
+    assert not check.grounded
+    assert check.excerpts
+
+
+def test_missing_number_goes_to_the_grader():
+    check = check_grounding("After RLHF, the attack success rate increased from 20% to 70%.", SOURCE)
+    assert check.sentences[0].missing_terms == ["70"]
+    assert not check.grounded
@@ -0,0 +1,52 @@
+import threading
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from index_manager import IndexManager
+
+
+def manager(directory, **kwargs):
+    m = IndexManager("test", str(directory), snapshot_verify=None, **kwargs)
+    m._embeddings = DeterministicFakeEmbedding(size=8)
+    return m
+
+
+def test_reload_overlapping_ingest_keeps_the_published_version(tmp_path):
+    index = manager(tmp_path)
+    index.ingest([Document(page_content="old chunk")])
+    opened, release = threading.Event(), threading.Event()
+    open_store = index._open
+
+    def slow_open(**kwargs):
+        snapshot = open_store(**kwargs)
+        opened.set()
+        release.wait(5)
+        return snapshot
+
+    index._open = slow_open
+    reloader = threading.Thread(target=index.reload)
+    reloader.start()
+    assert opened.wait(5)
+    ingester = threading.Thread(target=index.ingest, args=([Document(page_content="fresh chunk")],))
+    ingester.start()
+    ingester.join(0.3)  # publishes here unless the reload holds the write lock
+    release.set()
+    reloader.join(5)
+    ingester.join(5)
+
+    assert index.current.version == 2
+    assert sorted(d.page_content for d in index.similarity_search("fresh chunk", k=5)) == ["fresh chunk", "old chunk"]
+
+
+def test_reload_does_not_publish_an_allocated_version(tmp_path):
+    index = manager(tmp_path)
+    index.ingest([Document(page_content="published")])
+    with index._write_lock:
+        staged = index._stage([Document(page_content="staged")], [[0.1] * 8])
+        index._discard(staged)
+
+    snapshot = index.reload()
+    assert snapshot.version == 1
+    assert index.visibility_filter(snapshot) == {"index_version": {"$nin": [2]}}
+    assert [d.page_content for d in index.similarity_search("staged", k=5)] == ["published"]
@@ -0,0 +1,118 @@
+import json
+import threading
+import time
+
+import pytest
+
+import ingestion
+from index_manager import IngestionCancelled
+from jobs import CANCELLED, FAILED, SUCCEEDED, JobQueue
+
+
+def write_job(state_dir, job_id, status, finished_at=None):
+    job = {
+        "id": job_id,
+        "status": status,
+        "created_at": time.time(),
+        "started_at": None,
+        "finished_at": finished_at,
+        "files": [],
+        "chunks_total": 0,
+        "chunks_embedded": 0,
+        "error": None,
+        "cleanup": True,
+    }
+    (state_dir / f"{job_id}.json").write_text(json.dumps(job))
+    upload = state_dir / job_id
+    upload.mkdir()
+    (upload / "doc.txt").write_text("text")
+
+
+def wait_for(queue, job_id, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if queue.get(job_id)["status"] == status:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"{job_id} is {queue.get(job_id)['status']}, expected {status}")
+
+
+def test_restore_fails_interrupted_jobs_and_removes_their_uploads(tmp_path):
+    write_job(tmp_path, "running", "running")
+    write_job(tmp_path, "done", SUCCEEDED, finished_at=time.time())
+    (tmp_path / "staged-never-submitted").mkdir()
+    (tmp_path / "half.json.tmp").write_text("{")
+
+    queue = JobQueue(str(tmp_path))
+
+    job = queue.get("running")
+    assert job["status"] == FAILED and job["error"] == "Interrupted by restart"
+    assert json.loads((tmp_path / "running.json").read_text())["status"] == FAILED
+    assert not (tmp_path / "running").exists()
+    assert not (tmp_path / "staged-never-submitted").exists()
+    assert not (tmp_path / "half.json.tmp").exists()
+    assert queue.get("done")["status"] == SUCCEEDED
+
+
+def test_restore_prunes_finished_jobs_by_count_and_age(tmp_path):
+    now = time.time()
+    write_job(tmp_path, "expired", SUCCEEDED, finished_at=now - 10 * 86400)
+    for i in range(4):
+        write_job(tmp_path, f"recent-{i}", FAILED, finished_at=now - i)
+
+    queue = JobQueue(str(tmp_path), keep_jobs=3, retention_s=7 * 86400)
+
+    assert sorted(j["id"] for j in queue.list()) == ["recent-0", "recent-1", "recent-2"]
+    for gone in ("expired", "recent-3"):
+        assert not (tmp_path / f"{gone}.json").exists()
+        assert not (tmp_path / gone).exists()
+
+
+@pytest.fixture
+def blocking_ingest(monkeypatch):
+    """process_documents that runs until the job is cancelled or ``release`` is set."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def process_documents(paths, on_file=None, on_chunks=None, should_cancel=None, upload_id=None):
+        started.set()
+        while not release.is_set():
+            if should_cancel():
+                raise IngestionCancelled("cancelled")
+            time.sleep(0.01)
+
+    monkeypatch.setattr(ingestion, "process_documents", process_documents)
+    return started, release
+
+
+def test_cancel_queued_and_running_jobs(tmp_path, blocking_ingest):
+    started, release = blocking_ingest
+    queue = JobQueue(str(tmp_path), max_concurrent=1)
+    running = queue.submit([])
+    assert started.wait(5)
+    queued_id = queue.new_job_id()
+    (queue.upload_dir(queued_id) / "doc.txt").write_text("text")
+    queued = queue.submit([str(tmp_path / queued_id / "doc.txt")], job_id=queued_id)
+
+    assert queue.cancel(queued)
+    assert queue.get(queued)["status"] == CANCELLED
+    assert queue.cancel(running)
+    wait_for(queue, running, CANCELLED)
+    queue._executor.shutdown(wait=True)
+
+    # The queued job never started, and its upload was removed when its turn came.
+    assert queue.get(queued)["started_at"] is None
+    assert not (tmp_path / queued).exists()
+    assert not queue.cancel(queued)
+    assert not queue.has_active()
+    release.set()
+
+
+def test_finished_job_is_persisted(tmp_path, blocking_ingest):
+    _, release = blocking_ingest
+    release.set()
+    queue = JobQueue(str(tmp_path))
+    job_id = queue.submit([])
+    queue._executor.shutdown(wait=True)
+    assert queue.get(job_id)["status"] == SUCCEEDED
+    assert JobQueue(str(tmp_path)).get(job_id)["status"] == SUCCEEDED
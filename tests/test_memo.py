@@ -0,0 +1,44 @@
+from graph import memo
+from graph.memo import GLOBAL_SCOPE, MemoCache
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(memo.time, "monotonic", lambda: now[0])
+    cache = MemoCache()
+    calls = []
+
+    def search():
+        calls.append(now[0])
+        return [f"results at {now[0]}"]
+
+    assert cache.get_or_compute("web_search", GLOBAL_SCOPE, "q", search, ttl=600) == ["results at 1000.0"]
+    now[0] += 599
+    assert cache.get_or_compute("web_search", GLOBAL_SCOPE, "q", search, ttl=600) == ["results at 1000.0"]
+    now[0] += 1
+    assert cache.get_or_compute("web_search", GLOBAL_SCOPE, "q", search, ttl=600) == ["results at 1600.0"]
+    assert calls == [1000.0, 1600.0]
+    assert cache.stats()["by_name"]["web_search"]["hits"] == 1
+
+
+def test_entries_without_ttl_never_expire(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(memo.time, "monotonic", lambda: now[0])
+    cache = MemoCache()
+    cache.get_or_compute("generate", GLOBAL_SCOPE, "k", lambda: "first")
+    now[0] += 10 ** 9
+    assert cache.get_or_compute("generate", GLOBAL_SCOPE, "k", lambda: "second") == "first"
+
+
+def test_result_finishing_after_drop_scope_is_not_stored():
+    cache = MemoCache()
+
+    def grade():
+        # The request finishes while this call is still running.
+        cache.drop_scope("req-1")
+        return "yes"
+
+    assert cache.get_or_compute("retrieval_grader", "req-1", "k", grade) == "yes"
+    assert cache.stats()["entries"] == 0
+    assert cache.get_or_compute("retrieval_grader", "req-1", "k", lambda: "again") == "again"
+    assert cache.stats()["entries"] == 1
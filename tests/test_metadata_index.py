@@ -0,0 +1,78 @@
+import chromadb
+import numpy as np
+import pytest
+
+from metadata_index import ROW_DTYPE, MetadataIndex
+
+FILTERS = [
+    {"file_type": "pdf"},
+    {"source": {"$eq": "s3"}},
+    {"source": {"$ne": "s3"}},
+    {"source": {"$in": ["s1", "s4", "missing"]}},
+    {"file_type": {"$nin": ["pdf", "md"]}},
+    {"ingested_at": {"$gte": 1003}},
+    {"$and": [{"ingested_at": {"$gt": 1001}}, {"ingested_at": {"$lte": 1004}}]},
+    {"$and": [{"file_type": "txt"}, {"ingested_at": {"$lt": 1003}}]},
+    {"$or": [{"source": "s0"}, {"upload_id": "job-1"}]},
+    {"$and": [{"$or": [{"file_type": "md"}, {"source": "s2"}]}, {"ingested_at": {"$gte": 1002}}]},
+]
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    metadatas = [
+        {
+            # s0 is on most rows (a dense bitmap), the rest on few (row-id postings)
+            "source": "s0" if i % 4 else f"s{rng.integers(1, 40)}",
+            "file_type": ["pdf", "txt", "md"][i % 3],
+            "ingested_at": 1000 + i // 60,
+            **({"upload_id": f"job-{i % 5}"} if i % 2 else {}),
+        }
+        for i in range(400)
+    ]
+    collection = chromadb.Client().create_collection("metadata-index-test")
+    collection.add(
+        ids=[str(i) for i in range(len(metadatas))],
+        embeddings=rng.normal(size=(len(metadatas), 4)).tolist(),
+        metadatas=metadatas,
+    )
+    return metadatas, collection
+
+
+def test_postings_mix_bitmaps_and_row_ids(corpus):
+    metadatas, _ = corpus
+    index = MetadataIndex.build(metadatas)
+    assert index._postings["source"]["s0"].dtype == np.uint8
+    assert index._postings["source"]["s5"].dtype == ROW_DTYPE
+
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_matches_chroma_where(corpus, where):
+    metadatas, collection = corpus
+    expected = sorted(int(i) for i in collection.get(where=where)["ids"])
+    # Built in uneven pieces, so extend has to grow bitmaps and promote row-id postings.
+    index = MetadataIndex.build(metadatas[:7])
+    for start, stop in ((7, 150), (150, 151), (151, 400)):
+        index = index.extend(metadatas[start:stop])
+    assert index.size == len(metadatas)
+    assert np.flatnonzero(index.evaluate(where)).tolist() == expected
+    assert np.flatnonzero(MetadataIndex.build(metadatas).evaluate(where)).tolist() == expected
+
+
+def test_extend_leaves_the_old_index_unchanged(corpus):
+    metadatas, _ = corpus
+    index = MetadataIndex.build(metadatas)
+    before = index.evaluate({"source": "s0"}).copy()
+    extended = index.extend([{"source": "s0"}] * 3)
+    assert np.array_equal(index.evaluate({"source": "s0"}), before)
+    assert extended.evaluate({"source": "s0"})[-3:].all()
+    # values the new rows don't carry keep their postings
+    assert extended._postings["file_type"]["pdf"] is index._postings["file_type"]["pdf"]
+
+
+def test_unindexed_field_is_rejected(corpus):
+    index = MetadataIndex.build(corpus[0])
+    assert not index.supports({"author": "x"})
+    with pytest.raises(KeyError):
+        index.evaluate({"author": "x"})
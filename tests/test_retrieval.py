@@ -0,0 +1,44 @@
+import numpy as np
+
+from retrieval import DEFAULT_OPTIONS, _resolve_options, mmr_search
+
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0]
+
+
+class FakeManager:
+    """Returns the same candidates for every query: two near-identical chunks and one other."""
+
+    embeddings = FakeEmbeddings()
+
+    def query(self, where=None, query_embeddings=None, n_results=10, include=()):
+        vectors = np.array([[1.0, 0.05, 0.0], [1.0, 0.06, 0.0], [0.6, 0.8, 0.0]])
+        return {
+            "documents": [["a", "a copy", "b"]],
+            "metadatas": [[{}, {}, {}]],
+            "embeddings": [vectors.tolist()],
+        }
+
+
+def test_missing_options_keep_defaults():
+    assert _resolve_options(None) == DEFAULT_OPTIONS
+    assert _resolve_options({"mode": "mmr"}) == {**DEFAULT_OPTIONS, "mode": "mmr"}
+
+
+def test_explicit_none_disables_nullable_options():
+    resolved = _resolve_options({"duplicate_threshold": None, "score_threshold": None, "k": None})
+    assert resolved["duplicate_threshold"] is None
+    assert resolved["score_threshold"] is None
+    # None is not a valid k, so it keeps the default.
+    assert resolved["k"] == DEFAULT_OPTIONS["k"]
+
+
+def test_duplicates_dropped_unless_threshold_disabled():
+    options = {"mode": "mmr", "k": 3, "lambda_mult": 1.0}
+    default = mmr_search(FakeManager(), "q", _resolve_options(options))
+    assert [d.page_content for d, _ in default] == ["a", "b"]
+
+    kept = mmr_search(FakeManager(), "q", _resolve_options({**options, "duplicate_threshold": None}))
+    assert sorted(d.page_content for d, _ in kept) == ["a", "a copy", "b"]
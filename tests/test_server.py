@@ -0,0 +1,102 @@
+import asyncio
+import json
+import time
+
+from graph.chunk_store import chunk_stores, store_for
+from langchain_core.documents import Document
+from server import QueryServer, ServerConfig
+
+
+class SlowGraph:
+    """Stands in for the compiled graph: one chunk stored, then ``steps`` slow steps."""
+
+    def __init__(self, steps: int = 1, step_s: float = 0.0, fail: bool = False) -> None:
+        self.steps = steps
+        self.step_s = step_s
+        self.fail = fail
+        self.request_ids = []
+
+    def stream(self, state, stream_mode="updates"):
+        self.request_ids.append(state["request_id"])
+        store_for(state).add(Document(page_content="chunk", metadata={}))
+        for i in range(self.steps):
+            time.sleep(self.step_s)
+            if self.fail:
+                raise RuntimeError("retriever down")
+            yield {f"step{i}": {}}
+        yield {"finalize": {"generation": "answer"}}
+
+
+async def post(port: int, payload: dict):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode()
+    writer.write(
+        f"POST /query HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    lines = head.decode().split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return int(lines[0].split()[1]), headers, json.loads(payload)
+
+
+def serve(graph, coroutine, **config):
+    async def main():
+        server = await QueryServer(graph=graph, config=ServerConfig(port=0, **config)).start()
+        try:
+            return await coroutine(server)
+        finally:
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_answers_with_a_server_side_request_id():
+    graph = SlowGraph()
+    status, _, body = serve(graph, lambda s: post(s.port, {"question": "q", "request_id": "mine"}), workers=1)
+    assert status == 200
+    assert body["generation"] == "answer"
+    assert body["client_request_id"] == "mine"
+    assert body["request_id"] == graph.request_ids[0] != "mine"
+
+
+def test_deadline_stops_the_run_and_frees_its_chunk_store():
+    graph = SlowGraph(steps=5, step_s=0.05)
+
+    async def run(server):
+        response = await post(server.port, {"question": "q", "deadline_ms": 80})
+        await asyncio.sleep(0.2)  # the worker notices the deadline after its current step
+        return response
+
+    status, _, body = serve(graph, run, workers=1)
+    assert status == 504
+    assert body["request_id"] == graph.request_ids[0]
+    assert graph.request_ids[0] not in chunk_stores._stores
+
+
+def test_failed_run_frees_its_chunk_store():
+    graph = SlowGraph(fail=True)
+    status, _, _ = serve(graph, lambda s: post(s.port, {"question": "q"}), workers=1)
+    assert status == 500
+    assert graph.request_ids[0] not in chunk_stores._stores
+
+
+def test_sheds_load_beyond_workers_plus_queue():
+    graph = SlowGraph(steps=1, step_s=0.3)
+
+    async def run(server):
+        return await asyncio.gather(*(post(server.port, {"question": f"q{i}"}) for i in range(4)))
+
+    responses = serve(graph, run, workers=1, queue_size=1)
+    statuses = sorted(status for status, _, _ in responses)
+    assert statuses == [200, 200, 503, 503]
+    assert all("Retry-After" in headers for status, headers, _ in responses if status == 503)
+
+
+def test_rejects_boolean_deadline():
+    status, _, body = serve(SlowGraph(), lambda s: post(s.port, {"question": "q", "deadline_ms": True}), workers=1)
+    assert status == 400
+    assert "deadline_ms" in body["error"]
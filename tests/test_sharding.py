@@ -0,0 +1,105 @@
+import chromadb
+import pytest
+from chromadb.config import Settings
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import sharding
+from index_manager import IndexManager
+from sharding import ShardedIndex
+
+
+class FakeShard:
+    """Serves fixed (document, score) hits and raw query results."""
+
+    def __init__(self, hits):
+        self.hits = hits
+
+    def similarity_search_by_vector(self, embedding, k=4, where=None):
+        return sorted(self.hits, key=lambda hit: -hit[1])[:k]
+
+    def query(self, where=None, include=(), n_results=10, **kwargs):
+        hits = sorted(self.hits, key=lambda hit: -hit[1])[:n_results]
+        return {
+            "ids": [[d.page_content for d, _ in hits]],
+            "documents": [[d.page_content for d, _ in hits]],
+            "distances": [[1.0 - score for _, score in hits]],
+        }
+
+
+def hits(*pairs):
+    return [(Document(page_content=text), score) for text, score in pairs]
+
+
+def test_search_merges_shards_by_relevance():
+    index = ShardedIndex([
+        FakeShard(hits(("a1", 0.9), ("a2", 0.4), ("a3", 0.1))),
+        FakeShard(hits(("b1", 0.8), ("b2", 0.7))),
+        FakeShard(hits(("c1", 0.95), ("c2", 0.2))),
+    ])
+    merged = index.similarity_search_by_vector([0.0], k=4)
+    assert [(d.page_content, s) for d, s in merged] == [("c1", 0.95), ("a1", 0.9), ("b1", 0.8), ("b2", 0.7)]
+
+
+def test_query_merges_shards_by_distance():
+    index = ShardedIndex([
+        FakeShard(hits(("a1", 0.9), ("a2", 0.4))),
+        FakeShard(hits(("b1", 0.8), ("b2", 0.7))),
+    ])
+    result = index.query(query_embeddings=[[0.0]], n_results=3, include=["documents"])
+    assert result["ids"] == [["a1", "b1", "b2"]]
+    assert result["documents"] == [["a1", "b1", "b2"]]
+    assert "distances" not in result
+
+
+@pytest.fixture
+def shards(tmp_path):
+    index = ShardedIndex.create("test", str(tmp_path), shards=3, snapshot_verify=None)
+    for manager in index.managers:
+        manager._embeddings = DeterministicFakeEmbedding(size=8)
+    return index
+
+
+def documents(n):
+    return [Document(page_content=f"chunk {i}", metadata={"source": f"s{i}"}) for i in range(n)]
+
+
+def test_ingest_publishes_every_shard(shards):
+    snapshots = shards.ingest(documents(30))
+    assert len(snapshots) == 3
+    assert shards.chunk_count == 30
+    assert len(shards.similarity_search("chunk 1", k=50)) == 30
+
+
+def test_failed_shard_rolls_back_the_others(shards, monkeypatch):
+    shards.ingest(documents(30))
+    before = [(s.version, s.chunk_count) for s in shards.snapshots]
+
+    def fail(*args):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(shards.managers[1], "_stage", fail)
+    with pytest.raises(RuntimeError, match="disk full"):
+        shards.ingest([Document(page_content=f"new {i}", metadata={"source": f"n{i}"}) for i in range(30)])
+
+    assert [(s.version, s.chunk_count) for s in shards.snapshots] == before
+    for manager in shards.managers:
+        assert manager.current.vectorstore._collection.count() == manager.current.chunk_count
+    assert not [d for d in shards.similarity_search("new 1", k=50) if d.page_content.startswith("new")]
+
+    # The shards still accept the next ingestion.
+    monkeypatch.undo()
+    shards.ingest(documents(3))
+    assert shards.chunk_count == 33
+
+
+def test_sharded_env_refuses_unsharded_collection(tmp_path, monkeypatch):
+    client = chromadb.Client(Settings(is_persistent=True, persist_directory=str(tmp_path)))
+    client.create_collection("legacy").add(ids=["1"], embeddings=[[0.0] * 8], documents=["old chunk"])
+    monkeypatch.setattr(sharding, "index_manager", IndexManager("legacy", str(tmp_path)))
+    monkeypatch.setenv("RAG_SHARDS", "2")
+    with pytest.raises(RuntimeError, match="1 unsharded chunks"):
+        sharding._from_env()
+
+    monkeypatch.setattr(sharding, "index_manager", IndexManager("absent", str(tmp_path)))
+    assert len(sharding._from_env()) == 2
@@ -0,0 +1,136 @@
+import json
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from index_manager import IndexManager
+from snapshot_file import MAGIC, SnapshotError, SnapshotFile, _PREAMBLE, _aligned
+
+
+@pytest.fixture
+def rows():
+    rng = np.random.default_rng(0)
+    ids = [f"id-{i}" for i in range(50)] + ["ünïcode-id"]
+    texts = [f"chunk {i} " * (i % 7) for i in range(50)] + ["naïve café — ✓"]
+    metadatas = [{"source": f"s{i % 3}", "page": i} for i in range(50)] + [None]
+    return ids, rng.normal(size=(51, 16)).astype(np.float32), texts, metadatas
+
+
+def test_round_trip(tmp_path, rows):
+    ids, vectors, texts, metadatas = rows
+    path = SnapshotFile.write(tmp_path / "c.snapshot", ids, vectors, texts, metadatas, version=7, space="cosine")
+    snapshot = SnapshotFile.open(path)
+
+    assert (len(snapshot), snapshot.dim, snapshot.version, snapshot.space) == (51, 16, 7, "cosine")
+    assert snapshot.ids == ids
+    expected = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.testing.assert_allclose(snapshot.vectors, expected, rtol=1e-6)
+    assert [snapshot.text(r) for r in range(51)] == texts
+    assert snapshot.metadatas() == [m or {} for m in metadatas]
+    row = snapshot.row("ünïcode-id")
+    assert snapshot.document(row) == Document(page_content="naïve café — ✓", metadata={})
+    assert snapshot.row("missing") is None
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_empty_snapshot(tmp_path):
+    path = SnapshotFile.write(tmp_path / "empty.snapshot", [], np.zeros((0, 0), np.float32), [], [])
+    snapshot = SnapshotFile.open(path)
+    assert len(snapshot) == 0 and snapshot.ids == [] and snapshot.metadatas() == []
+
+
+def section_start(path, name):
+    raw = path.read_bytes()
+    _, header_length, _ = _PREAMBLE.unpack_from(raw, 0)
+    header = json.loads(raw[_PREAMBLE.size:_PREAMBLE.size + header_length])
+    offset, length, _ = header["sections"][name]
+    return _aligned(_PREAMBLE.size + header_length) + offset, length
+
+
+def flip_byte(path, position):
+    raw = bytearray(path.read_bytes())
+    raw[position] ^= 0xFF
+    path.write_bytes(bytes(raw))
+
+
+@pytest.mark.parametrize("section", ["vectors", "ids", "ids_offsets", "texts", "texts_offsets", "metadatas"])
+def test_corrupt_section_fails_full_verify(tmp_path, rows, section):
+    path = SnapshotFile.write(tmp_path / "c.snapshot", *rows)
+    start, length = section_start(path, section)
+    flip_byte(path, start + length // 2)
+    with pytest.raises(SnapshotError, match=f"checksum in section '{section}'"):
+        SnapshotFile.open(path)
+
+
+def test_header_verify_checks_only_index_sections(tmp_path, rows):
+    path = SnapshotFile.write(tmp_path / "c.snapshot", *rows)
+    start, length = section_start(path, "texts")
+    flip_byte(path, start)
+    SnapshotFile.open(path, verify="header")
+    start, _ = section_start(path, "ids")
+    flip_byte(path, start)
+    with pytest.raises(SnapshotError, match="section 'ids'"):
+        SnapshotFile.open(path, verify="header")
+
+
+def test_corrupt_header_truncation_and_foreign_files(tmp_path, rows):
+    path = SnapshotFile.write(tmp_path / "c.snapshot", *rows)
+    intact = path.read_bytes()
+
+    flip_byte(path, _PREAMBLE.size + 5)
+    with pytest.raises(SnapshotError, match="corrupt header"):
+        SnapshotFile.open(path)
+
+    path.write_bytes(intact[: len(intact) - 10])
+    with pytest.raises(SnapshotError, match="truncated"):
+        SnapshotFile.open(path)
+
+    path.write_bytes(b"NOTASNAP" + intact[len(MAGIC):])
+    with pytest.raises(SnapshotError, match="not an index snapshot"):
+        SnapshotFile.open(path)
+
+    path.write_bytes(intact[:4])
+    with pytest.raises(SnapshotError, match="too short"):
+        SnapshotFile.open(path)
+
+
+def manager(directory):
+    m = IndexManager("test", str(directory), vector_dtype="float32")
+    m._embeddings = DeterministicFakeEmbedding(size=8)
+    return m
+
+
+def test_index_serves_exported_snapshot_and_ignores_corrupt_one(tmp_path):
+    writer = manager(tmp_path)
+    writer.ingest([Document(page_content=f"chunk {i}", metadata={"source": f"s{i % 2}"}) for i in range(20)])
+    path = writer.export_snapshot()
+    expected = [d.page_content for d in writer.similarity_search("chunk 3", k=5)]
+
+    cold = manager(tmp_path)
+    assert cold.current.file is not None and cold.current.vectorstore is None
+    assert [d.page_content for d in cold.similarity_search("chunk 3", k=5)] == expected
+
+    start, length = section_start(path, "vectors")
+    flip_byte(path, start + length // 2)
+    fallback = manager(tmp_path)
+    assert fallback.current.file is None and fallback.current.vectorstore is not None
+    assert [d.page_content for d in fallback.similarity_search("chunk 3", k=5)] == expected
+
+
+def test_unindexed_filter_is_answered_by_chroma_without_replacing_the_file(tmp_path):
+    writer = manager(tmp_path)
+    writer.ingest([Document(page_content=f"chunk {i}", metadata={"source": f"s{i % 2}", "lang": "en" if i < 5 else "de"}) for i in range(10)])
+    writer.export_snapshot()
+
+    cold = manager(tmp_path)
+    assert "lang" not in cold.indexed_fields
+    embedding = cold.embeddings.embed_query("chunk 3")
+    hits = cold.similarity_search_by_vector(embedding, k=10, where={"lang": "en"})
+    assert sorted(d.page_content for d, _ in hits) == [f"chunk {i}" for i in range(5)]
+    result = cold.query(where={"lang": "de"}, query_embeddings=[embedding], n_results=10, include=["documents"])
+    assert sorted(result["documents"][0]) == [f"chunk {i}" for i in range(5, 10)]
+
+    assert cold.current.file is not None and cold.current.vectorstore is None
+    assert len(cold.similarity_search_by_vector(embedding, k=3, where={"source": "s1"})) == 3
@@ -0,0 +1,120 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from graph import speculation
+from graph.speculation import speculation_stats, speculative_route
+
+VECTOR = {"ids": ["vector-chunk"], "scores": [0.9]}
+WEB = {"ids": ["web-chunk"], "scores": [None]}
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    """Swap in an executor with the given number of workers, so tests decide what can still be cancelled."""
+    executors = []
+
+    def install(n):
+        executor = ThreadPoolExecutor(max_workers=n)
+        executors.append(executor)
+        monkeypatch.setattr(speculation, "_executor", executor)
+
+    speculation_stats.reset()
+    yield install
+    for executor in executors:
+        executor.shutdown(wait=True)
+    speculation_stats.reset()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_vectorstore_route_claims_retrieval_and_cancels_queued_web_search(workers):
+    # One worker: the web search is still queued behind retrieval when the router returns.
+    workers(1)
+    routed = threading.Event()
+    web_calls = []
+
+    def route(question):
+        routed.set()
+        return "vectorstore"
+
+    def retrieve(question):
+        assert routed.wait(5)
+        return VECTOR
+
+    result = speculative_route("q", route, retrieve, web_calls.append)
+
+    assert result == {"datasource": "vectorstore", "prefetched_chunks": VECTOR}
+    assert web_calls == []
+    stats = speculation_stats.snapshot()
+    assert (stats["requests"], stats["used"], stats["cancelled"], stats["wasted_tasks"]) == (1, 1, 1, 0)
+
+
+def test_websearch_route_claims_web_results_and_counts_running_retrieval_as_waste(workers):
+    workers(2)
+    retrieving = threading.Event()
+    release = threading.Event()
+
+    def route(question):
+        assert retrieving.wait(5)
+        return "websearch"
+
+    def retrieve(question):
+        retrieving.set()
+        assert release.wait(5)
+        return VECTOR
+
+    result = speculative_route("q", route, retrieve, lambda question: WEB)
+
+    assert result == {"datasource": "websearch", "prefetched_web": WEB}
+    release.set()
+    wait_until(lambda: speculation_stats.snapshot()["wasted_tasks"] == 1)
+    stats = speculation_stats.snapshot()
+    assert (stats["used"], stats["cancelled"], stats["failed"]) == (1, 0, 0)
+    assert stats["wasted_seconds"] > 0
+
+
+def test_failed_speculative_task_falls_back(workers):
+    workers(2)
+
+    def retrieve(question):
+        raise ConnectionError("vector store down")
+
+    result = speculative_route("q", lambda question: "vectorstore", retrieve)
+
+    assert result == {"datasource": "vectorstore", "prefetched_chunks": None}
+    stats = speculation_stats.snapshot()
+    assert (stats["used"], stats["failed"]) == (0, 1)
+
+
+def test_router_error_discards_both_tasks_and_propagates(workers):
+    workers(1)
+    retrieving = threading.Event()
+    release = threading.Event()
+    web_calls = []
+
+    def route(question):
+        assert retrieving.wait(5)
+        raise RuntimeError("router down")
+
+    def retrieve(question):
+        retrieving.set()
+        assert release.wait(5)
+        return VECTOR
+
+    with pytest.raises(RuntimeError, match="router down"):
+        speculative_route("q", route, retrieve, web_calls.append)
+
+    # The queued web search is cancelled; the running retrieval finishes as waste.
+    assert speculation_stats.snapshot()["cancelled"] == 1
+    release.set()
+    wait_until(lambda: speculation_stats.snapshot()["wasted_tasks"] == 1)
+    assert web_calls == []
+    assert speculation_stats.snapshot()["used"] == 0
@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from text_splitter import FastTokenTextSplitter, get_encoding
+
+ENCODING = "cl100k_base"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def encoding():
+    try:
+        return get_encoding(ENCODING)
+    except Exception as exc:  # the encoding file is downloaded on first use
+        pytest.skip(f"tiktoken encoding {ENCODING} unavailable: {exc}")
+
+
+def reference_split(text, chunk_size, chunk_overlap):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        encoding_name=ENCODING, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    )
+    return splitter.split_text(text)
+
+
+def whitespace_heavy(seed, n_pieces=400):
+    rng = random.Random(seed)
+    pieces = ["word", "it's", "'s", "'t", " ", "  ", "\t", " \t", "\t ", "\n", "\n\n", " \n", "x", "1990", "—", "é"]
+    return "".join(rng.choice(pieces) for _ in range(n_pieces))
+
+
+def test_whitespace_before_contraction_is_counted_alone(encoding):
+    # In context the whitespace run splits before "'s"; on its own it is one token.
+    assert len(encoding.encode_ordinary(" \t's")) == 3
+    assert len(encoding.encode_ordinary(" \t")) == 1
+    text = "ab \t's" * 40
+    for chunk_size in (2, 3, 4, 7):
+        assert FastTokenTextSplitter(chunk_size, 1, ENCODING).split_text(text) == reference_split(text, chunk_size, 1)
+
+
+@pytest.mark.parametrize("seed", range(12))
+@pytest.mark.parametrize("chunk_size,chunk_overlap", [(5, 1), (16, 4), (64, 8)])
+def test_matches_recursive_splitter_on_whitespace_heavy_text(seed, chunk_size, chunk_overlap):
+    text = whitespace_heavy(seed)
+    assert FastTokenTextSplitter(chunk_size, chunk_overlap, ENCODING).split_text(text) == reference_split(
+        text, chunk_size, chunk_overlap
+    )
+
+
+def test_matches_recursive_splitter_on_prose():
+    paragraph = (
+        "Agents plan, call tools and reflect on the results. Memory keeps what they learned "
+        "between steps, and retrieval brings in what they never saw.\n"
+    )
+    text = "\n\n".join(paragraph * (i % 5 + 1) for i in range(30))
+    assert FastTokenTextSplitter(100, 20, ENCODING).split_text(text) == reference_split(text, 100, 20)
@@ -0,0 +1,228 @@
+"""
+Token-aware text splitting that tokenizes each document once.
+
+``RecursiveCharacterTextSplitter.from_tiktoken_encoder`` measures every
+candidate piece by re-encoding it, at every level of separator recursion,
+and again whenever the overlap window slides. :class:`FastTokenTextSplitter`
+runs the same recursive separator search and merge, but on ``(start, end)``
+character spans: the document is encoded once, token start offsets are
+computed from the token byte lengths, and the token length of any span whose
+ends fall on token boundaries is two binary searches into that offset array.
+
+A span's own tokenization can still differ from its share of the document's:
+tiktoken splits a run of whitespace differently depending on what follows
+it, so ``" \t"`` is two tokens before ``"'s"`` and one on its own. Spans that
+cut through a token, or whose first or last token is whitespace, are
+therefore re-encoded. The chunks match the recursive splitter's on prose and
+on the whitespace-heavy inputs in ``tests/test_text_splitter.py``, but
+equality is not guaranteed for every input.
+"""
+
+import copy
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
+# Spans estimated this far above chunk_size are oversized however their
+# boundary tokens re-tokenize, so they are never re-encoded.
+_BOUNDARY_SLACK = 32
+
+Span = Tuple[int, int]
+
+
+@lru_cache(maxsize=None)
+def get_encoding(encoding_name: str = "gpt2") -> Any:
+    """Process-wide cached tiktoken encoder."""
+    import tiktoken
+
+    return tiktoken.get_encoding(encoding_name)
+
+
+@lru_cache(maxsize=None)
+def _token_byte_lengths(encoding_name: str) -> np.ndarray:
+    """Byte length of every token id, built once per encoding."""
+    enc = get_encoding(encoding_name)
+    lengths = np.zeros(enc.n_vocab, dtype=np.int64)
+    for token in range(enc.n_vocab):
+        try:
+            lengths[token] = len(enc.decode_single_token_bytes(token))
+        except KeyError:
+            pass
+    return lengths
+
+
+def token_offsets(text: str, encoding_name: str = "gpt2") -> List[int]:
+    """
+    Character offset at which each token of ``text`` starts.
+
+    Args:
+        text: Text to tokenize
+        encoding_name: tiktoken encoding
+
+    Returns:
+        Sorted list of token start offsets, one per token
+    """
+    enc = get_encoding(encoding_name)
+    tokens = enc.encode_ordinary(text)
+    if not tokens:
+        return []
+    byte_lengths = _token_byte_lengths(encoding_name)[np.asarray(tokens, dtype=np.int64)]
+    byte_starts = np.concatenate(([0], np.cumsum(byte_lengths)[:-1]))
+    # Map each UTF-8 byte to the index of the character it belongs to.
+    raw = np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
+    char_index = np.cumsum((raw & 0xC0) != 0x80) - 1
+    return char_index[byte_starts].tolist()
+
+
+class FastTokenTextSplitter:
+    """
+    Drop-in for ``RecursiveCharacterTextSplitter.from_tiktoken_encoder``.
+
+    Args:
+        chunk_size: Maximum chunk size in tokens
+        chunk_overlap: Overlap between chunks in tokens
+        encoding_name: tiktoken encoding used to count tokens
+        separators: Separators tried in order, as in the recursive splitter
+        workers: Processes used by ``split_documents``; 0 or 1 splits serially
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        encoding_name: str = "gpt2",
+        separators: Optional[Sequence[str]] = None,
+        workers: int = 0,
+    ) -> None:
+        if chunk_overlap > chunk_size:
+            raise ValueError(
+                f"Got a larger chunk overlap ({chunk_overlap}) than chunk size ({chunk_size}), should be smaller."
+            )
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.encoding_name = encoding_name
+        self.separators = list(separators or DEFAULT_SEPARATORS)
+        self.workers = workers
+
+    def split_text(self, text: str) -> List[str]:
+        enc = get_encoding(self.encoding_name)
+        starts = token_offsets(text, self.encoding_name)
+        n_tokens = len(starts)
+        text_len = len(text)
+
+        def _is_space(token: int) -> bool:
+            end = starts[token + 1] if token + 1 < n_tokens else text_len
+            return text[starts[token]:end].isspace()
+
+        def length(span: Span) -> int:
+            start, end = span
+            i = bisect_left(starts, start)
+            j = bisect_left(starts, end)
+            estimate = j - i
+            aligned = i < n_tokens and starts[i] == start and (end == text_len or (j < n_tokens and starts[j] == end))
+            if aligned and not (_is_space(i) or _is_space(j - 1)):
+                return estimate
+            if estimate >= self.chunk_size + _BOUNDARY_SLACK:
+                # Only compared against chunk_size before being split further,
+                # and boundary effects are worth a handful of tokens at most.
+                return estimate
+            # The span cuts through a token of the full text, or starts or
+            # ends in whitespace whose split depends on the neighbouring
+            # text, so its own tokenization may differ: count it exactly.
+            return len(enc.encode_ordinary(text[start:end]))
+
+        chunks = []
+        for start, end in self._split(text, (0, len(text)), self.separators, length):
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+        return chunks
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        texts = [d.page_content for d in documents]
+        if self.workers > 1 and len(texts) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                chunksize = max(1, len(texts) // (self.workers * 4))
+                all_chunks = list(pool.map(self.split_text, texts, chunksize=chunksize))
+        else:
+            all_chunks = [self.split_text(t) for t in texts]
+
+        return [
+            Document(page_content=chunk, metadata=copy.deepcopy(doc.metadata))
+            for doc, chunks in zip(documents, all_chunks)
+            for chunk in chunks
+        ]
+
+    # --- span-based recursive split --------------------------------------
+
+    def _split(self, text: str, span: Span, separators: List[str], length) -> List[Span]:
+        start, end = span
+        separator = separators[-1]
+        new_separators: List[str] = []
+        for i, s in enumerate(separators):
+            if s == "":
+                separator = s
+                break
+            if text.find(s, start, end) != -1:
+                separator = s
+                new_separators = separators[i + 1:]
+                break
+
+        final: List[Span] = []
+        good: List[Tuple[int, int, int]] = []
+        for piece in _split_spans(text, start, end, separator):
+            n = length(piece)
+            if n < self.chunk_size:
+                good.append((piece[0], piece[1], n))
+                continue
+            if good:
+                final.extend(self._merge(good))
+                good = []
+            if not new_separators:
+                final.append(piece)
+            else:
+                final.extend(self._split(text, piece, new_separators, length))
+        if good:
+            final.extend(self._merge(good))
+        return final
+
+    def _merge(self, pieces: List[Tuple[int, int, int]]) -> List[Span]:
+        """Greedy merge of contiguous pieces into overlapping windows."""
+        merged: List[Span] = []
+        window: List[Tuple[int, int, int]] = []
+        head = 0  # window[head:] is the live window
+        total = 0
+        for piece in pieces:
+            n = piece[2]
+            if total + n > self.chunk_size and head < len(window):
+                merged.append((window[head][0], window[-1][1]))
+                while total > self.chunk_overlap or (total + n > self.chunk_size and total > 0):
+                    total -= window[head][2]
+                    head += 1
+            window.append(piece)
+            total += n
+        if head < len(window):
+            merged.append((window[head][0], window[-1][1]))
+        return merged
+
+
+def _split_spans(text: str, start: int, end: int, separator: str) -> List[Span]:
+    """Split a span on ``separator``, keeping it at the start of the following piece."""
+    if not separator:
+        return [(i, i + 1) for i in range(start, end)]
+    spans = []
+    piece_start = start
+    pos = text.find(separator, start, end)
+    while pos != -1:
+        if pos > piece_start:
+            spans.append((piece_start, pos))
+        piece_start = pos
+        pos = text.find(separator, pos + len(separator), end)
+    if end > piece_start:
+        spans.append((piece_start, end))
+    return spans
@@ -0,0 +1,318 @@
+"""
+Quantized in-memory vector index with full-precision rescoring.
+
+Chroma keeps every chunk's float32 embedding in RAM, which is what bounds the
+corpus a retrieval node can hold. :class:`VectorIndex` keeps only a quantized
+copy in memory (float16, or int8 with a per-dimension scale, i.e. 2x or 4x
+smaller), scans it with blocked NumPy matrix-vector products, and rescores a
+small candidate set exactly against normalized float32 vectors that stay on
+disk and are read through ``np.memmap``.
+
+On disk an index is two files next to each other::
+
+    <path>.f32        raw float32 rows, row i belongs to ids[i]
+    <path>.ids.json   {"dim": d, "ids": [...]}
+
+Rows are only ever appended, so an older :class:`VectorIndex` keeps serving
+its own rows while :meth:`VectorIndex.extend` publishes a bigger one.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+DTYPES = ("float32", "float16", "int8")
+# Rows upcast to float32 at a time while scanning: small enough to stay in cache.
+SCAN_BLOCK_ROWS = 512
+QUANTIZE_BLOCK_ROWS = 16384
+# Masks selecting less than this fraction of rows are scanned by gathering them.
+SPARSE_SCAN_FRACTION = 0.3
+DEFAULT_RESCORE_FACTOR = 4
+MIN_RESCORE_CANDIDATES = 32
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _int8_scale(vectors: np.ndarray) -> np.ndarray:
+    scale = np.abs(vectors).max(axis=0) / 127.0 if len(vectors) else np.zeros(vectors.shape[1])
+    scale = scale.astype(np.float32)
+    scale[scale == 0] = 1.0
+    return scale
+
+
+def _quantize(vectors: np.ndarray, dtype: str, scale: Optional[np.ndarray]) -> np.ndarray:
+    if dtype == "int8":
+        return np.clip(np.rint(vectors / scale), -127, 127).astype(np.int8)
+    return vectors.astype(dtype)
+
+
+class VectorIndex:
+    """
+    Brute-force cosine index over quantized vectors.
+
+    Use :meth:`build` or :meth:`open` rather than the constructor.
+
+    Args:
+        path: File prefix of the on-disk index
+        ids: Chunk id of each row
+        dtype: In-memory representation: "float32", "float16" or "int8"
+        codes: Quantized rows, shape (n, d)
+        scale: Per-dimension int8 scale, ``None`` for float types
+        rescore_factor: Candidates rescored at full precision per result
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ids: List[str],
+        dtype: str,
+        codes: np.ndarray,
+        scale: Optional[np.ndarray],
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+    ) -> None:
+        self.path = Path(path)
+        self.ids = ids
+        self.dtype = dtype
+        self.codes = codes
+        self.scale = scale
+        self.rescore_factor = rescore_factor
+        self.dim = codes.shape[1]
+        self._full: Optional[np.memmap] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # --- construction ----------------------------------------------------
+
+    @classmethod
+    def build(
+        cls,
+        path: Union[str, Path],
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        dtype: str = "int8",
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+    ) -> "VectorIndex":
+        """Write a new index for ``vectors`` to ``path`` and return it."""
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}, expected one of {DTYPES}")
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        full = _normalize(np.asarray(vectors, dtype=np.float32))
+        # Replace rather than overwrite: an older index may still map the old file.
+        rows = _rows_file(path)
+        tmp = rows.with_name(rows.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(full.tobytes())
+        os.replace(tmp, rows)
+        _write_ids(path, full.shape[1], list(ids))
+        scale = _int8_scale(full) if dtype == "int8" else None
+        return cls(path, list(ids), dtype, _quantize(full, dtype, scale), scale, rescore_factor)
+
+    @classmethod
+    def open(
+        cls,
+        path: Union[str, Path],
+        dtype: str = "int8",
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+    ) -> "VectorIndex":
+        """
+        Open an index written by :meth:`build`, quantizing it into memory.
+
+        Raises:
+            FileNotFoundError: No index at ``path``
+            ValueError: The files are inconsistent with each other
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}, expected one of {DTYPES}")
+        path = Path(path)
+        meta = json.loads(_ids_file(path).read_text())
+        ids, dim = meta["ids"], int(meta["dim"])
+        if os.path.getsize(_rows_file(path)) < len(ids) * dim * 4:
+            raise ValueError(f"{_rows_file(path)} is shorter than its {len(ids)} ids")
+        full = _memmap(path, len(ids), dim)
+        scale = _int8_scale_blocked(full) if dtype == "int8" else None
+        index = cls(path, ids, dtype, _quantize_blocked(full, dtype, scale), scale, rescore_factor)
+        index._full = full
+        return index
+
+    @classmethod
+    def from_rows(
+        cls,
+        path: Union[str, Path],
+        ids: Sequence[str],
+        full: np.ndarray,
+        dtype: str = "int8",
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR,
+    ) -> "VectorIndex":
+        """
+        Read-only index over normalized float32 rows mapped from another file.
+
+        A float32 index scans ``full`` in place, so its pages are only read
+        from disk once a query touches them. Don't :meth:`extend` the result.
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}, expected one of {DTYPES}")
+        scale = _int8_scale_blocked(full) if dtype == "int8" else None
+        codes = full if dtype == "float32" else _quantize_blocked(full, dtype, scale)
+        index = cls(Path(path), list(ids), dtype, codes, scale, rescore_factor)
+        index._full = full
+        return index
+
+    def extend(self, ids: Sequence[str], vectors: np.ndarray) -> "VectorIndex":
+        """
+        Append rows on disk and return a new index covering old and new rows.
+
+        ``self`` is left untouched and keeps serving its own rows.
+        """
+        if not len(ids):
+            return self
+        new = _normalize(np.asarray(vectors, dtype=np.float32))
+        rows = _rows_file(self.path)
+        with open(rows, "r+b") as f:
+            # Drop rows left behind by an append that never got its ids written.
+            f.truncate(len(self.ids) * self.dim * 4)
+            f.seek(0, os.SEEK_END)
+            f.write(new.tobytes())
+        all_ids = self.ids + list(ids)
+        _write_ids(self.path, self.dim, all_ids)
+
+        scale = self.scale
+        if self.dtype == "int8":
+            scale = np.maximum(self.scale, _int8_scale(new))
+        if scale is not None and not np.array_equal(scale, self.scale):
+            # The range grew: requantize everything against the new scale.
+            return VectorIndex.open(self.path, self.dtype, self.rescore_factor)
+        codes = np.concatenate([self.codes, _quantize(new, self.dtype, scale)])
+        return VectorIndex(self.path, all_ids, self.dtype, codes, scale, self.rescore_factor)
+
+    # --- search ----------------------------------------------------------
+
+    @property
+    def full(self) -> np.memmap:
+        """Full-precision rows, memory-mapped from disk."""
+        if self._full is None:
+            self._full = _memmap(self.path, len(self.ids), self.dim)
+        return self._full
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of vector data held in RAM (the memory-mapped rows are not counted)."""
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def _scan(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate cosine similarity of ``rows`` (default: all rows) to ``query``."""
+        q = _normalize(np.asarray(query, dtype=np.float32))
+        if self.scale is not None:
+            q = q * self.scale
+        n = len(self.ids) if rows is None else len(rows)
+        if self.dtype == "float32" and rows is None:
+            return self.codes @ q
+        scores = np.empty(n, dtype=np.float32)
+        buffer = np.empty((min(SCAN_BLOCK_ROWS, n), self.dim), dtype=np.float32)
+        for start in range(0, n, SCAN_BLOCK_ROWS):
+            if rows is None:
+                block = self.codes[start:start + SCAN_BLOCK_ROWS]
+            else:
+                block = self.codes[rows[start:start + SCAN_BLOCK_ROWS]]
+            upcast = buffer[:len(block)]
+            np.copyto(upcast, block, casting="unsafe")
+            np.dot(upcast, q, out=scores[start:start + len(block)])
+        return scores
+
+    def approximate_scores(self, query: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of every row to ``query`` from the quantized codes."""
+        scores = self._scan(query)
+        if mask is not None:
+            scores[~mask] = -np.inf
+        return scores
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 4,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k rows by cosine similarity.
+
+        Args:
+            query: Query embedding, shape (d,)
+            k: Number of results
+            mask: Boolean row mask; rows where it is False are never returned.
+                Selective masks only scan the selected rows.
+
+        Returns:
+            ``(id, score)`` pairs with exact cosine similarities, best first
+        """
+        rows: Optional[np.ndarray] = None
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+        n = len(self.ids) if rows is None else len(rows)
+        k = min(k, n)
+        if k <= 0:
+            return []
+
+        if rows is not None and len(rows) > len(self.ids) * SPARSE_SCAN_FRACTION:
+            # Dense filter: a full sequential scan beats gathering most rows.
+            scores = self.approximate_scores(query, mask)
+            rows = None
+        else:
+            scores = self._scan(query, rows)
+        positions = np.arange(len(scores)) if rows is None else rows
+
+        if self.dtype == "float32":
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self.ids[positions[i]], float(scores[i])) for i in top]
+
+        n_candidates = min(n, max(k * self.rescore_factor, MIN_RESCORE_CANDIDATES))
+        candidates = np.sort(positions[np.argpartition(-scores, n_candidates - 1)[:n_candidates]])
+        exact = self.full[candidates] @ _normalize(np.asarray(query, dtype=np.float32))
+        order = np.argsort(-exact, kind="stable")[:k]
+        return [(self.ids[candidates[i]], float(exact[i])) for i in order]
+
+
+def _rows_file(path: Path) -> Path:
+    return path.with_name(path.name + ".f32")
+
+
+def _ids_file(path: Path) -> Path:
+    return path.with_name(path.name + ".ids.json")
+
+
+def _write_ids(path: Path, dim: int, ids: List[str]) -> None:
+    target = _ids_file(path)
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_text(json.dumps({"dim": dim, "ids": ids}))
+    os.replace(tmp, target)
+
+
+def _memmap(path: Path, rows: int, dim: int) -> np.memmap:
+    if rows == 0:
+        return np.zeros((0, dim), dtype=np.float32)  # np.memmap refuses empty maps
+    return np.memmap(_rows_file(path), dtype=np.float32, mode="r", shape=(rows, dim))
+
+
+def _quantize_blocked(full: np.ndarray, dtype: str, scale: Optional[np.ndarray]) -> np.ndarray:
+    codes = np.empty(full.shape, dtype=dtype)
+    for start in range(0, len(full), QUANTIZE_BLOCK_ROWS):
+        block = np.asarray(full[start:start + QUANTIZE_BLOCK_ROWS])
+        codes[start:start + len(block)] = _quantize(block, dtype, scale)
+    return codes
+
+
+def _int8_scale_blocked(full: np.ndarray) -> np.ndarray:
+    peak = np.zeros(full.shape[1], dtype=np.float32)
+    for start in range(0, len(full), QUANTIZE_BLOCK_ROWS):
+        np.maximum(peak, np.abs(np.asarray(full[start:start + QUANTIZE_BLOCK_ROWS])).max(axis=0), out=peak)
+    scale = peak / 127.0
+    scale[scale == 0] = 1.0
+    return scale